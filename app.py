@@ -1,4 +1,6 @@
+import base64
 import datetime
+import functools
 import logging
 import math
 import os
@@ -6,34 +8,35 @@ import platform
 import random
 import re
 import subprocess
-import time
 import zipfile
-from itertools import islice
 from xkcdpass import xkcd_password as xp
 
 import flet as ft
-import qrcode
 import redis
 import requests
-import xlrd
 from dotenv import load_dotenv
 from urllib.parse import urlparse, parse_qs
-from pypdf import PdfMerger
 
 from transliterate import translit
 
 import wording.wording
-from bot_elements.functions import load_config_file, update_config_file
-from database import MySQL, RedisTable
+from wording.qr import qr_cache, get_qr_link
+from bot_elements.config_service import ConfigService
+from bot_elements.identity import IDENTITY_CHANNEL
+from bot_elements.catalogue import CATALOGUE_CHANNEL
+from bot_elements.stats import GROUPS_KEY, FEEDBACK_KEY
+from database import MySQL, RedisTable, DatabaseError, build_select, build_update
 from flet_elements.classes import NewModule, NewAdmin, NewMentor, NewChild, ConfirmationCodeField, ExtraUsers
 from flet_elements.dialogs import InfoDialog, LoadingDialog, BottomSheet
-from flet_elements.functions import remove_folder_content, get_hello, get_system_list
+from flet_elements.tasks import TaskExecutor, BackgroundTask
+from flet_elements.functions import get_hello, get_system_list, read_children_table
 from flet_elements.screens import screens
-from flet_elements.systemd import reboot_systemd, check_systemd, services_list, make_update
-from flet_elements.telegram import send_telegam_message, send_telegram_document, delete_telegram_message
+from flet_elements.systemd import reboot_systemd, check_systemd, services_list, make_update, service_health
+from flet_elements.telegram import send_telegam_message, queue_telegam_message, send_telegram_document, delete_telegram_message
+from flet_elements.alerts import post_alert
 from flet_elements.functions import is_debug
 from flet_elements.user_statuses import user_statuses
-from backup import mysql_backup
+from backup import snapshot_tables
 
 os.environ['FLET_WEB_APP_PATH'] = '/connect'
 current_directory = os.path.dirname(os.path.abspath(__file__))
@@ -45,7 +48,7 @@ else:
     env_path = r"/root/crod/.env"
 load_dotenv(dotenv_path=env_path)
 
-for path in ['assets/qrc', 'wording/generated', 'wording/qr']:
+for path in ['wording/generated', 'wording/qr']:
     if not os.path.exists(os.path.join(current_directory, path)):
         logging.info(f'Creating folder {path}')
         os.mkdir(os.path.join(current_directory, path))
@@ -78,6 +81,9 @@ redis = RedisTable(
     password=os.getenv('REDIS_PASSWORD')
 )
 
+# панель - единственный писатель config.json, бот получает изменения через Redis
+config_service = ConfigService('config.json', redis)
+
 os.environ['BOT_NAME'] = requests.get(url=f"https://api.telegram.org/bot{os.getenv('BOT_TOKEN')}/getMe").json()['result']['username']
 logging.info(f"BOT_NAME: {os.getenv('BOT_NAME')}")
 
@@ -99,6 +105,25 @@ def url_sign_check(sign: str, index: str):
         return -2
 
 
+def invalidate_identity(telegram_id=None):
+    # бот кэширует роль и статус пользователей, после изменений в панели кэш нужно сбросить
+    redis.publish(IDENTITY_CHANNEL, str(telegram_id) if telegram_id else '*')
+
+
+def invalidate_catalogue(module_id=None):
+    # бот держит снимок модулей с занятыми местами, после изменений в панели он перечитывается
+    redis.publish(CATALOGUE_CHANNEL, str(module_id) if module_id else '*')
+
+
+def invalidate_stats():
+    # счётчики статистики в боте пересчитаются из базы при следующем чтении
+    try:
+        redis.delete(GROUPS_KEY)
+        redis.delete(FEEDBACK_KEY.format(date=datetime.date.today()))
+    except Exception as e:
+        logging.error(f"Redis: {e}")
+
+
 def convert_date(input_date):
     return datetime.datetime.strftime(datetime.datetime.strptime(input_date, '%Y-%m-%d'), '%d.%m.%Y')
 
@@ -131,34 +156,66 @@ def main(page: ft.Page):
     child_col = ft.ListView()
 
     dlg_loading = LoadingDialog(page=page)
+
+    # элементы открытого экрана, показывающие состояние сервисов: ключ -> функция(statuses)
+    service_indicators = {}
+
+    def services_changed(statuses: dict):
+        # вызывается из фонового потока service_health
+        if service_indicators:
+            for show in list(service_indicators.values()):
+                show(statuses)
+            page.update()
+
+    service_health.subscribe(services_changed)
+    page.on_disconnect = lambda _: service_health.unsubscribe(services_changed)
     dlg_info = InfoDialog(page=page)
     bottom_sheet = BottomSheet(page=page)
 
-    redis.connect()
-    db.connect()
+    def show_task_error(title: str, e: Exception):
+        dlg_info.title = title
+        dlg_info.content = ft.Text(
+            f"Во время выполнения возникла ошибка, попробуйте позже или обратитесь к администратору."
+            f"\n\nОшибка: {e}",
+            width=600, size=16, weight=ft.FontWeight.W_200
+        )
+        dlg_info.open()
 
-    if db.result['status'] == "error":
+    tasks = TaskExecutor(dlg_loading, on_error=show_task_error)
+
+    redis.connect()
+    try:
+        db.connect()
+    except DatabaseError as e:
         startup['mysql']['status'] = False
-        startup['mysql']['msg'] = db.result['message']
+        startup['mysql']['msg'] = str(e)
 
     if redis.result['status'] == "error":
         startup['redis']['status'] = False
         startup['redis']['msg'] = redis.result['message']
 
-    def make_db_request(sql_query: str, params: tuple = ()):
-        db.execute(sql_query, params)
+    def show_db_error(e: DatabaseError):
+        dlg_loading.close()
+        dlg_info.title = "Ошибка БД"
+        dlg_info.content = ft.Text(
+            f"При выполнении запроса к базе данных возникла ошибка, попробуйте позже или обратитесь к администратору."
+            f"\n\nЗапрос: {getattr(e, 'query', '')}"
+            f"\nОшибка: {e}",
+            width=600, size=16, weight=ft.FontWeight.W_200
+        )
+        dlg_info.open()
 
-        if db.result['status'] == "ok":
-            return db.data
-        else:
-            dlg_info.title = "Ошибка БД"
-            dlg_info.content = ft.Text(
-                f"При выполнении запроса к базе данных возникла ошибка, попробуйте позже или обратитесь к администратору."
-                f"\n\nЗапрос: {sql_query}"
-                f"\nОшибка: {db.result['message']}",
-                width=600, size=16, weight=ft.FontWeight.W_200
-            )
-            dlg_info.open()
+    def db_errors_handled(func):
+        # обработчик прерывается на первой ошибке БД, пользователь видит диалог с ошибкой
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            except DatabaseError as e:
+                logging.error(f"Database: {e}")
+                show_db_error(e)
+
+        return wrapper
 
     def is_telegrammed(target: str = None):
         messages = {
@@ -230,59 +287,59 @@ def main(page: ft.Page):
             return False
         return True
 
-    def clean_all_children_info():
-        """
-        Удаляет все данные о детях из таблиц children, feedback, modules_records
-        :return:
-        """
-
-        query = """
-            TRUNCATE TABLE crodconnect.children;
-            TRUNCATE TABLE crodconnect.feedback;
-            TRUNCATE TABLE crodconnect.modules_records;
-        """
-
-        make_db_request(query)
-        db.reconnect()
-
-    def insert_children_info(table_filepath: str):
-        dlg_loading.loading_text = "Добавляем детей"
-        dlg_loading.open()
-        wb = xlrd.open_workbook(table_filepath)
-        ws = wb.sheet_by_index(0)
-        rows_num = ws.nrows
-        row = 1
+    @db_errors_handled
+    def insert_children_info(task: BackgroundTask, table_filepath: str):
+        try:
+            children, errors = read_children_table(table_filepath)
+        finally:
+            if os.path.exists(table_filepath):
+                os.remove(table_filepath)
 
-        clean_all_children_info()
+        if errors or not children:
+            dlg_loading.close()
+            dlg_info.title = "Загрузка списка детей"
+            dlg_info.content = ft.Text(
+                "Список детей не загружен, текущие данные не изменены.\n\n" + ("\n".join(errors[:15]) if errors else "Таблица пуста"),
+                width=600, size=16, weight=ft.FontWeight.W_200
+            )
+            dlg_info.open()
+            return
+
+        pass_phrases = set()
+        rows = []
+        for child in children:
+            pass_phrase = create_passphrase(child['name'])
+            while pass_phrase in pass_phrases:
+                pass_phrase = create_passphrase(child['name'])
+            pass_phrases.add(pass_phrase)
+            rows.append((child['name'], random.randint(1, 5), child['birth'], child['comment'], child['parrent_name'], child['parrent_phone'], pass_phrase))
+
+        # старые данные удаляются в той же транзакции, что и вставка новых: при ошибке список остаётся прежним
+        # TRUNCATE неявно завершает транзакцию, поэтому DELETE
+        query = "INSERT INTO crodconnect.children (name, group_num, birth, comment, parrent_name, parrent_phone, pass_phrase) VALUES (%s, %s, %s, %s, %s, %s, %s)"
+        batch_size = 100
+        with db.transaction() as tx:
+            tx.execute("DELETE FROM crodconnect.modules_records")
+            tx.execute("DELETE FROM crodconnect.feedback")
+            tx.execute("DELETE FROM crodconnect.children")
+            for start in range(0, len(rows), batch_size):
+                # отмена между пачками откатывает транзакцию, старый список остаётся
+                task.progress(f"Добавляем детей {min(start + batch_size, len(rows))}/{len(rows)}")
+                tx.execute_many(query, rows[start:start + batch_size])
+        invalidate_identity()
+        invalidate_stats()
+        invalidate_catalogue()
 
-        while row < rows_num:
-            dlg_loading.dialog.content.controls[0].controls[0].value = f"Добавляем детей {row}/{rows_num}"
-            page.update()
-            child = []
-            for col in range(5):
-                child.append(ws.cell_value(row, col))
-            pass_phrase = create_passphrase(child[0])
-            birth = xlrd.xldate.xldate_as_tuple(child[1], 0)
-            birth = f"{birth[0]}-{birth[1]}-{birth[2]}"
-            query = "INSERT INTO crodconnect.children (name, group_num, birth, comment, parrent_name, parrent_phone, pass_phrase) VALUES (%s, %s, %s, %s, %s, %s, %s)"
-            make_db_request(query, (child[0], random.randint(1, 5), birth, child[2], child[3], child[4], pass_phrase,))
-            if db.result['status'] == 'error':
-                dlg_loading.close()
-                return
-            row += 1
         dlg_loading.close()
         change_screen("main")
-        open_sb("Список детей загружен", ft.colors.GREEN)
-        if os.path.exists(f'assets/uploads/{table_filepath}'):
-            os.remove(f'assets/uploads/{table_filepath}')
+        open_sb(f"Список детей загружен ({len(rows)})", ft.colors.GREEN)
 
     def make_reboot(target: str):
         reboot_systemd(target)
         open_sb("Перезагружаем", ft.colors.GREEN)
-        send_telegam_message(
-            tID=os.getenv('ID_GROUP_ERRORS'),
-            message_text=f"*Перезагрузка сервисов*"
-                         f"\n\nЗапрос на перезагрузку сервиса {target}.service отправлен"
+        post_alert(
+            f"*Перезагрузка сервисов*"
+            f"\n\nЗапрос на перезагрузку сервиса {target}.service отправлен"
         )
 
         change_screen("reboot_menu")
@@ -302,6 +359,14 @@ def main(page: ft.Page):
             status_value = False
         else:
             status_value = check_systemd(target)
+        status_icon = statuses[status_value]['icon']
+
+        def show_service_state(states: dict):
+            status_icon.color = ft.colors.GREEN if states.get(target, False) else ft.colors.RED
+
+        if not is_debug():
+            service_indicators[target] = show_service_state
+
         card = ft.Card(
             ft.Container(
                 content=ft.Row(
@@ -310,7 +375,7 @@ def main(page: ft.Page):
                             ft.ListTile(
                                 title=ft.Text(title),
                                 # subtitle=ft.Row([statuses[status_value]['icon'], statuses[status_value]['text']], vertical_alignment=ft.CrossAxisAlignment.CENTER),
-                                leading=statuses[status_value]['icon']
+                                leading=status_icon
                             ),
                             expand=True
                         ),
@@ -332,7 +397,6 @@ def main(page: ft.Page):
 
         page.drawer.open = False
         page.update()
-        time.sleep(0.3)
 
         if data['sec'] == "app":
             if data['act'] == "exit":
@@ -380,52 +444,55 @@ def main(page: ft.Page):
 
         return phrase
 
+    @db_errors_handled
     def add_new_child():
         query = "INSERT INTO crodconnect.children (name, group_num, birth, comment, parrent_name, parrent_phone, pass_phrase) VALUES (%s, %s, %s, %s, %s, %s, %s)"
         pass_phrase = create_passphrase(new_child.name.value)
 
         month = '0' * (2 - len(new_child.birth_month.value)) + new_child.birth_month.value
 
-        make_db_request(query, (new_child.name.value, new_child.group.value,
-                                f"{new_child.birth_year.value}-{month}-{new_child.birth_day.value}",
-                                new_child.caption.value, new_child.parent_name.value, f"+7{new_child.phone.value}", pass_phrase,))
-        if db.result['status'] == 'ok':
-            dlg_info.title = "Добавление ребёнка"
-            dlg_info.content = ft.Text(
-                f"{new_child.name.value} добавлен(-а) в группу №{new_child.group.value}. Информация отправлена воспитателям.",
-                width=600, size=16, weight=ft.FontWeight.W_200
-            )
-            change_screen('main')
-            dlg_info.open()
+        db.execute(query, (new_child.name.value, new_child.group.value,
+                           f"{new_child.birth_year.value}-{month}-{new_child.birth_day.value}",
+                           new_child.caption.value, new_child.parent_name.value, f"+7{new_child.phone.value}", pass_phrase,))
+        invalidate_stats()
+        dlg_info.title = "Добавление ребёнка"
+        dlg_info.content = ft.Text(
+            f"{new_child.name.value} добавлен(-а) в группу №{new_child.group.value}. Информация отправлена воспитателям.",
+            width=600, size=16, weight=ft.FontWeight.W_200
+        )
+        change_screen('main')
+        dlg_info.open()
 
+    @db_errors_handled
     def add_new_mentor():
         query = "INSERT INTO crodconnect.mentors (name, group_num, pass_phrase) VALUES (%s, %s, %s)"
         name = new_mentor.name.value.strip()
         pass_phrase = create_passphrase(name)
-        response = make_db_request(query, (name, new_mentor.group.value, pass_phrase))
-        if response is not None:
-            change_screen("mentors_info")
-            open_sb("Воспитатель добавлен", ft.colors.GREEN)
+        db.execute(query, (name, new_mentor.group.value, pass_phrase))
+        change_screen("mentors_info")
+        open_sb("Воспитатель добавлен", ft.colors.GREEN)
 
+    @db_errors_handled
     def add_new_module():
         dlg_loading.loading_text = "Добавляем модуль"
         dlg_loading.open()
         query = "INSERT INTO crodconnect.modules (name, seats_max, location) VALUES (%s, %s, %s)"
-        make_db_request(query, (new_module.module_name.value, new_module.seats_count.value, new_module.locations_dropdown.value))
+        db.execute(query, (new_module.module_name.value, new_module.seats_count.value, new_module.locations_dropdown.value))
 
         query = "SELECT id FROM crodconnect.modules WHERE name = %s"
-        module_id = make_db_request(query, (new_module.module_name.value,))['id']
+        module_id = db.fetch_scalar(query, (new_module.module_name.value,))
 
         query = "INSERT INTO crodconnect.teachers (name, module_id, pass_phrase) VALUES (%s, %s, %s)"
         name = new_module.teacher_name.value.strip()
         pass_phrase = create_passphrase(name)
 
-        response = make_db_request(query, (name, module_id, pass_phrase,))
+        db.execute(query, (name, module_id, pass_phrase,))
+        invalidate_catalogue(module_id)
         dlg_loading.close()
-        if response is not None:
-            change_screen("modules_info")
-            open_sb("Модуль добавлен", ft.colors.GREEN)
+        change_screen("modules_info")
+        open_sb("Модуль добавлен", ft.colors.GREEN)
 
+    @db_errors_handled
     def add_new_admin():
         query = "INSERT INTO crodconnect.admins (name, pass_phrase, password, post, access) VALUES (%s, %s, %s, %s, %s)"
         name = new_admin.name.value.strip()
@@ -433,25 +500,27 @@ def main(page: ft.Page):
         access = 1 if new_admin.panel_access.value else 0
         pass_phrase = create_passphrase(name)
         password = create_password()
-        response = make_db_request(query, (name, pass_phrase, password, post, access,))
-        if response is not None:
-            change_screen("admins_info")
-            open_sb("Администратор добавлен", ft.colors.GREEN)
+        db.execute(query, (name, pass_phrase, password, post, access,))
+        change_screen("admins_info")
+        open_sb("Администратор добавлен", ft.colors.GREEN)
 
+    @db_errors_handled
     def remove_mentor(e: ft.ControlEvent):
         query = "DELETE FROM crodconnect.mentors WHERE pass_phrase = %s"
-        make_db_request(query, (e.control.data,))
-        if db.result['status'] == "ok":
-            open_sb("Воспитатель удалён")
-            change_screen("mentors_info")
+        db.execute(query, (e.control.data,))
+        invalidate_identity()
+        open_sb("Воспитатель удалён")
+        change_screen("mentors_info")
 
+    @db_errors_handled
     def remove_admin(e: ft.ControlEvent):
         query = "DELETE FROM crodconnect.admins WHERE pass_phrase = %s"
-        make_db_request(query, (e.control.data,))
-        if db.result['status'] == "ok":
-            open_sb("Администратор удалён")
-            change_screen("admins_info")
+        db.execute(query, (e.control.data,))
+        invalidate_identity()
+        open_sb("Администратор удалён")
+        change_screen("admins_info")
 
+    @db_errors_handled
     def remove_module(e: ft.ControlEvent):
         dlg_loading.loading_text = "Удаление модуля"
         dlg_loading.open()
@@ -463,12 +532,12 @@ def main(page: ft.Page):
         DELETE FROM crodconnect.modules WHERE id = (SELECT module_id FROM crodconnect.teachers WHERE pass_phrase = %s);
         DELETE FROM crodconnect.teachers WHERE pass_phrase = %s;
         """
-        make_db_request(query, (pass_phrase, pass_phrase, pass_phrase,))
+        db.execute(query, (pass_phrase, pass_phrase, pass_phrase,))
+        invalidate_identity()
+        invalidate_catalogue()
         dlg_loading.close()
-        db.reconnect()
-        if db.result['status'] == "ok":
-            open_sb("Модуль удалён")
-            change_screen("modules_info")
+        open_sb("Модуль удалён")
+        change_screen("modules_info")
 
     def goto_remove_module(e: ft.ControlEvent):
         page.session.set('remove_module_pass_phrase', e.control.data)
@@ -497,6 +566,7 @@ def main(page: ft.Page):
         bottom_sheet.open()
         bottom_sheet.sheet.data = e.control.data
 
+    @db_errors_handled
     def set_child_group(new_group: int):
         bottom_sheet.close()
         dlg_loading.loading_text = "Обновляем"
@@ -505,243 +575,165 @@ def main(page: ft.Page):
         child = bottom_sheet.sheet.data
 
         query = "UPDATE crodconnect.children SET group_num = %s WHERE pass_phrase = %s"
-        make_db_request(query, (new_group, child['pass_phrase'],))
+        db.execute(query, (new_group, child['pass_phrase'],))
+        invalidate_identity(child['telegram_id'])
+        invalidate_stats()
         dlg_loading.close()
-        if db.result['status'] == "ok":
-            dlg_info.title = "Изменение группы"
-            dlg_info.content = ft.Text(
-                f"{child['name']} переведен(-а) в группу №{new_group}. Информация отправлена воспитателям.",
-                width=600, size=16, weight=ft.FontWeight.W_200
-            )
-            dlg_info.open()
+        dlg_info.title = "Изменение группы"
+        dlg_info.content = ft.Text(
+            f"{child['name']} переведен(-а) в группу №{new_group}. Информация отправлена воспитателям.",
+            width=600, size=16, weight=ft.FontWeight.W_200
+        )
+        dlg_info.open()
 
-            query = "SELECT * FROM crodconnect.mentors WHERE group_num = %s AND status = 'active'"
-            mentors = make_db_request(query, (new_group,))
-            if type(mentors) == dict: mentors = [mentors]
-            for mentor in mentors:
-                send_telegam_message(
-                    tID=mentor['telegram_id'],
-                    message_text=f"{' '.join(mentor['name'].split()[1:])}, в вашу группу переведен(-а) *{child['name']}*"
-                                 f"\n\n*Дата рождения:* {convert_date(str(child['birth']))}"
-                                 f"\n*Особенности:* {child['comment']}"
-                                 f"\n*Родитель:* {child['parrent_name']} ({child['parrent_phone']})"
-                )
+        query = "SELECT * FROM crodconnect.mentors WHERE group_num = %s AND status = 'active'"
+        mentors = db.fetch_all(query, (new_group,))
+        for mentor in mentors:
+            queue_telegam_message(
+                tID=mentor['telegram_id'],
+                message_text=f"{' '.join(mentor['name'].split()[1:])}, в вашу группу переведен(-а) *{child['name']}*"
+                             f"\n\n*Дата рождения:* {convert_date(str(child['birth']))}"
+                             f"\n*Особенности:* {child['comment']}"
+                             f"\n*Родитель:* {child['parrent_name']} ({child['parrent_phone']})"
+            )
 
+    @db_errors_handled
     def change_mentor_group(new_group: int):
         bottom_sheet.close()
         dlg_loading.loading_text = "Обновляем"
         dlg_loading.open()
         query = "UPDATE crodconnect.mentors SET group_num = %s WHERE pass_phrase = %s"
-        make_db_request(query, (new_group, bottom_sheet.sheet.data,))
+        db.execute(query, (new_group, bottom_sheet.sheet.data,))
         dlg_loading.close()
-        if db.result['status'] == "ok":
-            change_screen('mentors_info')
-            open_sb("Группа изменена", ft.colors.GREEN)
-
-            query = "SELECT telegram_id from crodconnect.mentors WHERE pass_phrase = %s"
-            mentor_tid = make_db_request(query, (bottom_sheet.sheet.data,))['telegram_id']
-            if db.result['status'] == "ok":
-                send_telegam_message(
-                    tID=mentor_tid,
-                    message_text="*Изменение группы*"
-                                 f"\n\nВы были переведены администратором в *группу №{new_group}*"
-                )
+        change_screen('mentors_info')
+        open_sb("Группа изменена", ft.colors.GREEN)
+
+        query = "SELECT telegram_id from crodconnect.mentors WHERE pass_phrase = %s"
+        mentor_tid = db.fetch_scalar(query, (bottom_sheet.sheet.data,))
+        invalidate_identity(mentor_tid)
+        queue_telegam_message(
+            tID=mentor_tid,
+            message_text="*Изменение группы*"
+                         f"\n\nВы были переведены администратором в *группу №{new_group}*"
+        )
 
     def open_menu_drawer(e):
         page.drawer.open = True
         page.update()
 
     def generate_document(e: ft.ControlEvent):
-        dlg_loading.loading_text = "Генерируем документ"
-        dlg_loading.open()
-
-        doctype = e.control.data['doctype']
-        pdf_filepaths = []
+        tasks.run(
+            build_document, e.control.data['doctype'],
+            title="Генерируем документ", cancellable=True,
+            on_cancel=lambda: open_sb("Генерация отменена")
+        )
 
-        query = "SELECT telegram_id from crodconnect.admins WHERE password = %s"
-        response = make_db_request(query, (password_field.value,))
+    @db_errors_handled
+    def build_document(task: BackgroundTask, doctype: str):
+        query = build_select('admins', ('password',), ('telegram_id',))
+        response = db.fetch_one_prepared(query, (password_field.value,))
+
+        def show_progress(done: int, total: int):
+            task.progress(f"Генерируем документ ({done}/{total})", force=done == total)
+
+        def send_documents(documents: list, filename: str, title: str):
+            # документы склеиваются в памяти и отправляются одним файлом
+            task.progress("Отправляем документ", force=True)
+            if send_telegram_document(
+                    tID=response['telegram_id'],
+                    description=caption + title + "\n\n#документы",
+                    content=wording.wording.merge_pdf(documents),
+                    filename=filename
+            ):
+                open_sb("Документ отправлен в Telegram", ft.colors.GREEN)
+            else:
+                open_sb("Ошибка отправки в Telegram", ft.colors.RED)
 
         if is_telegrammed('docs'):
             caption = "*Генерация документов*\n\n"
-            merger = PdfMerger()
 
             if doctype == "groups":
+                query = "SELECT * FROM crodconnect.children WHERE group_num BETWEEN 1 AND 5"
+                children = db.fetch_all(query)
 
+                jobs = []
                 for group_num in range(1, 6):
-                    dlg_loading.dialog.content.controls[0].controls[0].value = f"Генерируем документ (группа {group_num}/{5})"
-                    page.update()
-
-                    query = "SELECT * FROM crodconnect.children WHERE group_num = %s"
-                    group_list = make_db_request(query, (group_num,))
-
-                    if group_list is not None:
-                        if group_list:
-                            group_list.sort(key=lambda el: el['name'])
-
-                            group_list_filename = wording.wording.get_grouplist(group_list, group_num)
-                            filepath = f"{current_directory}/wording/generated/{group_list_filename}.pdf"
-
-                            merger.append(filepath)
-                            pdf_filepaths.append(group_list_filename)
-
-                merged_filepath = f"{current_directory}/wording/generated/grouplist.pdf"
-                merger.write(merged_filepath)
-                merger.close()
-
-                caption += "Списки групп с информацией о детях"
-                if send_telegram_document(
-                        tID=response['telegram_id'],
-                        filepath=merged_filepath,
-                        description=caption + "\n\n#документы"
-                ):
-                    open_sb("Документ отправлен в Telegram", ft.colors.GREEN)
-                    remove_folder_content(f"{current_directory}/wording/generated")
+                    group_list = [child for child in children if child['group_num'] == group_num]
+                    if group_list:
+                        group_list.sort(key=lambda el: el['name'])
+                        jobs.append((wording.wording.get_grouplist, group_list, group_num))
+
+                if jobs:
+                    documents = wording.wording.render_many(jobs, show_progress)
+                    send_documents(documents, "grouplist.pdf", "Списки групп с информацией о детях")
                 else:
-                    open_sb("Ошибка Telegram", ft.colors.RED)
-
-                if os.path.exists(merged_filepath):
-                    os.remove(merged_filepath)
-                for pdf in pdf_filepaths:
-                    if os.path.exists(pdf):
-                        os.remove(pdf)
+                    open_sb("Список детей пуст")
 
             elif doctype == "qr":
+                query = "SELECT * FROM crodconnect.children WHERE group_num BETWEEN 1 AND 5 AND status = 'waiting_for_registration'"
+                children = db.fetch_all(query)
 
+                jobs = []
                 # для групп детей
                 for group_num in range(1, 6):
-                    dlg_loading.dialog.content.controls[0].controls[0].value = f"Генерируем документ (группа {group_num}/{5})"
-                    page.update()
-
-                    query = "SELECT * FROM crodconnect.children WHERE group_num = %s AND status = 'waiting_for_registration'"
-                    group_list = make_db_request(query, (group_num,))
-
-                    if group_list is not None:
-                        if group_list:
-                            group_list.sort(key=lambda el: el['name'])
-
-                            qr_list_groups_filename = wording.wording.get_qr_list("children", group_list, str(group_num))
-                            filepath = f"{current_directory}/wording/generated/{qr_list_groups_filename}.pdf"
-
-                            merger.append(filepath)
-                            pdf_filepaths.append(qr_list_groups_filename)
+                    group_list = [child for child in children if child['group_num'] == group_num]
+                    if group_list:
+                        group_list.sort(key=lambda el: el['name'])
+                        jobs.append((wording.wording.get_qr_list, "children", group_list, str(group_num)))
 
                 for s in ['mentors', 'teachers']:
-                    dlg_loading.dialog.content.controls[0].controls[0].value = f"Генерируем документ ({s})"
-                    page.update()
-
-                    query = f"SELECT * FROM {s} WHERE status = 'waiting_for_registration'"
-                    group_list = make_db_request(query)
+                    query = build_select(s, ('status',))
+                    group_list = db.fetch_prepared(query, ('waiting_for_registration',))
+                    if group_list:
+                        jobs.append((wording.wording.get_qr_list, s, group_list))
+
+                if jobs:
+                    documents = wording.wording.render_many(jobs, show_progress)
+                    send_documents(documents, "qrlist.pdf", "Таблица QR-кодов для регистрации в Telegram-бота")
+                else:
+                    open_sb("Все пользователи зарегистрированы")
 
-                    if group_list is not None:
-                        if type(group_list) == dict: group_list = [group_list]
-                        if group_list:
-                            qr_list_groups_filename = wording.wording.get_qr_list(s, group_list)
-                            filepath = f"{current_directory}/wording/generated/{qr_list_groups_filename}.pdf"
-                            merger.append(filepath)
-                            pdf_filepaths.append(qr_list_groups_filename)
+            elif doctype == "modules":
+                query = "SELECT * FROM crodconnect.modules WHERE status = 'active'"
+                modules_list = db.fetch_all(query)
 
-                merged_filepath = f"{current_directory}/wording/generated/qrlist.pdf"
-                merger.write(merged_filepath)
-                merger.close()
+                jobs = []
+                for module in modules_list:
+                    task.check()
+                    query = "SELECT * FROM crodconnect.teachers WHERE module_id = %s"
+                    teacher_info = db.fetch_one(query, (module['id'],))
 
-                caption += "Таблица QR-кодов для регистрации в Telegram-бота"
-                if send_telegram_document(
-                        tID=response['telegram_id'],
-                        filepath=merged_filepath,
-                        description=caption + "\n\n#документы"
-                ):
-                    open_sb("Документ отправлен в Telegram", ft.colors.GREEN)
-                else:
-                    open_sb("Ошибка отправки в Telegram", ft.colors.RED)
+                    query = "SELECT * FROM crodconnect.children WHERE id in (SELECT child_id FROM crodconnect.modules_records WHERE module_id = %s)"
+                    children_list = db.fetch_all(query, (module['id'],))
 
-                remove_folder_content(f"{current_directory}/wording/qr")
-                remove_folder_content(f"{current_directory}/wording/generated")
+                    if children_list:
+                        children_list.sort(key=lambda el: el['name'])
+                        jobs.append((wording.wording.get_module_parts, children_list, module, teacher_info))
 
-                if os.path.exists(merged_filepath):
-                    os.remove(merged_filepath)
-                for pdf in pdf_filepaths:
-                    if os.path.exists(pdf):
-                        os.remove(pdf)
+                if jobs:
+                    documents = wording.wording.render_many(jobs, show_progress)
+                    send_documents(documents, "modulelist.pdf", "Состав образовательных модулей")
+                else:
+                    open_sb("Записи на модули отсутствуют")
 
-            elif doctype == "modules":
-                query = "SELECT * FROM crodconnect.modules WHERE status = 'active'"
-                modules_list = make_db_request(query)
-
-                if db.result['status'] == 'ok':
-                    if type(modules_list) == dict: modules_list = [modules_list]
-                    if modules_list:
-                        merger = PdfMerger()
-
-                        for module in modules_list:
-                            dlg_loading.dialog.content.controls[0].controls[0].value = f"Генерируем документ ({module['name'][:10]}...)"
-                            page.update()
-
-                            query = "SELECT * FROM crodconnect.teachers WHERE module_id = %s"
-                            teacher_info = make_db_request(query, (module['id'],))
-
-                            if db.result['status'] == "ok":
-                                query = "SELECT * FROM crodconnect.children WHERE id in (SELECT child_id FROM crodconnect.modules_records WHERE module_id = %s)"
-                                children_list = make_db_request(query, (module['id'],))
-
-                                if db.result['status'] == "ok":
-                                    if type(children_list) == dict: children_list = [children_list]
-                                    if children_list:
-                                        children_list.sort(key=lambda el: el['name'])
-
-                                        filename = wording.wording.get_module_parts(children_list, module, teacher_info)
-                                        filepath = f"{current_directory}/wording/generated/{filename}.pdf"
-
-                                        merger.append(filepath)
-                                        pdf_filepaths.append(filename)
-
-                        if len(pdf_filepaths) > 0:
-                            merged_filepath = f"{current_directory}/wording/generated/modulelist.pdf"
-                            merger.write(merged_filepath)
-                            merger.close()
-
-                            caption += "Состав образовательных модулей"
-
-                            if send_telegram_document(
-                                    tID=response['telegram_id'],
-                                    filepath=merged_filepath,
-                                    description=caption + "\n\n#документы"
-                            ):
-                                open_sb("Документ отправлен в Telegram", ft.colors.GREEN)
-                            else:
-                                open_sb("Ошибка отправки в Telegram", ft.colors.RED)
-
-                            remove_folder_content(f"{current_directory}/wording/generated")
-                            if os.path.exists(merged_filepath):
-                                os.remove(merged_filepath)
-                        else:
-                            open_sb("Записи на модули отсутствуют")
-                        for pdf in pdf_filepaths:
-                            if os.path.exists(pdf):
-                                os.remove(pdf)
             elif doctype == "navigation":
-                shift = load_config_file('config.json')['shift']
+                shift = config_service.load()['shift']
                 shift_name = shift['shift_list'][shift['current_shift']]['name']
 
                 query = "SELECT * FROM crodconnect.modules WHERE status = 'active'"
-                modules = make_db_request(query)
-
-                if db.result['status'] == "ok":
-                    if type(modules) == dict: modules = [modules]
-                    navigation_filename = wording.wording.get_modules_navigation(modules, shift_name)
-                    filepath = f"{current_directory}/wording/generated/{navigation_filename}.pdf"
+                modules = db.fetch_all(query)
 
-                    caption += "Навигация по образовательным модулям"
+                document = wording.wording.get_modules_navigation(modules, shift_name)
 
-                    if send_telegram_document(
-                            tID=response['telegram_id'],
-                            filepath=filepath,
-                            description=caption + "\n\n#документы"
-                    ):
-                        open_sb("Документ отправлен в Telegram", ft.colors.GREEN)
-                    else:
-                        open_sb("Ошибка Telegram", ft.colors.RED)
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
+                if send_telegram_document(
+                        tID=response['telegram_id'],
+                        description=caption + "Навигация по образовательным модулям\n\n#документы",
+                        content=document.content,
+                        filename=document.filename
+                ):
+                    open_sb("Документ отправлен в Telegram", ft.colors.GREEN)
+                else:
+                    open_sb("Ошибка Telegram", ft.colors.RED)
 
             elif doctype == 'badge':
                 query = """
@@ -751,61 +743,28 @@ def main(page: ft.Page):
                     UNION
                     SELECT name, 'admins' AS post_, post AS caption FROM crodconnect.admins WHERE status != 'creator';
                 """
-                users = make_db_request(query)
-                if db.result['status'] == 'ok':
-                    for user in users:
-                        if user['post_'] == 'mentors':
-                            user['caption'] = f"Воспитатель {user['caption']} группы"
-
-                        if not user['caption']: user['caption'] = ''
-                        wording.wording.fill_badge(
-                            user['post_'],
-                            user['name'],
-                            user['caption']
-                        )
-                    badges_filepaths = [file for file in os.listdir(f"{current_directory}/wording/generated") if file.startswith('badge_')]
-
-                    def chunked_iterable(iterable, size):
-                        it = iter(iterable)
-                        return iter(lambda: list(islice(it, size)), [])
-
-                    chunks = list(chunked_iterable(badges_filepaths, 8))
-
-                    final_badges = []
-                    for index, chunk in enumerate(chunks):
-                        filepath = f"{current_directory}/wording/generated/badges_list_{index}.png"
-                        final_badges.append(filepath)
-                        wording.wording.create_badge_sheet(
-                            final_file_name=filepath,
-                            insert_paths=chunk
-                        )
+                users = db.fetch_all(query)
+                for user in users:
+                    if user['post_'] == 'mentors':
+                        user['caption'] = f"Воспитатель {user['caption']} группы"
 
-                    pdf_filename = f"{current_directory}/wording/generated/badges_all_{datetime.datetime.now().strftime('%Y_%m_%d')}.pdf"
-                    wording.wording.images_to_pdf(filepath_list=final_badges, output_filename=pdf_filename)
+                    if not user['caption']: user['caption'] = ''
 
-                    caption += "Набор бейджей"
+                if users:
+                    document = wording.wording.get_badges(users)
 
                     if send_telegram_document(
                             tID=response['telegram_id'],
-                            filepath=pdf_filename,
-                            description=caption + "\n\n#документы"
+                            description=caption + "Набор бейджей\n\n#документы",
+                            content=document.content,
+                            filename=document.filename
                     ):
                         open_sb("Документ отправлен в Telegram", ft.colors.GREEN)
                     else:
                         open_sb("Ошибка Telegram", ft.colors.RED)
+                else:
+                    open_sb("Список сотрудников пуст")
 
-                    if os.path.exists(pdf_filename):
-                        os.remove(pdf_filename)
-
-                    for filepath in badges_filepaths:
-                        if os.path.exists(f"{current_directory}/wording/generated/{filepath}"):
-                            os.remove(f"{current_directory}/wording/generated/{filepath}")
-
-                    for filepath in final_badges:
-                        if os.path.exists(filepath):
-                            os.remove(filepath)
-
-        pdf_filepaths.clear()
         dlg_loading.close()
 
     def get_document_card(title: str, sb: str, icon: ft.icons, doctype: str):
@@ -824,7 +783,7 @@ def main(page: ft.Page):
         target = e.control.data['target']
 
         if target == 'modules_info':
-            module_record_open = load_config_file('config.json')['module_record']
+            module_record_open = config_service.load()['module_record']
             if module_record_open:
                 module_record_tile = ft.ListTile(
                     title=ft.Text('Закрыть запись'),
@@ -906,15 +865,13 @@ def main(page: ft.Page):
         dlg_info.open()
 
     def set_current_shift(e: ft.ControlEvent):
-        config = load_config_file('config.json')
-        config['shift']['current_shift'] = e.control.data['shift_index']
-        update_config_file(config, 'config.json')
+        config_service.update({'shift': {'current_shift': e.control.data['shift_index']}})
         bottom_sheet.close()
         change_screen("main")
         reboot_systemd('crod_connect_bot')
 
     def change_current_shift(e: ft.ControlEvent):
-        shift_list = load_config_file('config.json')['shift']['shift_list']
+        shift_list = config_service.load()['shift']['shift_list']
 
         shifts_col = ft.Column()
         for index, shift in enumerate(shift_list):
@@ -941,11 +898,13 @@ def main(page: ft.Page):
         bottom_sheet.height = 1000
         bottom_sheet.open()
 
+    @db_errors_handled
     def change_screen(target: str):
         logging.info(f"Changing screen to: {target}")
 
         bottom_sheet.close()
         page.controls.clear()
+        service_indicators.clear()
         page.appbar.visible = False
         page.appbar.actions.clear()
         page.scroll = screens[target]['scroll_mode']
@@ -973,10 +932,10 @@ def main(page: ft.Page):
             page.add(ft.Container(login_col, expand=True))
 
         elif target == "main":
-            shift = load_config_file('config.json')['shift']
+            shift = config_service.load()['shift']
             current_shift_info = shift['shift_list'][shift['current_shift']]
-            query = "SELECT * FROM crodconnect.admins WHERE password = %s"
-            admin = make_db_request(query, (password_field.value,))
+            query = build_select('admins', ('password',))
+            admin = db.fetch_one_prepared(query, (password_field.value,))
 
             systemd_pb = ft.ProgressBar()
 
@@ -1104,17 +1063,19 @@ def main(page: ft.Page):
             page.add(col)
             page.update()
 
-            systemd_list = get_system_list()
-            if systemd_list:
-                systemd_card.surface_tint_color = ft.colors.RED
-                systemd_text.value = "Обнаружены нерабочие сервисы"
-                systemd_btn.visible = True
-            else:
-                systemd_card.surface_tint_color = ft.colors.GREEN
-                systemd_text.value = "Все сервисы работают корректно"
-                systemd_btn.visible = False
+            def show_system_state(statuses: dict = None):
+                if get_system_list(statuses):
+                    systemd_card.surface_tint_color = ft.colors.RED
+                    systemd_text.value = "Обнаружены нерабочие сервисы"
+                    systemd_btn.visible = True
+                else:
+                    systemd_card.surface_tint_color = ft.colors.GREEN
+                    systemd_text.value = "Все сервисы работают корректно"
+                    systemd_btn.visible = False
+                systemd_pb.visible = False
 
-            systemd_pb.visible = False
+            show_system_state()
+            service_indicators['main'] = show_system_state
             page.update()
 
         elif target == "edit_env":
@@ -1159,85 +1120,81 @@ def main(page: ft.Page):
             dlg_loading.open()
 
             query = "SELECT * FROM crodconnect.modules WHERE status = 'active'"
-            admins_list = make_db_request(query)
-            if admins_list is not None:
-                if type(admins_list) == dict: admins_list = [admins_list]
-                col = ft.ResponsiveRow(columns=3)
-                for admin in admins_list:
-                    query = "SELECT * FROM crodconnect.teachers WHERE module_id = %s"
-                    teacher_info = make_db_request(query, (admin['id'],))
-                    if teacher_info is not None:
-                        popup_items = [
-                            ft.FilledButton(text='Изменить локацию', icon=ft.icons.LOCATION_ON, on_click=show_qr,
-                                            data={'phrase': f"teachers_{teacher_info['pass_phrase']}", 'caption': teacher_info['name']}),
-                            ft.FilledButton(text='QR-код', icon=ft.icons.QR_CODE, on_click=show_qr, data={'phrase': f"teachers_{teacher_info['pass_phrase']}", 'caption': teacher_info['name']}),
-                            ft.FilledButton(text='Удалить', icon=ft.icons.DELETE, data=teacher_info['pass_phrase'], on_click=goto_remove_module),
-                        ]
+            admins_list = db.fetch_all(query)
+            col = ft.ResponsiveRow(columns=3)
+            for admin in admins_list:
+                query = "SELECT * FROM crodconnect.teachers WHERE module_id = %s"
+                teacher_info = db.fetch_one(query, (admin['id'],))
+                if teacher_info is not None:
+                    popup_items = [
+                        ft.FilledButton(text='Изменить локацию', icon=ft.icons.LOCATION_ON, on_click=show_qr,
+                                        data={'phrase': f"teachers_{teacher_info['pass_phrase']}", 'caption': teacher_info['name']}),
+                        ft.FilledButton(text='QR-код', icon=ft.icons.QR_CODE, on_click=show_qr, data={'phrase': f"teachers_{teacher_info['pass_phrase']}", 'caption': teacher_info['name']}),
+                        ft.FilledButton(text='Удалить', icon=ft.icons.DELETE, data=teacher_info['pass_phrase'], on_click=goto_remove_module),
+                    ]
 
-                        card = ft.Card(
-                            ft.Container(
-                                content=ft.Column(
-                                    [
-                                        ft.Row(
-                                            [
-                                                ft.Container(
-                                                    ft.ListTile(
-                                                        title=ft.Text(admin['name'], size=16),
-                                                        subtitle=ft.Text(teacher_info['name'], size=14),
-                                                        leading=ft.Icon(
-                                                            ft.icons.ARTICLE,
-                                                            color=user_statuses[teacher_info['status']]['color'],
-                                                            tooltip=user_statuses[teacher_info['status']]['naming']
-                                                        )
-                                                    ),
-                                                    expand=True
+                    card = ft.Card(
+                        ft.Container(
+                            content=ft.Column(
+                                [
+                                    ft.Row(
+                                        [
+                                            ft.Container(
+                                                ft.ListTile(
+                                                    title=ft.Text(admin['name'], size=16),
+                                                    subtitle=ft.Text(teacher_info['name'], size=14),
+                                                    leading=ft.Icon(
+                                                        ft.icons.ARTICLE,
+                                                        color=user_statuses[teacher_info['status']]['color'],
+                                                        tooltip=user_statuses[teacher_info['status']]['naming']
+                                                    )
                                                 ),
-                                                ft.PopupMenuButton(
-                                                    items=popup_items
-                                                )
-                                            ]
-                                        ),
-                                        ft.ListTile(
-                                            # title=ft.Text('Локация', size=14),
-                                            title=ft.Text(admin['location'], size=16),
-                                            subtitle=ft.Text(f"{admin['seats_real']} из {admin['seats_max']}", size=14),
-                                            leading=ft.Icon(ft.icons.LOCATION_ON)
-                                        ),
-                                    ],
-                                    spacing=0.5
-                                ),
-                                padding=ft.padding.only(top=15, bottom=15)
+                                                expand=True
+                                            ),
+                                            ft.PopupMenuButton(
+                                                items=popup_items
+                                            )
+                                        ]
+                                    ),
+                                    ft.ListTile(
+                                        # title=ft.Text('Локация', size=14),
+                                        title=ft.Text(admin['location'], size=16),
+                                        subtitle=ft.Text(f"{admin['seats_real']} из {admin['seats_max']}", size=14),
+                                        leading=ft.Icon(ft.icons.LOCATION_ON)
+                                    ),
+                                ],
+                                spacing=0.5
                             ),
-                            width=600,
-                            col={"lg": 1}
-                        )
-                        col.controls.append(card)
-                if not admins_list:
-                    col.controls.append(
-                        ft.Row([ft.FilledTonalButton(text='Создать модуль', icon=ft.icons.CREATE_NEW_FOLDER, on_click=lambda _: change_screen('create_module'))], alignment=ft.MainAxisAlignment.CENTER)
+                            padding=ft.padding.only(top=15, bottom=15)
+                        ),
+                        width=600,
+                        col={"lg": 1}
                     )
-                page.add(col)
-                dlg_loading.close()
+                    col.controls.append(card)
+            if not admins_list:
+                col.controls.append(
+                    ft.Row([ft.FilledTonalButton(text='Создать модуль', icon=ft.icons.CREATE_NEW_FOLDER, on_click=lambda _: change_screen('create_module'))], alignment=ft.MainAxisAlignment.CENTER)
+                )
+            page.add(col)
+            dlg_loading.close()
 
         elif target == "edit_child_group_num":
             query = "SELECT * FROM crodconnect.children"
-            data = make_db_request(query)
-            if db.result['status'] == "ok":
-                if type(data) == dict: data = [data]
-                page.session.set('children_list', data)
-                col = ft.Column(
-                    controls=[
-                        ft.TextField(
-                            label="ФИО ребёнка",
-                            prefix_icon=ft.icons.CHILD_CARE,
-                            hint_text="Иванов Иван Иванович",
-                            on_change=find_child
-                        ),
-                        child_col
-                    ],
-                    width=600
-                )
-                page.add(col)
+            data = db.fetch_all(query)
+            page.session.set('children_list', data)
+            col = ft.Column(
+                controls=[
+                    ft.TextField(
+                        label="ФИО ребёнка",
+                        prefix_icon=ft.icons.CHILD_CARE,
+                        hint_text="Иванов Иван Иванович",
+                        on_change=find_child
+                    ),
+                    child_col
+                ],
+                width=600
+            )
+            page.add(col)
 
         elif target == "add_child":
             new_child.reset()
@@ -1297,50 +1254,49 @@ def main(page: ft.Page):
             dlg_loading.loading_text = "Загрузка"
             dlg_loading.open()
             query = "SELECT * FROM crodconnect.mentors"
-            mentors_list = make_db_request(query)
-            if mentors_list is not None:
-                col = ft.Column()
-                for mentor in mentors_list:
-                    popup_items = [
-                        ft.FilledButton(text='Изменить группу', icon=ft.icons.EDIT, on_click=goto_change_mentor_group, data=mentor['pass_phrase']),
-                        ft.FilledButton(text='QR-код', icon=ft.icons.QR_CODE, on_click=show_qr, data={'phrase': f"mentors_{mentor['pass_phrase']}", 'caption': mentor['name']}),
-                        ft.FilledButton(text='Удалить', icon=ft.icons.DELETE, data=mentor['pass_phrase'], on_click=remove_mentor),
-                    ]
+            mentors_list = db.fetch_all(query)
+            col = ft.Column()
+            for mentor in mentors_list:
+                popup_items = [
+                    ft.FilledButton(text='Изменить группу', icon=ft.icons.EDIT, on_click=goto_change_mentor_group, data=mentor['pass_phrase']),
+                    ft.FilledButton(text='QR-код', icon=ft.icons.QR_CODE, on_click=show_qr, data={'phrase': f"mentors_{mentor['pass_phrase']}", 'caption': mentor['name']}),
+                    ft.FilledButton(text='Удалить', icon=ft.icons.DELETE, data=mentor['pass_phrase'], on_click=remove_mentor),
+                ]
 
-                    if mentor['status'] == 'active':
-                        popup_items.insert(0, ft.FilledButton(text='Отключить', icon=ft.icons.BLOCK, on_click=change_active_status, data=f"mentors_{mentor['pass_phrase']}_frozen"), )
-                    elif mentor['status'] == 'frozen':
-                        popup_items.insert(0, ft.FilledButton(text='Активировать', icon=ft.icons.ADD, on_click=change_active_status, data=f"mentors_{mentor['pass_phrase']}_active"), )
-
-                    col.controls.append(
-                        ft.Card(
-                            ft.Container(
-                                content=ft.Row(
-                                    [
-                                        ft.Container(
-                                            ft.ListTile(
-                                                title=ft.Text(mentor['name']),
-                                                subtitle=ft.Text(f"Группа №{mentor['group_num']}"),
-                                                leading=ft.Icon(
-                                                    ft.icons.ACCOUNT_CIRCLE,
-                                                    color=user_statuses[mentor['status']]['color'],
-                                                    tooltip=user_statuses[mentor['status']]['naming']
-                                                )
-                                            ),
-                                            expand=True
+                if mentor['status'] == 'active':
+                    popup_items.insert(0, ft.FilledButton(text='Отключить', icon=ft.icons.BLOCK, on_click=change_active_status, data=f"mentors_{mentor['pass_phrase']}_frozen"), )
+                elif mentor['status'] == 'frozen':
+                    popup_items.insert(0, ft.FilledButton(text='Активировать', icon=ft.icons.ADD, on_click=change_active_status, data=f"mentors_{mentor['pass_phrase']}_active"), )
+
+                col.controls.append(
+                    ft.Card(
+                        ft.Container(
+                            content=ft.Row(
+                                [
+                                    ft.Container(
+                                        ft.ListTile(
+                                            title=ft.Text(mentor['name']),
+                                            subtitle=ft.Text(f"Группа №{mentor['group_num']}"),
+                                            leading=ft.Icon(
+                                                ft.icons.ACCOUNT_CIRCLE,
+                                                color=user_statuses[mentor['status']]['color'],
+                                                tooltip=user_statuses[mentor['status']]['naming']
+                                            )
                                         ),
-                                        ft.PopupMenuButton(
-                                            items=popup_items
-                                        )
-                                    ]
-                                ),
-                                padding=ft.padding.only(right=10)
+                                        expand=True
+                                    ),
+                                    ft.PopupMenuButton(
+                                        items=popup_items
+                                    )
+                                ]
                             ),
-                            width=600
-                        )
+                            padding=ft.padding.only(right=10)
+                        ),
+                        width=600
                     )
-                page.add(col)
-                dlg_loading.close()
+                )
+            page.add(col)
+            dlg_loading.close()
 
         elif target == "admins_info":
             page.appbar.actions = [
@@ -1352,53 +1308,51 @@ def main(page: ft.Page):
             dlg_loading.loading_text = "Загрузка"
             dlg_loading.open()
             query = "SELECT * FROM crodconnect.admins WHERE status != 'creator'"
-            admins_list = make_db_request(query)
-            if type(admins_list) == dict: admins_list = [admins_list]
+            admins_list = db.fetch_all(query)
 
-            if admins_list is not None:
-                col = ft.Column()
-                for admin in admins_list:
-                    popup_items = [
-                        ft.FilledButton(text='QR-код', icon=ft.icons.QR_CODE, on_click=show_qr, data={'phrase': f"admins_{admin['pass_phrase']}", 'caption': admin['name']}),
-                        ft.FilledButton(text='Удалить', icon=ft.icons.DELETE, data=admin['pass_phrase'], on_click=remove_admin),
-                    ]
+            col = ft.Column()
+            for admin in admins_list:
+                popup_items = [
+                    ft.FilledButton(text='QR-код', icon=ft.icons.QR_CODE, on_click=show_qr, data={'phrase': f"admins_{admin['pass_phrase']}", 'caption': admin['name']}),
+                    ft.FilledButton(text='Удалить', icon=ft.icons.DELETE, data=admin['pass_phrase'], on_click=remove_admin),
+                ]
 
-                    if admin['status'] == 'active':
-                        popup_items.insert(0, ft.FilledButton(text='Отключить', icon=ft.icons.BLOCK, on_click=change_active_status, data=f"admins_{admin['pass_phrase']}_frozen"))
-                    elif admin['status'] == 'frozen':
-                        popup_items.insert(0, ft.FilledButton(text='Активировать', icon=ft.icons.ADD, on_click=change_active_status, data=f"admins_{admin['pass_phrase']}_active"))
-
-                    if admin['password'] == password_field.value:
-                        popup_items = None
-                    col.controls.append(
-                        ft.Card(
-                            ft.Container(
-                                content=ft.Row(
-                                    [
-                                        ft.Container(
-                                            ft.ListTile(
-                                                title=ft.Text(admin['name']),
-                                                subtitle=ft.Text(f"{admin['post']}"),
-                                                leading=ft.Icon(
-                                                    ft.icons.ACCOUNT_CIRCLE,
-                                                    color=user_statuses[admin['status']]['color'],
-                                                    tooltip=user_statuses[admin['status']]['naming']
-                                                )
-                                            ),
-                                            expand=True
+                if admin['status'] == 'active':
+                    popup_items.insert(0, ft.FilledButton(text='Отключить', icon=ft.icons.BLOCK, on_click=change_active_status, data=f"admins_{admin['pass_phrase']}_frozen"))
+                elif admin['status'] == 'frozen':
+                    popup_items.insert(0, ft.FilledButton(text='Активировать', icon=ft.icons.ADD, on_click=change_active_status, data=f"admins_{admin['pass_phrase']}_active"))
+
+                if admin['password'] == password_field.value:
+                    popup_items = None
+                col.controls.append(
+                    ft.Card(
+                        ft.Container(
+                            content=ft.Row(
+                                [
+                                    ft.Container(
+                                        ft.ListTile(
+                                            title=ft.Text(admin['name']),
+                                            subtitle=ft.Text(f"{admin['post']}"),
+                                            leading=ft.Icon(
+                                                ft.icons.ACCOUNT_CIRCLE,
+                                                color=user_statuses[admin['status']]['color'],
+                                                tooltip=user_statuses[admin['status']]['naming']
+                                            )
                                         ),
-                                        ft.PopupMenuButton(
-                                            items=popup_items
-                                        )
-                                    ]
-                                ),
-                                padding=ft.padding.only(right=10)
+                                        expand=True
+                                    ),
+                                    ft.PopupMenuButton(
+                                        items=popup_items
+                                    )
+                                ]
                             ),
-                            width=600
-                        )
+                            padding=ft.padding.only(right=10)
+                        ),
+                        width=600
                     )
-                page.add(col)
-                dlg_loading.close()
+                )
+            page.add(col)
+            dlg_loading.close()
 
         elif target == "documents":
             col = ft.Column(
@@ -1499,14 +1453,13 @@ def main(page: ft.Page):
         elif target == "module_check":
             dlg_loading.loading_text = "Загрузка"
             dlg_loading.open()
-            time.sleep(0.5)
 
             module_check_info = page.session.get('modulecheck_info')
             module = module_check_info['module']
 
             query = "SELECT * FROM crodconnect.teachers WHERE module_id = %s LIMIT 1"
-            teacher_info = make_db_request(query, (module['id'],))
-            if db.result['status'] == 'ok':
+            teacher_info = db.fetch_one(query, (module['id'],))
+            if teacher_info is not None:
                 page.appbar.actions = [
                     ft.Container(
                         content=ft.Row(
@@ -1524,87 +1477,82 @@ def main(page: ft.Page):
 
             query = "SELECT * FROM crodconnect.children WHERE id IN (SELECT child_id FROM crodconnect.modules_records WHERE module_id = %s)"
 
-            children_list = make_db_request(query, (module['id'],))
-            if db.result['status'] == 'ok':
-                if type(children_list) == dict: children_list = [children_list]
+            children_list = db.fetch_all(query, (module['id'],))
 
-                if len(children_list) > 0:
-                    page.controls.clear()
-                    module_traffic_col.controls.clear()
-
-                    for child in children_list:
-                        remaining_children_traffic.append(child)
-                        module_traffic_col.controls.append(
-                            ft.Row(
-                                [
-                                    ft.Container(ft.Text(child['name'], size=16, weight=ft.FontWeight.W_200, width=300), expand=True),
-                                    ft.Checkbox(data=child, on_change=modulecheck_checkbox_changed)
-                                ]
-                            )
-                        )
+            if len(children_list) > 0:
+                page.controls.clear()
+                module_traffic_col.controls.clear()
 
+                for child in children_list:
+                    remaining_children_traffic.append(child)
                     module_traffic_col.controls.append(
                         ft.Row(
                             [
-                                ft.FilledButton(text="Сохранить", icon=ft.icons.SAVE, on_click=lambda _: update_modulecheck())
-                            ],
-                            alignment=ft.MainAxisAlignment.END
+                                ft.Container(ft.Text(child['name'], size=16, weight=ft.FontWeight.W_200, width=300), expand=True),
+                                ft.Checkbox(data=child, on_change=modulecheck_checkbox_changed)
+                            ]
                         )
                     )
 
-                    page.add(module_traffic_col)
+                module_traffic_col.controls.append(
+                    ft.Row(
+                        [
+                            ft.FilledButton(text="Сохранить", icon=ft.icons.SAVE, on_click=lambda _: update_modulecheck())
+                        ],
+                        alignment=ft.MainAxisAlignment.END
+                    )
+                )
+
+                page.add(module_traffic_col)
 
-                else:
-                    change_screen("module_check_start")
-                    dlg_info.title = "Посещаемость"
-                    dlg_info.content = ft.Text(f"На модуль «{module['name']}» пока никто не записан.", size=16, weight=ft.FontWeight.W_200)
-                    dlg_info.open()
+            else:
+                change_screen("module_check_start")
+                dlg_info.title = "Посещаемость"
+                dlg_info.content = ft.Text(f"На модуль «{module['name']}» пока никто не записан.", size=16, weight=ft.FontWeight.W_200)
+                dlg_info.open()
 
             dlg_loading.close()
 
         elif target == "module_check_start":
             dlg_loading.loading_text = "Загрузка"
             dlg_loading.open()
-            time.sleep(0.5)
 
             query = "SELECT * FROM crodconnect.modules WHERE status = 'active'"
-            modules_list = make_db_request(query)
-            if db.result['status'] == 'ok':
-                if type(modules_list) == dict: modules_list = [modules_list]
+            modules_list = db.fetch_all(query)
 
-                if len(modules_list) > 0:
-                    modules_col = ft.Column(
-                        horizontal_alignment=ft.CrossAxisAlignment.CENTER,
-                        width=600
-                    )
+            if len(modules_list) > 0:
+                modules_col = ft.Column(
+                    horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                    width=600
+                )
 
-                    for module in modules_list:
-                        modules_col.controls.append(
-                            ft.Container(
-                                ft.Row(
-                                    [
-                                        ft.Container(
-                                            content=ft.ListTile(
-                                                title=ft.Text(module['name']),
-                                                subtitle=ft.Text(module['location']),
-                                            ),
-                                            expand=True
+                for module in modules_list:
+                    modules_col.controls.append(
+                        ft.Container(
+                            ft.Row(
+                                [
+                                    ft.Container(
+                                        content=ft.ListTile(
+                                            title=ft.Text(module['name']),
+                                            subtitle=ft.Text(module['location']),
                                         ),
-                                        ft.Container(ft.Icon(ft.icons.ARROW_FORWARD_IOS), padding=ft.padding.only(right=15))
-                                    ]
-                                ),
-                                data={'module': module},
-                                on_click=goto_modulecheck
-                            )
-
+                                        expand=True
+                                    ),
+                                    ft.Container(ft.Icon(ft.icons.ARROW_FORWARD_IOS), padding=ft.padding.only(right=15))
+                                ]
+                            ),
+                            data={'module': module},
+                            on_click=goto_modulecheck
                         )
 
-                    page.add(modules_col)
+                    )
 
-                else:
-                    dlg_info.title = "Посещаемость"
-                    dlg_info.content = ft.Text("Не найдено активных образовательных модулей.", size=16, weight=ft.FontWeight.W_200)
-                    dlg_info.open()
+                page.add(modules_col)
+
+            else:
+                dlg_info.title = "Посещаемость"
+                dlg_info.content = ft.Text("Не найдено активных образовательных модулей.", size=16, weight=ft.FontWeight.W_200)
+                dlg_info.open()
 
             dlg_loading.close()
 
@@ -1728,16 +1676,18 @@ def main(page: ft.Page):
     new_child = NewChild(page=page, save_btn=btn_add_child)
     extra_users = ExtraUsers(page=page)
 
+    @db_errors_handled
     def change_active_status(e: ft.ControlEvent):
         data = e.control.data.split("_")
         target = data[0]
         pass_phrase = data[1]
         status = data[2]
 
-        query = f"UPDATE {target} SET status = %s WHERE pass_phrase = %s"
-        if make_db_request(query, (status, pass_phrase,)) is not None:
-            open_sb("Статус изменён", ft.colors.GREEN)
-            change_screen(f"{target}_info")
+        query = build_update(target, ('status',), ('pass_phrase',))
+        db.execute_prepared(query, (status, pass_phrase,))
+        invalidate_identity()
+        open_sb("Статус изменён", ft.colors.GREEN)
+        change_screen(f"{target}_info")
 
     def upload_tables(e):
         if cildren_table_picker.result is not None and cildren_table_picker.result.files is not None:
@@ -1752,19 +1702,45 @@ def main(page: ft.Page):
             dlg_loading.loading_text = "Загружаем файл"
             dlg_loading.open()
 
+            # таблица обрабатывается в table_uploaded, когда придёт событие о завершении загрузки
             cildren_table_picker.upload(upload_list)
-            time.sleep(2)
-
-            dlg_loading.close()
-            open_sb("Файл загружен", ft.colors.GREEN)
-            insert_children_info(f'assets/uploads/{file.name}')
 
         else:
             open_sb("Загрузка отменена")
 
-    cildren_table_picker = ft.FilePicker(on_result=upload_tables)
+    def table_uploaded(e: ft.FilePickerUploadEvent):
+        if e.error:
+            dlg_loading.close()
+            open_sb("Ошибка загрузки файла", ft.colors.RED)
+        elif e.progress is not None and e.progress < 1:
+            dlg_loading.set_text(f"Загружаем файл ({int(e.progress * 100)}%)")
+        else:
+            open_sb("Файл загружен", ft.colors.GREEN)
+            tasks.run(
+                insert_children_info, f'assets/uploads/{e.file_name}',
+                title="Проверяем таблицу", cancellable=True,
+                on_cancel=lambda: open_sb("Загрузка списка детей отменена")
+            )
+
+    cildren_table_picker = ft.FilePicker(on_result=upload_tables, on_upload=table_uploaded)
     page.overlay.append(cildren_table_picker)
 
+    def take_snapshot(tables: list, reason: str) -> bool:
+        # без снимка затронутых таблиц данные не удаляются
+        try:
+            snapshot_tables(tables, reason)
+            return True
+        except Exception as e:
+            logging.error(f"Backup: {e}")
+            dlg_info.title = "Резервная копия"
+            dlg_info.content = ft.Text(
+                f"Не удалось сохранить копию данных, удаление отменено.\n\nОшибка: {e}",
+                width=600, size=16, weight=ft.FontWeight.W_200
+            )
+            dlg_info.open()
+            return False
+
+    @db_errors_handled
     def password_confirmed():
         bottom_sheet.close()
         action = bottom_sheet.sheet.data[1]
@@ -1785,9 +1761,7 @@ def main(page: ft.Page):
                 width=600, size=16, weight=ft.FontWeight.W_200
             )
             dlg_info.open()
-            config = load_config_file('config.json')
-            config['module_record'] = True
-            update_config_file(config, 'config.json')
+            config_service.update({'module_record': True})
 
         elif action == "stop_modules":
             dlg_info.title = "Учебные модули"
@@ -1796,46 +1770,47 @@ def main(page: ft.Page):
                 width=600, size=16, weight=ft.FontWeight.W_200
             )
             dlg_info.open()
-            config = load_config_file('config.json')
-            config['module_record'] = False
-            update_config_file(config, 'config.json')
+            config_service.update({'module_record': False})
 
         elif action == "remove_modules":
-            mysql_backup()
-            dlg_loading.loading_text = "Удаляем модули"
-            dlg_loading.open()
+            if take_snapshot(['modules', 'teachers', 'modules_records'], "удаление модулей"):
+                dlg_loading.loading_text = "Удаляем модули"
+                dlg_loading.open()
 
-            query = "TRUNCATE TABLE crodconnect.modules_records"
-            make_db_request(query)
+                query = "TRUNCATE TABLE crodconnect.modules_records"
+                db.execute(query)
 
-            query = "TRUNCATE TABLE crodconnect.teachers"
-            make_db_request(query)
+                query = "TRUNCATE TABLE crodconnect.teachers"
+                db.execute(query)
 
-            query = "TRUNCATE TABLE crodconnect.modules"
-            if make_db_request(query) is not None:
+                query = "TRUNCATE TABLE crodconnect.modules"
+                db.execute(query)
+                invalidate_identity()
+                invalidate_catalogue()
                 open_sb("Учебные модули удалены", ft.colors.GREEN)
 
-            change_screen("modules_info")
-            dlg_loading.close()
+                change_screen("modules_info")
+                dlg_loading.close()
 
         elif action == "remove_module":
-            mysql_backup()
-            remove_module(page.session.get('remove_module_pass_phrase'))
+            if take_snapshot(['modules', 'teachers', 'modules_records'], "удаление модуля"):
+                remove_module(page.session.get('remove_module_pass_phrase'))
 
         elif action == "remove_modules_records":
-            mysql_backup()
-            dlg_loading.loading_text = "Удаляем записи"
-            dlg_loading.open()
+            if take_snapshot(['modules', 'modules_records'], "удаление записей на модули"):
+                dlg_loading.loading_text = "Удаляем записи"
+                dlg_loading.open()
 
-            query = "TRUNCATE TABLE crodconnect.modules_records"
-            make_db_request(query)
+                query = "TRUNCATE TABLE crodconnect.modules_records"
+                db.execute(query)
 
-            query = "UPDATE crodconnect.modules SET seats_real = 0"
-            if make_db_request(query) is not None:
+                query = "UPDATE crodconnect.modules SET seats_real = 0"
+                db.execute(query)
+                invalidate_catalogue()
                 open_sb("Записи на модули удалены", ft.colors.GREEN)
 
-            change_screen("modules_info")
-            dlg_loading.close()
+                change_screen("modules_info")
+                dlg_loading.close()
 
         elif action == "reboot_server":
             dlg_info.title = "Перезагрузка сервера"
@@ -1934,6 +1909,7 @@ def main(page: ft.Page):
         )
         dlg_info.open()
 
+    @db_errors_handled
     def login():
         if password_field.value.strip() == "remote@update":
             password_field.value = ''
@@ -1958,53 +1934,52 @@ def main(page: ft.Page):
             bottom_sheet.content = col
             bottom_sheet.open()
 
-        query = "SELECT * FROM crodconnect.admins WHERE password = %s"
-        admin_info = make_db_request(query, (password_field.value,))
-        if db.result['status'] == 'ok':
-            if not admin_info:
-                open_sb("Ошибка доступа", ft.colors.RED)
-            else:
-                if admin_info['status'] in ['active', 'creator'] and bool(admin_info['access']):
-                    password_field.data = admin_info
-                    change_screen("main")
-
-                elif not bool(admin_info['access']):
-                    password_field.value = ''
-                    dlg_info.title = "Авторизация"
-                    dlg_info.content = ft.Text(
-                        "У вас недостаточно прав для доступа к панели управления. Если вы считаете, что произошла ошибка, то обратитесь к администрации.",
-                        width=600, size=16, weight=ft.FontWeight.W_200
-                    )
-                    dlg_info.open()
+        query = build_select('admins', ('password',))
+        admin_info = db.fetch_one_prepared(query, (password_field.value,))
+        if not admin_info:
+            open_sb("Ошибка доступа", ft.colors.RED)
+        else:
+            if admin_info['status'] in ['active', 'creator'] and bool(admin_info['access']):
+                password_field.data = admin_info
+                change_screen("main")
 
-                elif admin_info['status'] == 'waiting_for_registration':
-                    password_field.value = ''
+            elif not bool(admin_info['access']):
+                password_field.value = ''
+                dlg_info.title = "Авторизация"
+                dlg_info.content = ft.Text(
+                    "У вас недостаточно прав для доступа к панели управления. Если вы считаете, что произошла ошибка, то обратитесь к администрации.",
+                    width=600, size=16, weight=ft.FontWeight.W_200
+                )
+                dlg_info.open()
 
-                    bottom_sheet.content = ft.Column(
-                        [
-                            ft.Text(
-                                "Чтобы продолжить, зарегистрируйтесь в Telegram-боте",
-                                width=600, size=16, weight=ft.FontWeight.W_200, text_align=ft.TextAlign.CENTER
-                            ),
-                            ft.FilledButton(
-                                text="Зарегистрироваться", icon=ft.icons.TELEGRAM, url=f"https://t.me/{os.getenv('BOT_NAME')}?start=admins_{admin_info['pass_phrase']}",
-                                on_click=lambda _: bottom_sheet.close(), style=ft.ButtonStyle(bgcolor="#2aabee", color=ft.colors.WHITE)
-                            )
-                        ],
-                        horizontal_alignment=ft.CrossAxisAlignment.CENTER,
-                        alignment=ft.MainAxisAlignment.CENTER,
-                    )
-                    bottom_sheet.height = 100
-                    bottom_sheet.open()
-
-                elif admin_info['status'] == 'frozen':
-                    password_field.value = ''
-                    dlg_info.title = "Авторизация"
-                    dlg_info.content = ft.Text(
-                        "Ваш аккаунт деактивирован, поэтому вы не можете получить доступ к панели управления. Если вы считаете, что произошла ошибка, то обратитесь к администрации.",
-                        width=600, size=16, weight=ft.FontWeight.W_200
-                    )
-                    dlg_info.open()
+            elif admin_info['status'] == 'waiting_for_registration':
+                password_field.value = ''
+
+                bottom_sheet.content = ft.Column(
+                    [
+                        ft.Text(
+                            "Чтобы продолжить, зарегистрируйтесь в Telegram-боте",
+                            width=600, size=16, weight=ft.FontWeight.W_200, text_align=ft.TextAlign.CENTER
+                        ),
+                        ft.FilledButton(
+                            text="Зарегистрироваться", icon=ft.icons.TELEGRAM, url=f"https://t.me/{os.getenv('BOT_NAME')}?start=admins_{admin_info['pass_phrase']}",
+                            on_click=lambda _: bottom_sheet.close(), style=ft.ButtonStyle(bgcolor="#2aabee", color=ft.colors.WHITE)
+                        )
+                    ],
+                    horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                    alignment=ft.MainAxisAlignment.CENTER,
+                )
+                bottom_sheet.height = 100
+                bottom_sheet.open()
+
+            elif admin_info['status'] == 'frozen':
+                password_field.value = ''
+                dlg_info.title = "Авторизация"
+                dlg_info.content = ft.Text(
+                    "Ваш аккаунт деактивирован, поэтому вы не можете получить доступ к панели управления. Если вы считаете, что произошла ошибка, то обратитесь к администрации.",
+                    width=600, size=16, weight=ft.FontWeight.W_200
+                )
+                dlg_info.open()
 
         page.update()
 
@@ -2143,7 +2118,7 @@ def main(page: ft.Page):
                            f"\n\n✅ Все дети на месте" \
                            f"\n\n🕵️ {mentor['name']}"
 
-        send_telegam_message(os.getenv('ID_GROUP_MAIN'), message_text)
+        queue_telegam_message(os.getenv('ID_GROUP_MAIN'), message_text)
         page.update()
 
     def copy_qr_link(link):
@@ -2164,16 +2139,14 @@ def main(page: ft.Page):
         if type(e) == ft.ControlEvent:
             qr_data = e.control.data
 
-        qr_path = f"assets/qrc/{qr_data['phrase']}.png"
-        link = f"https://t.me/{os.getenv('BOT_NAME')}?start={qr_data['phrase']}"
-        qr_img = qrcode.make(data=link)
-        qr_img.save(qr_path)
+        link = get_qr_link(qr_data['phrase'])
+        qr_image = base64.b64encode(qr_cache.get(qr_data['phrase'])).decode()
 
         bottom_sheet.height = 400
         bottom_sheet.content = ft.Column(
             [
                 ft.Text(qr_data['caption'], size=16, weight=ft.FontWeight.W_200, text_align=ft.TextAlign.CENTER),
-                ft.Image(src=f"qrc/{qr_data['phrase']}.png", border_radius=ft.border_radius.all(30), width=300),
+                ft.Image(src_base64=qr_image, border_radius=ft.border_radius.all(30), width=300),
                 ft.FilledTonalButton(text="Скопировать", icon=ft.icons.COPY_ROUNDED, on_click=lambda _: copy_qr_link(link))
             ],
             # alignment=ft.MainAxisAlignment.CENTER,
@@ -2183,6 +2156,7 @@ def main(page: ft.Page):
 
         bottom_sheet.open()
 
+    @db_errors_handled
     def get_showqr(target: str, value: str = None, admin: bool = False):
         page.scroll = ft.ScrollMode.HIDDEN
         page.appbar.visible = admin
@@ -2194,57 +2168,55 @@ def main(page: ft.Page):
         }
 
         if target == "children":
-            query = f"SELECT * FROM crodconnect.children WHERE group_num = %s AND status = 'waiting_for_registration'"
-            params = (value,)
+            query = build_select('children', ('group_num', 'status'))
+            params = (value, 'waiting_for_registration')
             group_title = f"Группа №{value}"
         else:
-            query = f"SELECT * FROM {target} WHERE status = 'waiting_for_registration'"
-            params = ()
+            query = build_select(target, ('status',))
+            params = ('waiting_for_registration',)
             group_title = f"{titles[target]}"
 
-        users_list = make_db_request(query, params)
-        if users_list is not None:
-            if type(users_list) == dict: users_list = [users_list]
-            if users_list:
-                page.controls.clear()
-                qr_screen_col = ft.Column(width=600, scroll=ft.ScrollMode.HIDDEN)
-                users_col = ft.Column(width=600)
-
-                for user in users_list:
-                    users_col.controls.append(
-                        ft.TextButton(
-                            content=ft.Text(
-                                value=user['name'],
-                                size=18,
-                                weight=ft.FontWeight.W_300,
-                            ),
-                            data={'status': target, 'pass_phrase': user['pass_phrase'], 'name': user['name']},
-                            on_click=get_user_qr
-                        )
+        users_list = db.fetch_prepared(query, params)
+        if users_list:
+            page.controls.clear()
+            qr_screen_col = ft.Column(width=600, scroll=ft.ScrollMode.HIDDEN)
+            users_col = ft.Column(width=600)
+
+            for user in users_list:
+                users_col.controls.append(
+                    ft.TextButton(
+                        content=ft.Text(
+                            value=user['name'],
+                            size=18,
+                            weight=ft.FontWeight.W_300,
+                        ),
+                        data={'status': target, 'pass_phrase': user['pass_phrase'], 'name': user['name']},
+                        on_click=get_user_qr
                     )
+                )
 
-                back_btn = ft.IconButton(ft.icons.ARROW_BACK, visible=admin, on_click=lambda _: change_screen('select_qr_group'))
-                qr_screen_col.controls = [
-                    ft.Card(
-                        ft.Container(
-                            content=ft.ListTile(
-                                leading=back_btn,
-                                title=ft.Text(f"Список QR-кодов", size=16),
-                                subtitle=ft.Text(group_title, size=20, weight=ft.FontWeight.W_400),
-                            )
+            back_btn = ft.IconButton(ft.icons.ARROW_BACK, visible=admin, on_click=lambda _: change_screen('select_qr_group'))
+            qr_screen_col.controls = [
+                ft.Card(
+                    ft.Container(
+                        content=ft.ListTile(
+                            leading=back_btn,
+                            title=ft.Text(f"Список QR-кодов", size=16),
+                            subtitle=ft.Text(group_title, size=20, weight=ft.FontWeight.W_400),
                         )
-                    ),
-                    users_col
-                ]
-                page.add(qr_screen_col)
-                # dlg_loading.close()
-            else:
-                dlg_info.title = "QR-коды"
-                dlg_info.content = ft.Text(
-                    f"Все пользователи в группе «{group_title}» зарегистрированы!",
-                    width=600, size=16, weight=ft.FontWeight.W_200
-                )
-                dlg_info.open(action_btn_visible=admin)
+                    )
+                ),
+                users_col
+            ]
+            page.add(qr_screen_col)
+            # dlg_loading.close()
+        else:
+            dlg_info.title = "QR-коды"
+            dlg_info.content = ft.Text(
+                f"Все пользователи в группе «{group_title}» зарегистрированы!",
+                width=600, size=16, weight=ft.FontWeight.W_200
+            )
+            dlg_info.open(action_btn_visible=admin)
 
     def goto_modulecheck(e: ft.ControlEvent):
         data = page.session.get('modulecheck_info')
@@ -2394,8 +2366,11 @@ def main(page: ft.Page):
             mentor_id, initiator, sign = url_params['mentor_id'][0], url_params['initiator'][0], url_params['signature'][0]
             if check_url(sign, f"modulecheck_{initiator}_{mentor_id}"):
                 query = "SELECT * FROM crodconnect.mentors WHERE id = %s"
-                mentor = make_db_request(query, (mentor_id,))
-                if db.result['status'] == 'ok':
+                try:
+                    mentor = db.fetch_one(query, (mentor_id,))
+                except DatabaseError as e:
+                    show_db_error(e)
+                else:
                     page.session.set('modulecheck_info', {'mentor': mentor})
                     change_screen("module_check_start")
 
@@ -2417,10 +2392,8 @@ def main(page: ft.Page):
         page.appbar = None
         err_text = "При получении данных возникли следующие ошибки\n\n" + "\n\n".join(
             [f"{service[0]}: {service[1]['msg']}" for service in [serivce for serivce in startup.items()] if not service[1]['status']]) + "\n\nОбратитесь к администратору."
-        send_telegam_message(
-            tID=os.getenv('ID_GROUP_ERRORS'),
-            message_text=err_text
-        )
+        # одинаковые ошибки с разных открытий страницы объединяются в одно оповещение
+        post_alert(err_text)
         dlg_info.title = "Ошибка подключения"
         dlg_info.content = ft.Text(
             err_text,
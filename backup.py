@@ -1,54 +1,308 @@
 import platform
 
 import yadiskapi
+import hashlib
+import json
 import logging
 import subprocess
-from datetime import datetime
+import time
+import zlib
+from datetime import datetime, timedelta
+from threading import Thread
 import os
-from flet_elements.telegram import send_telegam_message
+from flet_elements.alerts import post_alert
 
+backups_folder = "/root/crod/backups"
+remote_folder = "CROD_MEDIA/Бекапы"
+# контрольные суммы таблиц на момент последнего бекапа и время последнего полного
+state_path = f"{backups_folder}/state.json"
+chunk_size = 1024 * 1024
+database_name = "crodconnect"
+# имя файла: crodconnect_<вид>_<дата>.sql.gz, вид - full, incr или snapshot
+name_date_format = '%Y-%m-%d-%H-%M'
 
-def mysql_backup():
-    if platform.system() == "Linux":
-        yandex = yadiskapi.YandexAPI(os.getenv('YANDEX_REST_URL'), os.getenv('YANDEX_REST_TOKEN'))
-        logging.info('Backup: wake up')
-        filename = f"crodconnect_backup_{datetime.now().strftime('%Y-%m-%d-%H-%M')}.sql"
-        filepath = f"/root/crod/backups/{filename}"
-        logging.info(f'Backup: creating {filename}')
 
-        command = f"/usr/bin/mysqldump -h 127.0.0.1 -P {os.getenv('DB_PORT')} -u {os.getenv('DB_USER')} -p{os.getenv('DB_PASSWORD')} crodconnect > {filepath}"
+class BackupError(Exception):
+    pass
+
+
+class DumpError(BackupError):
+    # ошибка самого mysqldump, повторная отправка не поможет
+    pass
+
+
+class DumpStream:
+    """
+    Вывод mysqldump, сжатый gzip, частями по chunk_size.
+    Сжатые данные пишутся в файл (локальная копия или временный файл для повторной отправки)
+    и считается SHA-256. В памяти одновременно находится только одна часть
+    """
+
+    def __init__(self, command: list, filepath: str, filename: str = None):
+        self.command = command
+        self.filepath = filepath
+        # имя файла на Яндекс.диске
+        self.filename = filename or os.path.basename(filepath)
+        self.sha256 = None
+        self.size = 0
+        self.finished = False
+
+    def __iter__(self):
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.finished = False
+        # пароль передаётся через окружение, чтобы не попадать в список процессов
+        env = dict(os.environ, MYSQL_PWD=os.getenv('DB_PASSWORD') or '')
+        process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        try:
+            with open(self.filepath, 'wb') as file:
+                while True:
+                    data = process.stdout.read(chunk_size)
+                    chunk = compressor.compress(data) if data else compressor.flush()
+                    if chunk:
+                        file.write(chunk)
+                        self.sha256.update(chunk)
+                        self.size += len(chunk)
+                        yield chunk
+                    if not data:
+                        break
+        finally:
+            process.stdout.close()
+            errors = process.stderr.read().decode().strip()
+            returncode = process.wait()
+
+        if returncode != 0:
+            # исключение внутри тела запроса прерывает загрузку, неполный файл на Яндекс.диске не сохранится
+            raise DumpError(f"mysqldump exited with {returncode}: {errors}")
+        self.finished = True
+
+    def drain(self):
+        # записать дамп в файл без отправки: перед повторной загрузкой, если первая оборвалась на середине
+        for _ in self:
+            pass
+
 
-        text = f"*Статус:* ✅ создан" \
-               f"\n*Файл:* {filename}"
+def dump_command(tables: list = None) -> list:
+    command = [
+        "/usr/bin/mysqldump", "-h", "127.0.0.1", "-P", str(os.getenv('DB_PORT')), "-u", os.getenv('DB_USER'),
+        "--single-transaction", "--quick", database_name
+    ]
+    return command + list(tables or [])
 
+
+def upload_backup(yandex: yadiskapi.YandexAPI, remote_path: str, stream: DumpStream, retries: int = 3):
+    """
+    Загрузка дампа на Яндекс.диск
+    Первая попытка отправляет данные по мере создания дампа, повторные - из сжатого файла на диске.
+    API загрузки не поддерживает докачку, поэтому повтор начинается с начала файла.
+    Если первая загрузка оборвалась до конца дампа, дамп один раз создаётся заново в файл
+    """
+
+    for attempt in range(1, retries + 1):
         try:
-            logging.info('Backup: running subprocess')
-            subprocess.run(command, shell=True)
-
-            logging.info('Backup: getting upload link')
-            response = yandex.get_upload_link(f'CROD_MEDIA/Бекапы/{filename}')
-            if 'href' in response.keys():
-                logging.info('Backup: upload link recieved, uploading file')
-                yandex.upload_file(
-                    url=response['href'],
-                    filepath=filepath
-                )
-                logging.info('Backup: file uploaded to Yandex.Disk')
+            response = yandex.get_upload_link(remote_path, overwrite=True)
+            if 'href' not in response.keys():
+                raise BackupError(f"upload link: {response.get('message')}")
 
+            if attempt == 1 and not stream.finished:
+                logging.info('Backup: streaming dump to Yandex.Disk')
+                yandex.upload_stream(response['href'], stream)
             else:
-                logging.error(f"Backup: upload link recieve failed: {response['message']}")
-                text = f"*Статус:* ⛔ не создан" \
-                       f"\n*Ошибка:* {response['message']}"
+                logging.info(f'Backup: uploading {stream.filepath}, attempt {attempt}')
+                yandex.upload_file(response['href'], stream.filepath)
 
+            # Яндекс.диск считает sha256 загруженного файла, они должны совпасть с локальными
+            resource = yandex.get_resource(remote_path, 'sha256,size')
+            if resource.get('sha256') != stream.sha256.hexdigest():
+                raise BackupError(f"checksum mismatch: local {stream.sha256.hexdigest()}, remote {resource.get('sha256')}")
+            return
+        except DumpError:
+            raise
         except Exception as e:
-            logging.error(f"Backup: {e}")
-            text = f"*Статус:* ⛔ не создан" \
-                   f"\n*Ошибка:* {e}"
+            logging.error(f'Backup: attempt {attempt} failed: {e}')
+            error = e
+
+        if not stream.finished:
+            stream.drain()
+        time.sleep(5 * attempt)
+
+    raise BackupError(f"upload failed after {retries} attempts: {error}")
+
+
+def mysql_query(query: str) -> list:
+    # запрос через клиент mysql, как и mysqldump, без подключения к базе из процесса
+    command = ["/usr/bin/mysql", "-h", "127.0.0.1", "-P", str(os.getenv('DB_PORT')), "-u", os.getenv('DB_USER'), "-N", "-B", "-e", query]
+    env = dict(os.environ, MYSQL_PWD=os.getenv('DB_PASSWORD') or '')
+    result = subprocess.run(command, capture_output=True, env=env, timeout=300)
+    if result.returncode != 0:
+        raise DumpError(f"mysql exited with {result.returncode}: {result.stderr.decode().strip()}")
+    return [line.split('\t') for line in result.stdout.decode().splitlines()]
+
+
+def table_checksums() -> dict:
+    tables = [row[0] for row in mysql_query(f"SHOW TABLES FROM {database_name}")]
+    if not tables:
+        return {}
+    rows = mysql_query("CHECKSUM TABLE " + ", ".join(f"{database_name}.{table}" for table in tables))
+    return {row[0].split('.', 1)[1]: row[1] for row in rows}
+
+
+def load_state() -> dict:
+    if os.path.exists(state_path):
+        with open(state_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    return {'last_full': None, 'checksums': {}}
+
+
+def save_state(state: dict):
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(state, file, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def run_backup(kind: str, tables: list = None, keep_local: bool = None) -> DumpStream:
+    """
+    Дамп базы или отдельных таблиц с загрузкой на Яндекс.диск
+    :param kind: full, incr или snapshot, попадает в имя файла
+    :param tables: таблицы для дампа, по умолчанию вся база
+    :param keep_local: оставить сжатый дамп в backups_folder, по умолчанию из BACKUP_KEEP_LOCAL
+    """
+
+    yandex = yadiskapi.YandexAPI(os.getenv('YANDEX_REST_URL'), os.getenv('YANDEX_REST_TOKEN'))
+    filename = f"{database_name}_{kind}_{datetime.now().strftime(name_date_format)}.sql.gz"
+    if keep_local is None:
+        # без BACKUP_KEEP_LOCAL сжатый дамп хранится только до успешной загрузки
+        keep_local = os.getenv('BACKUP_KEEP_LOCAL', 'False').lower() in ('true', '1', 't')
+    filepath = f"{backups_folder}/{filename}" if keep_local else f"{backups_folder}/.{filename}.part"
+    logging.info(f'Backup: creating {filename}')
 
-    else:
-        text = f"*Статус:* отладка"
+    stream = DumpStream(dump_command(tables), filepath, filename)
+    try:
+        os.makedirs(backups_folder, exist_ok=True)
+        upload_backup(yandex, f'{remote_folder}/{filename}', stream)
+        logging.info(f'Backup: {filename} uploaded to Yandex.Disk')
+    finally:
+        # локальная копия остаётся, только если дамп завершился
+        if (not keep_local or not stream.finished) and os.path.exists(filepath):
+            os.remove(filepath)
+    return stream
 
-    send_telegam_message(
-        tID=os.getenv('ID_GROUP_ERRORS'),
-        message_text=f"*Бекап базы данных*\n\n{text}\n\n#бекап"
+
+def backup_report(stream: DumpStream, tables: list = None) -> str:
+    text = f"*Статус:* ✅ создан" \
+           f"\n*Файл:* {stream.filename}" \
+           f"\n*Размер:* {stream.size / 1024 / 1024:.1f} МБ" \
+           f"\n*SHA-256:* `{stream.sha256.hexdigest()}`"
+    if tables:
+        text += f"\n*Таблицы:* {', '.join(tables)}"
+    return text
+
+
+def backup_date(filename: str):
+    try:
+        return datetime.strptime(filename.rsplit('_', 1)[1].split('.')[0], name_date_format)
+    except (IndexError, ValueError):
+        return None
+
+
+def prune_backups(state: dict):
+    """
+    Удаление бекапов старше BACKUP_RETENTION_DAYS дней локально и на Яндекс.диске.
+    Последний полный бекап и инкременты после него не удаляются независимо от возраста
+    """
+
+    cutoff = datetime.now() - timedelta(days=int(os.getenv('BACKUP_RETENTION_DAYS', 30)))
+    if state['last_full']:
+        cutoff = min(cutoff, datetime.strptime(state['last_full'], name_date_format))
+
+    if os.path.isdir(backups_folder):
+        for name in os.listdir(backups_folder):
+            date = backup_date(name)
+            if name.startswith(database_name) and date is not None and date < cutoff:
+                logging.info(f'Backup: removing local {name}')
+                os.remove(f"{backups_folder}/{name}")
+
+    yandex = yadiskapi.YandexAPI(os.getenv('YANDEX_REST_URL'), os.getenv('YANDEX_REST_TOKEN'))
+    response = yandex.get_resource(remote_folder, '_embedded.items.name', limit=1000)
+    for item in response.get('_embedded', {}).get('items', []):
+        date = backup_date(item['name'])
+        if item['name'].startswith(database_name) and date is not None and date < cutoff:
+            logging.info(f"Backup: removing {item['name']} from Yandex.Disk")
+            yandex.delete(f"{remote_folder}/{item['name']}", permanently=True)
+
+
+def scheduled_backup():
+    """
+    Ежедневный бекап: полный раз в BACKUP_FULL_INTERVAL_DAYS дней,
+    в остальные дни - только таблицы, у которых изменилась контрольная сумма (CHECKSUM TABLE)
+    """
+
+    if platform.system() != "Linux":
+        post_alert("*Бекап базы данных*\n\n*Статус:* отладка\n\n#бекап")
+        return
+
+    logging.info('Backup: wake up')
+    try:
+        state = load_state()
+        checksums = table_checksums()
+        full_interval = timedelta(days=int(os.getenv('BACKUP_FULL_INTERVAL_DAYS', 7)))
+        last_full = datetime.strptime(state['last_full'], name_date_format) if state['last_full'] else None
+
+        if last_full is None or datetime.now() - last_full >= full_interval:
+            stream = run_backup('full')
+            state['last_full'] = backup_date(stream.filename).strftime(name_date_format)
+            text = backup_report(stream)
+        else:
+            changed = [table for table, checksum in checksums.items() if state['checksums'].get(table) != checksum]
+            if changed:
+                stream = run_backup('incr', changed)
+                text = backup_report(stream, changed)
+            else:
+                text = "*Статус:* без изменений с прошлого бекапа"
+
+        state['checksums'] = checksums
+        save_state(state)
+        prune_backups(state)
+
+    except Exception as e:
+        logging.error(f"Backup: {e}")
+        text = f"*Статус:* ⛔ не создан" \
+               f"\n*Ошибка:* {e}"
+
+    post_alert(
+        f"*Бекап базы данных*\n\n{text}\n\n#бекап"
     )
+
+
+def snapshot_tables(tables: list, reason: str):
+    """
+    Снимок таблиц перед удалением данных.
+    Дамп затронутых таблиц создаётся сразу, до удаления; загрузка на Яндекс.диск и отчёт - в фоновом потоке
+    """
+
+    if platform.system() != "Linux":
+        return
+
+    filename = f"{database_name}_snapshot_{datetime.now().strftime(name_date_format)}.sql.gz"
+    stream = DumpStream(dump_command(tables), f"{backups_folder}/{filename}")
+    os.makedirs(backups_folder, exist_ok=True)
+    stream.drain()
+    logging.info(f'Backup: snapshot {filename} of {", ".join(tables)} created')
+
+    def upload():
+        yandex = yadiskapi.YandexAPI(os.getenv('YANDEX_REST_URL'), os.getenv('YANDEX_REST_TOKEN'))
+        try:
+            upload_backup(yandex, f'{remote_folder}/{filename}', stream)
+            text = backup_report(stream, tables)
+        except Exception as e:
+            logging.error(f"Backup: {e}")
+            text = f"*Статус:* ⚠ сохранён только локально" \
+                   f"\n*Файл:* {stream.filepath}" \
+                   f"\n*Ошибка:* {e}"
+        post_alert(
+            f"*Снимок перед удалением ({reason})*\n\n{text}\n\n#бекап"
+        )
+
+    Thread(target=upload, name="backup-snapshot").start()
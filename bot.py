@@ -6,9 +6,12 @@ import platform
 import re
 
 import redis
+import redis.asyncio as aioredis
 from aiogram import Bot, Dispatcher, types, F
+from aiogram.filters import ExceptionTypeFilter
 from aiogram.filters.command import Command, CommandStart, CommandObject
 from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.redis import RedisStorage, DefaultKeyBuilder
 from aiogram.types import Message
 from aiogram.utils import markdown, keyboard
 from aiogram.methods import DeleteWebhook
@@ -18,13 +21,21 @@ from dotenv import load_dotenv
 
 from bot_elements.callback_factory import TeachersCallbackFactory, MentorsCallbackFactory, ChildrenCallbackFactory, RadioRequestCallbackFactory, SelectModuleCallbackFactory, AdminsCallbackFactory, \
     RecordModuleToChildCallbackFactory, FeedbackMarkCallbackFactory
-from database import MySQL, RedisTable
+from database import AsyncMySQLPool, RedisTable, DatabaseError, build_select, build_count, build_update
 from bot_elements.lexicon import lexicon, base_crod_url
 from bot_elements.keyboards import kb_hello, kb_main, tasker_kb, reboot_bot_kb, radio_kb, check_apply_to_channel_kb
 from bot_elements.signed_functions import create_signed_url
 from bot_elements.states import Radio, Feedback
 from bot_elements.functions import load_config_file, update_config_file
-from wording.wording import get_grouplist, get_feedback
+from bot_elements.broadcast import Broadcaster, ProgressMessage
+from bot_elements.identity import IdentityResolver
+from bot_elements.stats import StatsStore
+from bot_elements.state import get_state_store
+from bot_elements.middlewares import CallbackIdempotencyMiddleware
+from bot_elements import seats
+from bot_elements.catalogue import ModuleCatalogue
+from bot_elements.config_service import ConfigService
+from wording.wording import get_grouplist, get_feedback, documents_pool
 
 if platform.system() == "Windows":
     env_path = r"D:\CROD_MEDIA\.env"
@@ -35,12 +46,17 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 
 logging.basicConfig(level=logging.INFO)
 current_directory = os.path.dirname(os.path.abspath(__file__))
-config = load_config_file('config.json')
+config_service = ConfigService('config.json')
+config = config_service.load()
 
 bot = Bot(token=os.getenv('BOT_TOKEN'), parse_mode="html")
-dp = Dispatcher()
+# состояния FSM и защита от повторных нажатий хранятся в Redis и переживают перезапуск бота
+fsm_redis = aioredis.StrictRedis(host=os.getenv('DB_HOST'), port=os.getenv('REDIS_PORT'), password=os.getenv('REDIS_PASSWORD'))
+dp = Dispatcher(storage=RedisStorage(fsm_redis, key_builder=DefaultKeyBuilder(prefix="connect:fsm"), state_ttl=24 * 60 * 60, data_ttl=24 * 60 * 60))
+dp.callback_query.outer_middleware(CallbackIdempotencyMiddleware(fsm_redis))
+broadcaster = Broadcaster(bot)
 
-db = MySQL(
+db = AsyncMySQLPool(
     host=os.getenv('DB_HOST'),
     user=os.getenv('DB_USER'),
     password=os.getenv('DB_PASSWORD'),
@@ -56,14 +72,11 @@ redis = RedisTable(
 
 redis.connect()
 
-statuses = {
-    'can_respond': False,
-    'feedback': True,
-    'modules_record': False,
-    'radio': False
-}
-radio_request_user_list = []
-feedback_temp_data_dict = {}
+identities = IdentityResolver(db)
+stats = StatsStore(db, os.getenv('DB_HOST'), os.getenv('REDIS_PORT'), os.getenv('REDIS_PASSWORD'))
+
+bot_state = get_state_store(redis)
+catalogue = ModuleCatalogue(db, fsm_redis)
 
 months = {
     1: "января",
@@ -85,16 +98,6 @@ months = {
 # Логика отправки обратки у детей
 # Заявка на изменение модуля
 
-def make_db_request(sql_query: str, params: tuple = ()):
-    db.connect()
-    db.execute(sql_query, params)
-    db.disconnect()
-
-    if db.result['status'] == "ok":
-        return db.data
-    return False
-
-
 def get_text_link(title: str, link: str):
     return f"<a href='{link}'>{title}</a>"
 
@@ -103,12 +106,6 @@ def set_redis_hash(signature, index):
     redis.set(signature, index)
 
 
-def dict_to_list(input_data):
-    if type(input_data) == dict:
-        return [input_data]
-    return input_data
-
-
 async def raise_error(error_text: str, tid=None):
     if tid is not None:
         await bot.send_message(
@@ -118,177 +115,123 @@ async def raise_error(error_text: str, tid=None):
         )
 
 
-async def is_pass_phrase_ok(table: str, pass_phrase: str):
-    query = f"SELECT COUNT(*) as count FROM {table} WHERE pass_phrase = %s"
-    result = make_db_request(query, (pass_phrase,))
+@dp.errors(ExceptionTypeFilter(DatabaseError))
+async def database_error_handler(event: types.ErrorEvent):
+    logging.error(f'Database: {event.exception}')
+    user = getattr(event.update.event, 'from_user', None)
+    await raise_error(str(event.exception), user.id if user else None)
 
-    if db.result['status'] == 'ok':
-        if result['count'] == 0:
-            return False
-        return True
-    else:
-        await raise_error(db.result['message'])
-        return None
+
+async def is_pass_phrase_ok(table: str, pass_phrase: str):
+    query = build_count(table, ('pass_phrase',))
+    return await db.fetch_scalar(query, (pass_phrase,), default=0) > 0
 
 
 async def get_user_info(telegram_id: int, group: str):
-    query = f"SELECT * FROM {group} WHERE telegram_id = %s"
-    result = make_db_request(query, (telegram_id,))
-    if db.result['status'] == 'ok':
-        return result
-    else:
-        await raise_error(db.result['message'], telegram_id)
+    identity = await identities.resolve(telegram_id)
+    if identity.role != group:
         return None
+    return dict(identity.profile)
 
 
-async def get_user_status(column: str, value):
-    query = f"""
-            SELECT status FROM crodconnect.children WHERE {column} = {value}
-            UNION ALL
-            SELECT status FROM crodconnect.teachers WHERE {column} = {value}
-            UNION ALL
-            SELECT status FROM crodconnect.mentors WHERE {column} = {value}
-            UNION ALL 
-            SELECT status AS status FROM crodconnect.admins WHERE {column} = {value};
-    """
-
-    user_group = make_db_request(query)
-
-    if db.result['status'] == 'ok':
-        if not user_group:
-            return 'alien'
-        return user_group['status']
-    else:
-        await raise_error(db.result['message'], value)
-        return None
+async def get_user_status(telegram_id: int):
+    identity = await identities.resolve(telegram_id)
+    return identity.status
 
 
 async def get_user_group(telegram_id: int):
-    query = """
-            SELECT 'children' AS status FROM crodconnect.children WHERE telegram_id = %s
-            UNION ALL
-            SELECT 'teachers' AS status FROM crodconnect.teachers WHERE telegram_id = %s
-            UNION ALL
-            SELECT 'mentors' AS status FROM crodconnect.mentors WHERE telegram_id = %s
-            UNION ALL 
-            SELECT 'admins' AS status FROM crodconnect.admins WHERE telegram_id = %s;
-            """
-
-    user_group = make_db_request(query, (telegram_id, telegram_id, telegram_id, telegram_id))
-    if db.result['status'] == 'ok':
-        return user_group['status']
-    else:
-        await raise_error(db.result['message'], telegram_id)
-        return None
+    identity = await identities.resolve(telegram_id)
+    return identity.role
 
 
 async def get_module_list(callback: types.CallbackQuery):
     query = "SELECT * FROM crodconnect.modules WHERE status = 'active'"
 
-    modules = make_db_request(query)
-    if db.result['status'] == 'ok':
-        modules = dict_to_list(modules)
-        if len(modules) > 0:
-            await callback.message.delete()
-            btns_builder = keyboard.InlineKeyboardBuilder()
-            for module in modules:
-                btns_builder.button(text=module['name'], callback_data=SelectModuleCallbackFactory(module_id=module['id'], name=module['name']))
-            btns_builder.adjust(2)
-            await callback.message.answer(
-                text="<b>Выберите модуль для просмотра списка участников</b>",
-                reply_markup=btns_builder.as_markup()
-            )
-        else:
-            await callback.answer(
-                text="Активные модули отсутствуют",
-                show_alert=True
-            )
+    modules = await db.fetch_all(query)
+    if len(modules) > 0:
+        await callback.message.delete()
+        btns_builder = keyboard.InlineKeyboardBuilder()
+        for module in modules:
+            btns_builder.button(text=module['name'], callback_data=SelectModuleCallbackFactory(module_id=module['id'], name=module['name']))
+        btns_builder.adjust(2)
+        await callback.message.answer(
+            text="<b>Выберите модуль для просмотра списка участников</b>",
+            reply_markup=btns_builder.as_markup()
+        )
     else:
-        await raise_error(db.result['message'], callback.from_user.id)
+        await callback.answer(
+            text="Активные модули отсутствуют",
+            show_alert=True
+        )
 
 
 async def send_hello(telegram_id: int, table: str):
-    query = f"SELECT * FROM {table} WHERE telegram_id = %s and status = 'active'"
-
-    user_info = make_db_request(query, (telegram_id,))
-    if db.result['status'] == 'ok':
-        if table == 'children':
-            member_info = await bot.get_chat_member(chat_id=f"@{os.getenv('ID_CHANNEL')}", user_id=telegram_id)
-            if type(member_info) != types.chat_member_left.ChatMemberLeft:
-                query = f"SELECT * FROM crodconnect.mentors WHERE group_num = %s and status = 'active'"
-                mentors_info = make_db_request(query, (user_info['group_num'],))
-                if db.result['status'] == 'ok':
-                    mentors_info = dict_to_list(mentors_info)
-                    mentors = ""
-                    for mentor in mentors_info:
-                        mentors += f"{mentor['name']}\n"
-                    await bot.send_message(
-                        chat_id=telegram_id,
-                        text=lexicon['hello_messages']['children'].format(
-                            user_info['name'], user_info['group_num'],
-                            mentors
-                        ),
-                        reply_markup=kb_hello[table].as_markup()
-                    )
-                else:
-                    await raise_error(db.result['message'], telegram_id)
-            else:
-                await bot.send_message(
-                    chat_id=telegram_id,
-                    text="<b>Привет! Для начала тебе нужно подписаться на канал ЦРОДа, в нём мы публикуем все самые интересные новости о сменах и потоках</b>",
-                    reply_markup=check_apply_to_channel_kb.as_markup()
-                )
-        elif table == 'mentors':
-            query = "SELECT COUNT(*) as count FROM crodconnect.children WHERE group_num = %s"
-            children_count = make_db_request(query, (user_info['group_num'],))['count']
-            if db.result['status'] == 'ok':
-                other_mentors = ""
-                query = "SELECT * FROM crodconnect.mentors WHERE group_num = %s and status = 'active'"
-                mentors_info = make_db_request(query, (user_info['group_num'],))
-                mentors_info = dict_to_list(mentors_info)
-                if db.result['status'] == 'ok':
-                    for mentor in mentors_info:
-                        if mentor['telegram_id'] != telegram_id:
-                            mntr = get_text_link(mentor['name'], f"tg://user?id={mentor['telegram_id']}")
-                            other_mentors += f"{mntr}\n"
-                    if not other_mentors:
-                        other_mentors = "отсутствуют"
-                    await bot.send_message(
-                        chat_id=telegram_id,
-                        text=lexicon['hello_messages']['mentors'].format(
-                            user_info['name'], user_info['group_num'],
-                            children_count, other_mentors
-                        ),
-                        reply_markup=kb_hello[table].as_markup()
-                    )
-                else:
-                    await raise_error(db.result['message'], telegram_id)
-            else:
-                await raise_error(db.result['message'], telegram_id)
-        elif table == 'teachers':
-            query = "SELECT * FROM crodconnect.modules WHERE id = %s"
-            module_info = make_db_request(query, (user_info['module_id'],))
-            if db.result['status'] == 'ok':
-                await bot.send_message(
-                    chat_id=telegram_id,
-                    text=lexicon['hello_messages']['teachers'].format(
-                        user_info['name'], module_info['name'],
-                        module_info['location']
-                    ),
-                    reply_markup=kb_hello[table].as_markup()
-                )
-            else:
-                await raise_error(db.result['message'], telegram_id)
-        elif table == 'admins':
+    query = build_select(table, ('telegram_id', 'status'))
+
+    user_info = await db.fetch_one(query, (telegram_id, 'active'))
+    if user_info is None:
+        return
+
+    if table == 'children':
+        member_info = await bot.get_chat_member(chat_id=f"@{os.getenv('ID_CHANNEL')}", user_id=telegram_id)
+        if type(member_info) != types.chat_member_left.ChatMemberLeft:
+            query = f"SELECT * FROM crodconnect.mentors WHERE group_num = %s and status = 'active'"
+            mentors_info = await db.fetch_all(query, (user_info['group_num'],))
+            mentors = ""
+            for mentor in mentors_info:
+                mentors += f"{mentor['name']}\n"
             await bot.send_message(
                 chat_id=telegram_id,
-                text=lexicon['hello_messages']['admins'].format(
-                    user_info['name'], markdown.html_decoration.spoiler(user_info['password'])
+                text=lexicon['hello_messages']['children'].format(
+                    user_info['name'], user_info['group_num'],
+                    mentors
                 ),
                 reply_markup=kb_hello[table].as_markup()
             )
-    else:
-        await raise_error(db.result['message'], telegram_id)
+        else:
+            await bot.send_message(
+                chat_id=telegram_id,
+                text="<b>Привет! Для начала тебе нужно подписаться на канал ЦРОДа, в нём мы публикуем все самые интересные новости о сменах и потоках</b>",
+                reply_markup=check_apply_to_channel_kb.as_markup()
+            )
+    elif table == 'mentors':
+        children_count = await stats.group_size(user_info['group_num'])
+        other_mentors = ""
+        query = "SELECT * FROM crodconnect.mentors WHERE group_num = %s and status = 'active'"
+        mentors_info = await db.fetch_all(query, (user_info['group_num'],))
+        for mentor in mentors_info:
+            if mentor['telegram_id'] != telegram_id:
+                mntr = get_text_link(mentor['name'], f"tg://user?id={mentor['telegram_id']}")
+                other_mentors += f"{mntr}\n"
+        if not other_mentors:
+            other_mentors = "отсутствуют"
+        await bot.send_message(
+            chat_id=telegram_id,
+            text=lexicon['hello_messages']['mentors'].format(
+                user_info['name'], user_info['group_num'],
+                children_count, other_mentors
+            ),
+            reply_markup=kb_hello[table].as_markup()
+        )
+    elif table == 'teachers':
+        query = "SELECT * FROM crodconnect.modules WHERE id = %s"
+        module_info = await db.fetch_one(query, (user_info['module_id'],))
+        await bot.send_message(
+            chat_id=telegram_id,
+            text=lexicon['hello_messages']['teachers'].format(
+                user_info['name'], module_info['name'],
+                module_info['location']
+            ),
+            reply_markup=kb_hello[table].as_markup()
+        )
+    elif table == 'admins':
+        await bot.send_message(
+            chat_id=telegram_id,
+            text=lexicon['hello_messages']['admins'].format(
+                user_info['name'], markdown.html_decoration.spoiler(user_info['password'])
+            ),
+            reply_markup=kb_hello[table].as_markup()
+        )
 
 
 def update_env_var(variable, value):
@@ -316,28 +259,16 @@ async def send_reboot_message(telegram_id: int):
 async def get_module_children_list(module_id: int):
     query = "SELECT * FROM crodconnect.children WHERE id IN (SELECT child_id FROM crodconnect.modules_records WHERE module_id = %s)"
 
-    group_list = make_db_request(query, (module_id,))
-    if db.result['status'] == 'ok':
-        group_list = dict_to_list(group_list)
+    group_list = await db.fetch_all(query, (module_id,))
+    group_list.sort(key=lambda el: el['name'])
 
-        group_list.sort(key=lambda el: el['name'])
-
-        return group_list
-    else:
-        await raise_error(db.result['message'])
-        return None
+    return group_list
 
 
 async def get_module_feedback_today(module_id: int):
     query = "SELECT mark, comment FROM crodconnect.feedback WHERE module_id = %s and date = %s"
 
-    feedback_list = make_db_request(query, (module_id, datetime.datetime.now().date()))
-    if db.result['status'] == 'ok':
-        feedback_list = dict_to_list(feedback_list)
-        return feedback_list
-    else:
-        await raise_error(db.result['message'])
-        return None
+    return await db.fetch_all(query, (module_id, datetime.datetime.now().date()))
 
 
 @dp.message(CommandStart(deep_link=True, magic=F.args.regexp(re.compile(r'(children|mentors|teachers|admins|tasker)_\w+'))))
@@ -348,18 +279,16 @@ async def deep_linking(message: Message, command: CommandObject):
     pass_phrase = command.args.split("_")[1]
 
     if target in ['children', 'mentors', 'teachers', 'admins']:
-        user_status = await get_user_status('telegram_id', telegram_id)
+        user_status = await get_user_status(telegram_id)
         if user_status is not None:
             if user_status == 'alien':
                 passed = await is_pass_phrase_ok(target, pass_phrase)
                 if passed:
-                    query = f"UPDATE {target} SET telegram_id = %s, status = 'active' WHERE pass_phrase = %s"
+                    query = build_update(target, ('telegram_id', 'status'), ('pass_phrase',))
 
-                    make_db_request(query, (telegram_id, pass_phrase,))
-                    if db.result['status'] == 'ok':
-                        await send_hello(telegram_id, target)
-                    else:
-                        await raise_error(db.result['message'], telegram_id)
+                    await db.execute(query, (telegram_id, 'active', pass_phrase,))
+                    identities.invalidate(telegram_id)
+                    await send_hello(telegram_id, target)
             else:
                 await cmd_start(message)
 
@@ -406,7 +335,7 @@ async def cmd_start(message: types.Message):
 
 @dp.message(Command("start"))
 async def cmd_start(message: types.Message):
-    if statuses['can_respond']:
+    if bot_state.get_status('can_respond'):
         telegram_id = message.chat.id
         message_text = {
             'children': "<b>Ты в главном меню, выбери, что хочешь сделать</b>",
@@ -419,7 +348,7 @@ async def cmd_start(message: types.Message):
 
         }
         if str(telegram_id)[0] != '-':
-            user_status = await get_user_status('telegram_id', telegram_id)
+            user_status = await get_user_status(telegram_id)
             if user_status is not None:
                 user_group = user_status
 
@@ -440,7 +369,7 @@ async def cmd_start(message: types.Message):
         else:
             if telegram_id == int(os.getenv('ID_GROUP_RADIO')):
                 radio_builder = keyboard.InlineKeyboardBuilder()
-                if not statuses['radio']:
+                if not bot_state.get_status('radio'):
                     text = "Чтобы включить радио, нажмите на кнопку ниже, дети получат сообщение и смогу отправлять заявки"
                     radio_builder.button(text="🟢 Включить радио", callback_data="radio_on")
                 else:
@@ -465,8 +394,8 @@ async def handle_radio_commands(message: types.Message):
 
 @dp.callback_query(F.data == "radio_on")
 async def start_radio(callback: types.CallbackQuery):
-    radio_request_user_list.clear()
-    statuses['radio'] = True
+    bot_state.clear_radio_requests()
+    bot_state.set_status('radio', True)
     await callback.answer(
         text="🟢 Радио запущено, рассылаем информацию детям",
         show_alert=True
@@ -474,23 +403,23 @@ async def start_radio(callback: types.CallbackQuery):
     await callback.message.delete()
     query = "SELECT * FROM crodconnect.children where status = 'active'"
 
-    children_list = make_db_request(query)
-    if db.result['status'] == 'ok':
-        children_list = dict_to_list(children_list)
-        for child in children_list:
-            await bot.send_message(
-                chat_id=child['telegram_id'],
-                text="<b>Наше радио в эфире, ждём твою заявку!</b>"
-                     "\n\nЧтобы отправить заявку, нажми /start"
-            )
-    else:
-        await raise_error(db.result['message'], callback.from_user.id)
+    children_list = await db.fetch_all(query)
+    progress = ProgressMessage(bot, callback.message.chat.id)
+    await progress.start("Радио", len(children_list))
+    report = await broadcaster.send_messages(
+        "Радио",
+        [child['telegram_id'] for child in children_list],
+        on_progress=progress,
+        text="<b>Наше радио в эфире, ждём твою заявку!</b>"
+             "\n\nЧтобы отправить заявку, нажми /start"
+    )
+    await progress.finish(report)
 
 
 @dp.callback_query(F.data == "radio_off")
 async def stop_radio(callback: types.CallbackQuery):
-    radio_request_user_list.clear()
-    statuses['radio'] = False
+    bot_state.clear_radio_requests()
+    bot_state.set_status('radio', False)
     await callback.answer(
         text="🔴 Радио остановлено, дети не могут отправлять заявки",
         show_alert=True
@@ -510,9 +439,9 @@ async def send_random_value(callback: types.CallbackQuery):
 
 @dp.callback_query(MentorsCallbackFactory.filter())
 async def callbacks_mentors(callback: types.CallbackQuery, callback_data: MentorsCallbackFactory):
-    if statuses['can_respond']:
+    if bot_state.get_status('can_respond'):
         action = callback_data.action
-        user_status = await get_user_status('telegram_id', callback.from_user.id)
+        user_status = await get_user_status(callback.from_user.id)
         if user_status is not None:
             if user_status == 'active':
                 user_info = await get_user_info(callback.from_user.id, 'mentors')
@@ -521,71 +450,55 @@ async def callbacks_mentors(callback: types.CallbackQuery, callback_data: Mentor
                         await callback.message.delete()
                         query = "SELECT * FROM crodconnect.children where group_num = %s"
 
-                        group_list = make_db_request(query, (user_info['group_num'],))
-                        if db.result['status'] == 'ok':
-                            group_list = dict_to_list(group_list)
-                            group_list.sort(key=lambda el: el['name'])
-                            msg = await callback.message.answer(
-                                text="<b>Список группы создаётся...</b>"
-                            )
-                            group_list_filename = get_grouplist(group_list, user_info['group_num'])
-                            filepath = f"{current_directory}/wording/generated/{group_list_filename}.pdf"
-
-                            await msg.delete()
-                            document = types.FSInputFile(filepath)
-                            await bot.send_document(
-                                chat_id=callback.from_user.id,
-                                document=document,
-                                caption=f"Список группы №{user_info['group_num']}",
-                                reply_markup=kb_hello['mentors'].as_markup()
-                            )
-                            if os.path.exists(filepath):
-                                os.remove(filepath)
-                        else:
-                            await raise_error(db.result['message'], callback.from_user.id)
+                        group_list = await db.fetch_all(query, (user_info['group_num'],))
+                        group_list.sort(key=lambda el: el['name'])
+                        msg = await callback.message.answer(
+                            text="<b>Список группы создаётся...</b>"
+                        )
+                        grouplist = await asyncio.to_thread(get_grouplist, group_list, user_info['group_num'])
+
+                        await msg.delete()
+                        # если такой же список уже отправлялся, повторно используется файл на серверах Telegram
+                        message = await bot.send_document(
+                            chat_id=callback.from_user.id,
+                            document=grouplist.get_file_id() or types.BufferedInputFile(grouplist.content, grouplist.filename),
+                            caption=f"Список группы №{user_info['group_num']}",
+                            reply_markup=kb_hello['mentors'].as_markup()
+                        )
+                        grouplist.set_file_id(message.document.file_id)
 
                     elif action == "feedback":
-                        query = "SELECT COUNT(*) AS count FROM crodconnect.feedback WHERE child_id IN (SELECT id from crodconnect.children WHERE group_num = %s) AND date = %s"
+                        fb_count = await stats.feedback_count(group_num=user_info['group_num'])
+                        group_count = await stats.group_size(user_info['group_num'])
 
-                        fb_count = make_db_request(query, (user_info['group_num'], datetime.datetime.now().date(),))['count']
-                        if db.result['status'] == 'ok':
-                            query = "SELECT COUNT(*) AS count from crodconnect.children WHERE group_num = %s"
-                            group_count = make_db_request(query, (user_info['group_num'],))['count']
+                        current_date = datetime.datetime.now().date().strftime('%d.%m.%Y')
 
-                            current_date = datetime.datetime.now().date().strftime('%d.%m.%Y')
-
-                            await callback.answer(
-                                text=lexicon['callback_alerts']['mentor_fback_stat'].format(
-                                    current_date, fb_count, group_count
-                                ),
-                                show_alert=True
-                            )
-                        else:
-                            await raise_error(db.result['message'], callback.from_user.id)
+                        await callback.answer(
+                            text=lexicon['callback_alerts']['mentor_fback_stat'].format(
+                                current_date, fb_count, group_count
+                            ),
+                            show_alert=True
+                        )
 
                     elif action == "births":
                         query = "SELECT c.* FROM crodconnect.children c JOIN crodconnect.shift_info s ON c.birth < s.end_date AND c.birth >= s.start_date AND c.group_num = %s"
 
-                        birth_list = make_db_request(query, (user_info['group_num'],))
-                        if db.result['status'] == 'ok':
-                            birth_list = dict_to_list(birth_list)
-                            birth_list.sort(key=lambda el: el['birth'])
-                            if len(birth_list) > 0:
-                                await callback.message.delete()
-                                text = f"<b>Список именинников</b>\n\n"
-                                for child in birth_list:
-                                    text += f"{child['name']} ({child['birth'].day} {months[child['birth'].month]})\n"
-                                await callback.message.answer(
-                                    text=text,
-                                    reply_markup=kb_hello['mentors'].as_markup()
-                                )
-                            else:
-                                await callback.answer(
-                                    text=lexicon['callback_alerts']['no_births_group'],
-                                    show_alert=True
-                                )
+                        birth_list = await db.fetch_all(query, (user_info['group_num'],))
+                        birth_list.sort(key=lambda el: el['birth'])
+                        if len(birth_list) > 0:
+                            await callback.message.delete()
+                            text = f"<b>Список именинников</b>\n\n"
+                            for child in birth_list:
+                                text += f"{child['name']} ({child['birth'].day} {months[child['birth'].month]})\n"
+                            await callback.message.answer(
+                                text=text,
+                                reply_markup=kb_hello['mentors'].as_markup()
+                            )
                         else:
-                            await raise_error(db.result['message'], callback.from_user.id)
+                            await callback.answer(
+                                text=lexicon['callback_alerts']['no_births_group'],
+                                show_alert=True
+                            )
 
                     elif action == "modules_list":
                         await get_module_list(callback)
@@ -660,82 +573,72 @@ async def callnacks_select_module(callback: types.CallbackQuery, callback_data:
     module_id, module_name = callback_data.module_id, callback_data.name
     group_list = await get_module_children_list(module_id)
 
-    if group_list is not None:
-        group_list = dict_to_list(group_list)
-        if len(group_list) > 0:
-            group_list.sort(key=lambda el: el['name'])
-            await callback.message.delete()
+    if len(group_list) > 0:
+        await callback.message.delete()
 
-            text = f"<b>Модуль «{module_name}»</b>\n\n"
+        text = f"<b>Модуль «{module_name}»</b>\n\n"
 
-            for index, part in enumerate(group_list):
-                text += f"{index + 1}. {part['name']} ({part['group_num']})\n"
-            await callback.message.answer(
-                text=text,
-                reply_markup=kb_hello['mentors'].as_markup()
-            )
-        else:
-            await callback.answer(
-                text=f"На модуль «{module_name}» ещё никто не записан",
-                show_alert=True
-            )
+        for index, part in enumerate(group_list):
+            text += f"{index + 1}. {part['name']} ({part['group_num']})\n"
+        await callback.message.answer(
+            text=text,
+            reply_markup=kb_hello['mentors'].as_markup()
+        )
+    else:
+        await callback.answer(
+            text=f"На модуль «{module_name}» ещё никто не записан",
+            show_alert=True
+        )
 
 
 @dp.callback_query(TeachersCallbackFactory.filter())
 async def callbacks_teachers(callback: types.CallbackQuery, callback_data: TeachersCallbackFactory):
-    if statuses['can_respond']:
+    if bot_state.get_status('can_respond'):
         action = callback_data.action
-        user_status = await get_user_status('telegram_id', callback.from_user.id)
+        user_status = await get_user_status(callback.from_user.id)
         if user_status is not None:
             if user_status == 'active':
                 user_info = await get_user_info(callback.from_user.id, 'teachers')
                 if user_info is not None:
                     query = "SELECT * FROM crodconnect.modules WHERE id = %s"
 
-                    module_info = make_db_request(query, (user_info['module_id'],))
-                    if db.result['status'] == 'ok':
-                        if action == "grouplist":
-                            group_list = await get_module_children_list(user_info['module_id'])
-                            if group_list is not None:
-                                if len(group_list) > 0:
-                                    group_list = dict_to_list(group_list)
-                                    group_list.sort(key=lambda el: el['name'])
-                                    await callback.message.delete()
-
-                                    text = f"<b>Модуль «{module_info['name']}»</b>\n\n"
-
-                                    for index, part in enumerate(group_list):
-                                        text += f"{index + 1}. {part['name']} ({part['group_num']})\n"
-                                    await callback.message.answer(
-                                        text=text,
-                                        reply_markup=kb_hello['teachers'].as_markup()
-                                    )
-                                else:
-                                    await callback.answer(
-                                        text=lexicon['callback_alerts']['no_parts_in_module'],
-                                        show_alert=True
-                                    )
-                        elif action == "feedback":
-                            feedback_list = await get_module_feedback_today(user_info['module_id'])
-                            if feedback_list is not None:
-                                if len(feedback_list) > 0:
-                                    await callback.message.delete()
-                                    current_date = datetime.datetime.now().date().strftime('%d.%m.%Y')
-                                    text = f"<b>Обратная связь по модулю «{module_info['name']}» за {current_date}</b>\n\n"
-                                    for fb in feedback_list:
-                                        text += f"Оценка: {fb['mark']}\nКомментарий: {fb['comment']}\n\n"
-                                    await callback.message.answer(
-                                        text=text,
-                                        reply_markup=kb_hello['teachers'].as_markup()
-                                    )
-
-                                else:
-                                    await callback.answer(
-                                        text=lexicon['callback_alerts']['no_fback_teacher'],
-                                        show_alert=True
-                                    )
-                    else:
-                        await raise_error(db.result['message'], callback.from_user.id)
+                    module_info = await db.fetch_one(query, (user_info['module_id'],))
+                    if action == "grouplist":
+                        group_list = await get_module_children_list(user_info['module_id'])
+                        if len(group_list) > 0:
+                            await callback.message.delete()
+
+                            text = f"<b>Модуль «{module_info['name']}»</b>\n\n"
+
+                            for index, part in enumerate(group_list):
+                                text += f"{index + 1}. {part['name']} ({part['group_num']})\n"
+                            await callback.message.answer(
+                                text=text,
+                                reply_markup=kb_hello['teachers'].as_markup()
+                            )
+                        else:
+                            await callback.answer(
+                                text=lexicon['callback_alerts']['no_parts_in_module'],
+                                show_alert=True
+                            )
+                    elif action == "feedback":
+                        feedback_list = await get_module_feedback_today(user_info['module_id'])
+                        if len(feedback_list) > 0:
+                            await callback.message.delete()
+                            current_date = datetime.datetime.now().date().strftime('%d.%m.%Y')
+                            text = f"<b>Обратная связь по модулю «{module_info['name']}» за {current_date}</b>\n\n"
+                            for fb in feedback_list:
+                                text += f"Оценка: {fb['mark']}\nКомментарий: {fb['comment']}\n\n"
+                            await callback.message.answer(
+                                text=text,
+                                reply_markup=kb_hello['teachers'].as_markup()
+                            )
+
+                        else:
+                            await callback.answer(
+                                text=lexicon['callback_alerts']['no_fback_teacher'],
+                                show_alert=True
+                            )
             else:
                 await callback.answer(
                     text=lexicon['callback_alerts']['teacher_access_denied'],
@@ -764,39 +667,41 @@ async def radio_text_sended(message: Message, state: FSMContext):
                  f"\n\n{message.text.strip()}",
             reply_markup=kb_hello['children'].as_markup()
         )
-        radio_request_user_list.append(message.from_user.id)
+        bot_state.add_radio_request(message.from_user.id)
 
 
 @dp.message(Feedback.feedback_text)
 async def feedback_mark_sended(message: Message, state: FSMContext):
     user_info = await get_user_info(message.from_user.id, "children")
     if user_info is not None:
-        feedback = feedback_temp_data_dict[user_info['id']]
+        feedback = bot_state.get_draft(user_info['id'])
         await state.clear()
+        if 'mark' not in feedback or 'module_name' not in feedback:
+            # черновик истёк или уже отправлен
+            await create_feedback_proccess(user_info)
+            return
         if "/skip" in message.text:
             comment = "отсутствует"
         else:
             comment = message.text
         query = "INSERT INTO crodconnect.feedback (module_id, child_id, mark, comment, date) VALUES (%s, %s, %s, %s, %s)"
 
-        make_db_request(query, (feedback['module_id'], user_info['id'], feedback['mark'], comment, datetime.datetime.now().date()))
-        if db.result['status'] == 'ok':
-            await bot.send_message(
-                chat_id=os.getenv('ID_GROUP_FBACK'),
-                text=f"<b>Модуль {feedback['module_name']}</b>"
-                     f"\nОценка: {feedback['mark']}"
-                     f"\nКомменатрий: {markdown.text(comment)}"
-            )
-            await create_feedback_proccess(user_info, feedback['callback'], "after")
-        else:
-            await raise_error(db.result['message'], message.from_user.id)
+        await db.execute(query, (feedback['module_id'], user_info['id'], feedback['mark'], comment, datetime.datetime.now().date()))
+        await stats.feedback_added(user_info['group_num'], feedback['module_id'])
+        await bot.send_message(
+            chat_id=os.getenv('ID_GROUP_FBACK'),
+            text=f"<b>Модуль {feedback['module_name']}</b>"
+                 f"\nОценка: {feedback['mark']}"
+                 f"\nКомменатрий: {markdown.text(comment)}"
+        )
+        await create_feedback_proccess(user_info, "after")
 
 
 @dp.callback_query(RadioRequestCallbackFactory.filter())
 async def callbacks_radio(callback: types.CallbackQuery, callback_data: RadioRequestCallbackFactory, state: FSMContext):
     child_id = callback_data.child_id
     action = callback_data.action
-    radio_request_user_list.remove(child_id)
+    bot_state.remove_radio_request(child_id)
     await callback.message.delete_reply_markup()
     if action == 'accept':
         text = "📨<b>Тук-тук, новое сообщение</b>" \
@@ -816,9 +721,9 @@ async def callbacks_radio(callback: types.CallbackQuery, callback_data: RadioReq
 
 @dp.callback_query(AdminsCallbackFactory.filter())
 async def callbacks_admins(callback: types.CallbackQuery, callback_data: AdminsCallbackFactory, state: FSMContext):
-    if statuses['can_respond']:
+    if bot_state.get_status('can_respond'):
         action = callback_data.action
-        user_status = await get_user_status('telegram_id', callback.from_user.id)
+        user_status = await get_user_status(callback.from_user.id)
         if user_status is not None:
             if user_status == 'active':
                 if action == "modules_list":
@@ -844,151 +749,147 @@ async def callbacks_admins(callback: types.CallbackQuery, callback_data: AdminsC
                 )
 
 
-async def send_recorded_modules_info(child_id: int, callback: types.CallbackQuery):
-    query = "SELECT * FROM crodconnect.modules WHERE id IN (SELECT module_id FROM crodconnect.modules_records WHERE child_id = %s)"
-    recorded_modules_info = make_db_request(query, (child_id,))
-    if db.result['status'] == 'ok':
-        recorded_modules_info = dict_to_list(recorded_modules_info)
-        text = "<b>Твои образовательные модули</b>\n\n"
-        for index, module in enumerate(recorded_modules_info):
-            query = "SELECT name FROM crodconnect.teachers WHERE module_id = %s"
-            teacher_name = make_db_request(query, (module['id'],))['name']
-            if db.result['status'] == 'ok':
-                text += f"{index + 1}. {module['name']}" \
-                        f"\n🧑‍🏫 {teacher_name}" \
-                        f"\n📍 {module['location']}\n\n"
-            else:
-                await raise_error(db.result['message'], callback.from_user.id)
-                return
+async def get_child_records(child_id: int) -> set:
+    query = "SELECT module_id FROM crodconnect.modules_records WHERE child_id = %s"
+    return {record['module_id'] for record in await db.fetch_all(query, (child_id,))}
 
-        await callback.message.answer(
-            text=text,
-            reply_markup=kb_hello['children'].as_markup()
-        )
-    else:
-        await raise_error(db.result['message'], callback.from_user.id)
 
+async def send_recorded_modules_info(child_id: int, callback: types.CallbackQuery, records: set = None):
+    if records is None:
+        records = await get_child_records(child_id)
+    text = "<b>Твои образовательные модули</b>\n\n"
+    index = 0
+    for module_id in sorted(records):
+        module = await catalogue.get(module_id)
+        if module is None:
+            continue
+        index += 1
+        text += f"{index}. {module['name']}" \
+                f"\n🧑‍🏫 {module['teacher_name']}" \
+                f"\n📍 {module['location']}\n\n"
 
-@dp.callback_query(RecordModuleToChildCallbackFactory.filter())
-async def callbacks_children(callback: types.CallbackQuery, callback_data: RecordModuleToChildCallbackFactory, state: FSMContext):
-    query = """
-        INSERT INTO crodconnect.modules_records (child_id, module_id) VALUES (%s, %s);
-        UPDATE crodconnect.modules SET seats_real = seats_real + 1 WHERE id = %s;
-    """
+    await callback.message.answer(
+        text=text,
+        reply_markup=kb_hello['children'].as_markup()
+    )
 
-    make_db_request(query, (callback_data.child_id, callback_data.module_id, callback_data.module_id,))
-    if db.result['status'] == 'ok':
-        await recording_to_module_process(callback_data.child_id, callback)
-    else:
-        await raise_error(db.result['message'], callback.from_user.id)
-
-
-async def generate_modules_list_to_record(child_id: int, callback: types.CallbackQuery):
-    # выбрать модули, на которые чел не записан и на которых есть свободное место
-    query = "SELECT * FROM crodconnect.modules WHERE id NOT IN (SELECT module_id FROM crodconnect.modules_records WHERE child_id = %s) AND seats_real < seats_max"
-
-    modules_list = make_db_request(query, (child_id,))
-    if db.result['status'] == 'ok':
-        modules_list = dict_to_list(modules_list)
-        query = "SELECT COUNT(*) AS count FROM crodconnect.modules_records WHERE child_id = %s"
-        recorded_modules_count = make_db_request(query, (child_id,))['count']
-        if db.result['status'] == 'ok':
-            builder = keyboard.InlineKeyboardBuilder()
-
-            for module in modules_list:
-                builder.button(text=module['name'], callback_data=RecordModuleToChildCallbackFactory(child_id=child_id, module_id=module['id']))
-            builder.adjust(1)
-            await callback.message.answer(
-                text=f"Выбери модуль №{recorded_modules_count + 1}",
-                reply_markup=builder.as_markup()
-            )
-        else:
-            await raise_error(db.result['message'], callback.from_user.id)
 
-    else:
-        await raise_error(db.result['message'], callback.from_user.id)
+@dp.callback_query(RecordModuleToChildCallbackFactory.filter())
+async def callbacks_children(callback: types.CallbackQuery, callback_data: RecordModuleToChildCallbackFactory, state: FSMContext):
+    result = await seats.reserve_seat(db, callback_data.child_id, callback_data.module_id, config['modules_count'])
+    if result == seats.FULL:
+        await catalogue.mark_full(callback_data.module_id)
+        # клавиатура собиралась, когда места ещё были, показывается обновлённый список
+        await callback.answer(
+            text=lexicon['callback_alerts']['module_full'],
+            show_alert=True
+        )
+        await callback.message.delete()
+        await generate_modules_list_to_record(callback_data.child_id, callback)
+        return
+    if result == seats.RESERVED:
+        await catalogue.seat_taken(callback_data.module_id)
+    await recording_to_module_process(callback_data.child_id, callback)
+
+
+async def generate_modules_list_to_record(child_id: int, callback: types.CallbackQuery, records: set = None):
+    # модули, на которые ребёнок не записан и на которых есть свободное место, берутся из снимка каталога
+    if records is None:
+        records = await get_child_records(child_id)
+    modules_list = await catalogue.available(records)
+    builder = keyboard.InlineKeyboardBuilder()
+
+    for module in modules_list:
+        builder.button(text=module['name'], callback_data=RecordModuleToChildCallbackFactory(child_id=child_id, module_id=module['id']))
+    builder.adjust(1)
+    await callback.message.answer(
+        text=f"Выбери модуль №{len(records) + 1}",
+        reply_markup=builder.as_markup()
+    )
 
 
 async def recording_to_module_process(child_id: int, callback: types.CallbackQuery):
-    query = "SELECT * FROM crodconnect.modules_records WHERE child_id = %s"
-
-    modules_records_list = make_db_request(query, (child_id,))
-    if db.result['status'] == 'ok':
-        modules_records_list = dict_to_list(modules_records_list)
-        if len(modules_records_list) > 0:
-            await callback.message.delete()
-            if len(modules_records_list) == config['modules_count']:
-                await send_recorded_modules_info(child_id, callback)
-            else:
-                await generate_modules_list_to_record(child_id, callback)
+    records = await get_child_records(child_id)
+    if len(records) > 0:
+        await callback.message.delete()
+        if len(records) == config['modules_count']:
+            await send_recorded_modules_info(child_id, callback, records)
         else:
-            if statuses['modules_record']:
-                await callback.message.delete()
-                await generate_modules_list_to_record(child_id, callback)
-            else:
-                await callback.answer(
-                    text=lexicon['callback_alerts']['no_module_record'],
-                    show_alert=True
-                )
+            await generate_modules_list_to_record(child_id, callback, records)
     else:
-        await raise_error(db.result['message'], callback.from_user.id)
+        if bot_state.get_status('modules_record'):
+            await callback.message.delete()
+            await generate_modules_list_to_record(child_id, callback, records)
+        else:
+            await callback.answer(
+                text=lexicon['callback_alerts']['no_module_record'],
+                show_alert=True
+            )
 
 
 @dp.callback_query(FeedbackMarkCallbackFactory.filter())
 async def callbacks_children(callback: types.CallbackQuery, callback_data: FeedbackMarkCallbackFactory, state: FSMContext):
-    feedback_temp_data_dict[callback_data.child_id]['mark'] = callback_data.mark
-    feedback_temp_data_dict[callback_data.child_id]['callback'] = callback
+    draft = bot_state.get_draft(callback_data.child_id)
+    if 'module_name' not in draft or draft.get('module_id') != callback_data.module_id:
+        # черновик истёк, уже отправлен или кнопки остались от другого модуля: форма создаётся заново
+        await callback.answer(
+            text=lexicon['callback_alerts']['feedback_expired'],
+            show_alert=True
+        )
+        await callback.message.delete()
+        await state.clear()
+        user_info = await get_user_info(callback.from_user.id, "children")
+        if user_info is not None:
+            await create_feedback_proccess(user_info)
+        return
+
+    draft = bot_state.update_draft(callback_data.child_id, mark=callback_data.mark)
     await callback.message.delete()
     await callback.message.answer(
-        f"<b>Обратная связь по модулю «{feedback_temp_data_dict[callback_data.child_id]['module_name']}»</b>"
+        f"<b>Обратная связь по модулю «{draft['module_name']}»</b>"
         f"\nТвоя оценка: {callback_data.mark}"
         f"\n\nНапиши короткий комментарий к своей оценке (что понравилось, а что не очень)\nЕсли не хочешь ничего писать, то отправь /skip"
     )
     await state.set_state(Feedback.feedback_text)
 
 
-async def create_feedback_proccess(user_info: [], callback: types.CallbackQuery, call_type: str = "new"):
-    feedback_temp_data_dict[user_info['id']] = {}
+async def create_feedback_proccess(user_info: [], call_type: str = "new"):
+    bot_state.delete_draft(user_info['id'])
 
     query = "SELECT * FROM crodconnect.modules WHERE id IN (SELECT module_id FROM crodconnect.modules_records WHERE child_id = %s) AND id NOT IN (SELECT module_id FROM crodconnect.feedback WHERE child_id = %s AND date = %s)"
 
-    need_to_give_feedback_list = make_db_request(query, (user_info['id'], user_info['id'], datetime.datetime.now().date(),))
-    need_to_give_feedback_list = dict_to_list(need_to_give_feedback_list)
-    if db.result['status'] == 'ok':
-        if len(need_to_give_feedback_list) > 0:
-            module = need_to_give_feedback_list[0]
-            feedback_temp_data_dict[user_info['id']]['module_id'] = module['id']
-            feedback_temp_data_dict[user_info['id']]['module_name'] = module['name']
-            emojis = {1: "😠", 2: "☹", 3: "😐", 4: "🙂", 5: "😃", }
-            builder = keyboard.InlineKeyboardBuilder()
-            for i in range(1, 6):
-                builder.button(text=f'{i}{emojis[i]}', callback_data=FeedbackMarkCallbackFactory(child_id=user_info['id'], module_id=module['id'], mark=i))
-            builder.adjust(5)
+    need_to_give_feedback_list = await db.fetch_all(query, (user_info['id'], user_info['id'], datetime.datetime.now().date(),))
+    if len(need_to_give_feedback_list) > 0:
+        module = need_to_give_feedback_list[0]
+        bot_state.set_draft(user_info['id'], {'module_id': module['id'], 'module_name': module['name']})
+        emojis = {1: "😠", 2: "☹", 3: "😐", 4: "🙂", 5: "😃", }
+        builder = keyboard.InlineKeyboardBuilder()
+        for i in range(1, 6):
+            builder.button(text=f'{i}{emojis[i]}', callback_data=FeedbackMarkCallbackFactory(child_id=user_info['id'], module_id=module['id'], mark=i))
+        builder.adjust(5)
+        await bot.send_message(
+            chat_id=user_info['telegram_id'],
+            text=f"<b>Обратная связь по модулю «{module['name']}»</b>"
+                 f"\n\nКак всё прошло? "
+                 f"Выбери оценку от 1 до 5, где 1 - <b>очень плохо</b>, а 5 - <b>очень хорошо</b>",
+            reply_markup=builder.as_markup()
+        )
+        return True
+    else:
+        if call_type == "after":
             await bot.send_message(
                 chat_id=user_info['telegram_id'],
-                text=f"<b>Обратная связь по модулю «{module['name']}»</b>"
-                     f"\n\nКак всё прошло? "
-                     f"Выбери оценку от 1 до 5, где 1 - <b>очень плохо</b>, а 5 - <b>очень хорошо</b>",
-                reply_markup=builder.as_markup()
+                text="Обратная связь за сегодня отправлена, спасибо!",
+                reply_markup=kb_hello['children'].as_markup()
             )
-            return True
-        else:
-            if call_type == "after":
-                await callback.message.answer(
-                    text="Обратная связь за сегодня отправлена, спасибо!",
-                    reply_markup=kb_hello['children'].as_markup()
-                )
-            return False
-    else:
-        await raise_error(db.result['message'], callback.from_user.id)
-        return None
+        return False
 
 
 @dp.callback_query(ChildrenCallbackFactory.filter())
 async def callbacks_children(callback: types.CallbackQuery, callback_data: ChildrenCallbackFactory, state: FSMContext):
-    if statuses['can_respond']:
+    if bot_state.get_status('can_respond'):
         action = callback_data.action
-        user_status = await get_user_status('telegram_id', callback.from_user.id)
+        user_status = await get_user_status(callback.from_user.id)
         if user_status is not None:
             if user_status == 'active':
                 user_info = await get_user_info(callback.from_user.id, 'children')
@@ -997,8 +898,8 @@ async def callbacks_children(callback: types.CallbackQuery, callback_data: Child
                         await recording_to_module_process(user_info['id'], callback)
 
                     elif action == "feedback":
-                        if statuses['feedback']:
-                            passed = await create_feedback_proccess(user_info, callback)
+                        if bot_state.get_status('feedback'):
+                            passed = await create_feedback_proccess(user_info)
                             if not passed:
                                 await callback.answer(
                                     text="Ты уже отправил(-а) обратную связь по сегодняшим модулям, спасибо!",
@@ -1013,8 +914,8 @@ async def callbacks_children(callback: types.CallbackQuery, callback_data: Child
                             )
 
                     elif action == "radio":
-                        if statuses['radio']:
-                            if user_info['telegram_id'] not in radio_request_user_list:
+                        if bot_state.get_status('radio'):
+                            if not bot_state.has_radio_request(user_info['telegram_id']):
                                 await callback.message.delete()
                                 await state.set_state(Radio.request_text)
                                 await callback.message.answer(
@@ -1046,51 +947,71 @@ async def callbacks_children(callback: types.CallbackQuery, callback_data: Child
 
 async def start_feedback():
     logging.info('Schedule: starting feedback')
-    if statuses['can_respond']:
-        statuses['feedback'] = True
+    if bot_state.get_status('can_respond'):
+        bot_state.set_status('feedback', True)
         query = "SELECT * FROM crodconnect.children WHERE status = 'active'"
 
-        children_list = make_db_request(query)
-        if db.result['status'] == 'ok':
-            for child in children_list:
-                if child['telegram_id']:
-                    await bot.send_message(
-                        chat_id=child['telegram_id'],
-                        text="Сбор обратной связи открыт!",
-                        reply_markup=kb_hello['children'].as_markup()
-                    )
-        else:
-            await raise_error(db.result['message'])
+        try:
+            children_list = await db.fetch_all(query)
+        except DatabaseError as e:
+            logging.error(f'Schedule: {e}')
+            await raise_error(str(e))
+            return
+
+        progress = ProgressMessage(bot, os.getenv('ID_GROUP_ERRORS'))
+        await progress.start("Сбор обратной связи", len(children_list))
+        report = await broadcaster.send_messages(
+            "Сбор обратной связи",
+            [child['telegram_id'] for child in children_list],
+            on_progress=progress,
+            text="Сбор обратной связи открыт!",
+            reply_markup=kb_hello['children'].as_markup()
+        )
+        await progress.finish(report)
 
 
 async def check_for_start_module():
-    config = load_config_file('config.json')
-
-    if config['module_record'] and not statuses['modules_record']:
+    if config['module_record'] and not bot_state.get_status('modules_record'):
         logging.info('Schedule: openning modules record')
-        statuses['modules_record'] = True
+        # снимок каталога загружается до того, как дети начнут массово открывать список модулей
+        try:
+            await catalogue.warm()
+        except DatabaseError as e:
+            logging.error(f'Schedule: {e}')
+        bot_state.set_status('modules_record', True)
 
         await bot.send_message(
             chat_id=os.getenv('ID_GROUP_ERRORS'),
             text="<b>Образовательные модули</b>\n\n" + "✅ Запись на образовательные модули открыта",
         )
 
-    elif not config['module_record'] and statuses['modules_record']:
+    elif not config['module_record'] and bot_state.get_status('modules_record'):
         logging.info('Schedule: closing modules record')
-        statuses['modules_record'] = False
+        bot_state.set_status('modules_record', False)
+        catalogue.invalidate()
 
         await bot.send_message(
             chat_id=os.getenv('ID_GROUP_ERRORS'),
             text="<b>Образовательные модули</b>\n\n" + "⛔ Запись на образовательные модули закрыта",
         )
 
-    elif config['module_record'] and statuses['modules_record']:
+    elif config['module_record'] and bot_state.get_status('modules_record'):
         pass
 
 
+async def on_config_change(new_config: dict):
+    # панель публикует версию после каждой записи config.json
+    global config
+    shift_changed = new_config['shift'] != config['shift']
+    config = new_config
+    await check_for_start_module()
+    if shift_changed:
+        await check_for_date()
+
+
 async def check_for_date():
     logging.info("Check for shift end")
-    shift = load_config_file('config.json')['shift']
+    shift = config['shift']
     dates = shift['shift_list'][shift['current_shift']]['date']
 
     text = f"<b>Текущая смена/поток:</b> {shift['shift_list'][shift['current_shift']]['name']}" \
@@ -1098,7 +1019,7 @@ async def check_for_date():
 
     if not (datetime.datetime.strptime(dates['start'], '%Y-%m-%d') <= datetime.datetime.now() <= datetime.datetime.strptime(dates['end'], '%Y-%m-%d')):
         logging.info("Shift ended, responding to actions stopped")
-        statuses['can_respond'] = False
+        bot_state.set_status('can_respond', False)
         btn = keyboard.InlineKeyboardBuilder().button(
             text="Открыть Коннект",
             url=f"{base_crod_url}/connect"
@@ -1107,7 +1028,7 @@ async def check_for_date():
         kb = btn.as_markup()
 
     else:
-        statuses['can_respond'] = True
+        bot_state.set_status('can_respond', True)
         logging.info("Shift not ended, running responding to actions")
         text += "✅ Бот доступен для всех групп пользователей"
         kb = None
@@ -1119,55 +1040,114 @@ async def check_for_date():
     )
 
 
+async def load_feedback_reports(date: datetime.date) -> dict:
+    """
+    Отзывы за день по всем активным преподавателям одним запросом
+    :return: словарь id преподавателя -> {'telegram_id': ..., 'teacher': ..., 'module_id': ..., 'module_name': ..., 'feedback': [...]}
+    """
+
+    query = """
+        SELECT t.id, t.telegram_id, t.name AS teacher_name, t.module_id, m.name AS module_name, f.mark, f.comment
+        FROM crodconnect.teachers t
+        LEFT JOIN crodconnect.modules m ON m.id = t.module_id
+        LEFT JOIN crodconnect.feedback f ON f.module_id = t.module_id AND f.date = %s
+        WHERE t.status = 'active'
+        ORDER BY t.id, f.id
+    """
+
+    reports = {}
+    for row in await db.fetch_all(query, (date,)):
+        report = reports.setdefault(row['id'], {
+            'telegram_id': row['telegram_id'],
+            'teacher': row['teacher_name'],
+            'module_id': row['module_id'],
+            'module_name': row['module_name'],
+            'feedback': []
+        })
+        if row['mark'] is not None:
+            report['feedback'].append({'mark': row['mark'], 'comment': row['comment']})
+
+    return reports
+
+
 async def stop_feedback():
     logging.info('Schedule: stopping feedback')
-    if statuses['can_respond']:
-        statuses['feedback'] = False
-        query = "SELECT * FROM crodconnect.teachers WHERE status = 'active'"
-
-        teachers_list = make_db_request(query)
-        teachers_list = dict_to_list(teachers_list)
-        if db.result['status'] == 'ok':
-            teachers_list = dict_to_list(teachers_list)
-            for teacher in teachers_list:
-                query = "SELECT * FROM crodconnect.feedback WHERE date = %s AND module_id = %s"
-                feedback_list = make_db_request(query, (datetime.datetime.now().date(), teacher['module_id']))
-                if db.result['status'] == 'ok':
-                    if len(feedback_list) > 0:
-                        query = "SELECT name FROM crodconnect.modules WHERE id = %s"
-                        module_name = make_db_request(query, (teacher['module_id'],))['name']
-                        if db.result['status'] == 'ok':
-                            filename = get_feedback(module_name, feedback_list)
-                            filepath = f"{current_directory}/wording/generated/{filename}.pdf"
-                            document = types.FSInputFile(filepath)
-                            date = datetime.datetime.now().date().strftime('%d.%m.%Y')
-                            await bot.send_document(
-                                chat_id=teacher['telegram_id'],
-                                document=document,
-                                caption=f"<b>Рассылка обратной связи</b>"
-                                        f"\n\nОбратная связь по вашему модулю за {date}",
-                                reply_markup=kb_hello['mentors'].as_markup()
-                            )
-                            if os.path.exists(filepath):
-                                os.remove(filepath)
-                        else:
-                            await raise_error(db.result['message'])
-                            return
-                    else:
-                        await bot.send_message(
-                            chat_id=teacher['telegram_id'],
-                            text=f"<b>Рассылка обратной связи</b>"
-                                 f"\n\n{' '.join(teacher['name'].split()[1:])}, за сегодняшний день по вашему образовательному модулю не было получено обратной связи",
-                            reply_markup=kb_hello['teachers'].as_markup()
-                        )
-                else:
-                    await raise_error(db.result['message'])
-                    return
-        else:
-            await raise_error(db.result['message'])
+    if bot_state.get_status('can_respond'):
+        bot_state.set_status('feedback', False)
+        today = datetime.datetime.now().date()
+
+        try:
+            reports = await load_feedback_reports(today)
+        except DatabaseError as e:
+            logging.error(f'Schedule: {e}')
+            await raise_error(str(e))
+            return
+
+        # отчёты рендерятся параллельно в пуле wording, по одному на модуль
+        loop = asyncio.get_running_loop()
+        modules = {report['module_id']: report for report in reports.values() if report['feedback']}
+        rendered = await asyncio.gather(
+            *(loop.run_in_executor(documents_pool, get_feedback, report['module_name'], report['feedback']) for report in modules.values()),
+            return_exceptions=True
+        )
+        documents = dict(zip(modules, rendered))
+
+        # у одного аккаунта может быть несколько модулей (или несколько записей преподавателя), отправляются все
+        by_chat = {}
+        for report in reports.values():
+            chat_reports = by_chat.setdefault(report['telegram_id'], {})
+            chat_reports.setdefault(report['module_id'], report)
+
+        async def send_report(telegram_id, report):
+            if report['feedback']:
+                document = documents[report['module_id']]
+                if isinstance(document, Exception):
+                    # ошибка рендера попадёт в отчёт о рассылке только для этого преподавателя
+                    raise document
+                await bot.send_document(
+                    chat_id=telegram_id,
+                    document=types.BufferedInputFile(document.content, document.filename),
+                    caption=f"<b>Рассылка обратной связи</b>"
+                            f"\n\nОбратная связь по модулю «{report['module_name']}» за {today.strftime('%d.%m.%Y')}",
+                    reply_markup=kb_hello['teachers'].as_markup()
+                )
+            else:
+                await bot.send_message(
+                    chat_id=telegram_id,
+                    text=f"<b>Рассылка обратной связи</b>"
+                         f"\n\n{' '.join(report['teacher'].split()[1:])}, за сегодняшний день по образовательному модулю «{report['module_name']}» не было получено обратной связи",
+                    reply_markup=kb_hello['teachers'].as_markup()
+                )
+
+        # уже отправленные отчёты (чат, модуль): при повторе после flood control они не отправляются снова
+        sent = set()
+
+        async def send_feedback(telegram_id):
+            # ошибка одного отчёта не мешает отправить остальные, в отчёт о рассылке попадает первая
+            failure = None
+            for module_id, report in by_chat[telegram_id].items():
+                if (telegram_id, module_id) in sent:
+                    continue
+                try:
+                    await send_report(telegram_id, report)
+                    sent.add((telegram_id, module_id))
+                except Exception as e:
+                    failure = failure or e
+            if failure is not None:
+                raise failure
+
+        progress = ProgressMessage(bot, os.getenv('ID_GROUP_ERRORS'))
+        await progress.start("Обратная связь преподавателям", len(by_chat))
+        report = await broadcaster.run("Обратная связь преподавателям", list(by_chat), send_feedback, on_progress=progress)
+        await progress.finish(report)
 
 
 async def main():
+    try:
+        await db.connect()
+    except DatabaseError as e:
+        # пул будет создан при первом запросе
+        logging.error(f'Database: {e}')
     await check_for_date()
     scheduler = AsyncIOScheduler()
     schedule = config['auto_actions']
@@ -1192,11 +1172,11 @@ async def main():
         hour=0,
         minute=0
     )
+    # сверка счётчиков статистики с таблицами
     scheduler.add_job(
-        check_for_start_module,
-        "cron",
-        day_of_week="mon-sun",
-        minute='*'
+        stats.reconcile,
+        "interval",
+        minutes=15
     )
     scheduler.print_jobs()
     scheduler.start()
@@ -1207,8 +1187,20 @@ async def main():
                  "\n\nTelegram-бот перезагружен!"
         )
 
+    identities_listener = asyncio.create_task(identities.listen(os.getenv('DB_HOST'), os.getenv('REDIS_PORT'), os.getenv('REDIS_PASSWORD')))
+    catalogue_listener = asyncio.create_task(catalogue.listen(os.getenv('DB_HOST'), os.getenv('REDIS_PORT'), os.getenv('REDIS_PASSWORD')))
+    config_listener = asyncio.create_task(config_service.listen(os.getenv('DB_HOST'), os.getenv('REDIS_PORT'), os.getenv('REDIS_PASSWORD'), on_config_change))
+
     await bot(DeleteWebhook(drop_pending_updates=True))
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        identities_listener.cancel()
+        catalogue_listener.cancel()
+        config_listener.cancel()
+        await stats.close()
+        await dp.storage.close()
+        await db.disconnect()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,197 @@
+import asyncio
+import time
+from logging import info, error
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest, TelegramNotFound, TelegramNetworkError, TelegramServerError
+
+
+class TokenBucket:
+    """
+    Ограничение частоты: не больше rate отправок в секунду, всплеск до capacity.
+    pause() останавливает выдачу токенов, например после flood control от Telegram
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class BroadcastReport:
+    def __init__(self, title: str, total: int):
+        self.title = title
+        self.total = total
+        self.delivered = 0
+        self.skipped = 0
+        self.failed = {}
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        # сколько получателей было обработано при последнем вызове on_progress
+        self.reported = 0
+
+    @property
+    def done(self):
+        return self.delivered + self.skipped + len(self.failed)
+
+    def progress(self):
+        return f"<b>Рассылка «{self.title}»</b>" \
+               f"\n\nОтправлено: {self.done}/{self.total}" \
+               f"\nОшибки: {len(self.failed)}"
+
+    def summary(self):
+        duration = (self.finished_at or time.monotonic()) - self.started_at
+        text = f"<b>Рассылка «{self.title}»</b>" \
+               f"\n\nДоставлено: {self.delivered}/{self.total}" \
+               f"\nБез Telegram: {self.skipped}" \
+               f"\nОшибки: {len(self.failed)}" \
+               f"\nВремя: {duration:.1f} с"
+        if self.failed:
+            text += "\n\n" + "\n".join(f"{chat_id}: {reason}" for chat_id, reason in list(self.failed.items())[:10])
+            if len(self.failed) > 10:
+                text += f"\n... и ещё {len(self.failed) - 10}"
+        return text
+
+
+class Broadcaster:
+    """
+    Массовые рассылки с ограничением частоты.
+    Общий лимит на бота (global_rate сообщений в секунду) и лимит на каждый чат (per_chat_rate),
+    не больше concurrency запросов одновременно. Ошибка одного получателя не прерывает рассылку
+    """
+
+    def __init__(self, bot: Bot, global_rate: float = 25, per_chat_rate: float = 1, concurrency: int = 10, max_retries: int = 3):
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.chat_buckets = {}
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        if chat_id not in self.chat_buckets:
+            self.chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, 1)
+        return self.chat_buckets[chat_id]
+
+    async def _deliver(self, chat_id, send, report: BroadcastReport):
+        for attempt in range(1, self.max_retries + 1):
+            await self._chat_bucket(chat_id).acquire()
+            await self.global_bucket.acquire()
+            try:
+                await send(chat_id)
+                report.delivered += 1
+                return
+            except TelegramRetryAfter as e:
+                # flood control действует на весь бот, поэтому останавливается общая очередь
+                info(f"Broadcast: flood control, retry after {e.retry_after}s")
+                self.global_bucket.pause(e.retry_after)
+            except (TelegramForbiddenError, TelegramBadRequest, TelegramNotFound) as e:
+                report.failed[chat_id] = e.message
+                return
+            except (TelegramNetworkError, TelegramServerError) as e:
+                if attempt == self.max_retries:
+                    report.failed[chat_id] = str(e)
+                    return
+                await asyncio.sleep(2 ** attempt)
+            except Exception as e:
+                error(f"Broadcast: {chat_id}: {e}")
+                report.failed[chat_id] = str(e)
+                return
+        report.failed[chat_id] = "flood control"
+
+    async def run(self, title: str, chat_ids: list, send, on_progress=None, progress_step: int = 50) -> BroadcastReport:
+        """
+        Рассылка по списку чатов
+        :param title: название рассылки для отчёта
+        :param chat_ids: telegram_id получателей, пустые значения пропускаются
+        :param send: корутина send(chat_id), отправляющая сообщение одному получателю
+        :param on_progress: корутина on_progress(report), вызывается каждые progress_step получателей
+        :return: отчёт о доставке
+        """
+
+        report = BroadcastReport(title, len(chat_ids))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        info(f"Broadcast: {title} started for {len(chat_ids)} chats")
+
+        async def worker(chat_id):
+            if not chat_id:
+                report.skipped += 1
+            else:
+                async with semaphore:
+                    await self._deliver(chat_id, send, report)
+            if on_progress is not None and report.done - report.reported >= progress_step:
+                report.reported = report.done
+                await on_progress(report)
+
+        await asyncio.gather(*(worker(chat_id) for chat_id in chat_ids))
+
+        report.finished_at = time.monotonic()
+        # лимиты чатов, в которые давно ничего не отправлялось, больше не нужны
+        self.chat_buckets = {chat_id: bucket for chat_id, bucket in self.chat_buckets.items() if report.finished_at - bucket.updated_at < 60}
+        info(f"Broadcast: {title} finished, delivered {report.delivered}/{report.total}, failed {len(report.failed)}")
+        return report
+
+    async def send_messages(self, title: str, chat_ids: list, on_progress=None, **message_kwargs) -> BroadcastReport:
+        # одинаковое сообщение всем получателям, аргументы как у bot.send_message
+        async def send(chat_id):
+            await self.bot.send_message(chat_id=chat_id, **message_kwargs)
+
+        return await self.run(title, chat_ids, send, on_progress=on_progress)
+
+
+class ProgressMessage:
+    """
+    Сообщение о ходе рассылки: отправляется при старте, обновляется через on_progress
+    и в конце заменяется итоговым отчётом
+    """
+
+    def __init__(self, bot: Bot, chat_id):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = None
+
+    async def start(self, title: str, total: int):
+        try:
+            message = await self.bot.send_message(chat_id=self.chat_id, text=BroadcastReport(title, total).progress())
+            self.message_id = message.message_id
+        except Exception as e:
+            error(f"Broadcast: progress message not sent: {e}")
+
+    async def __call__(self, report: BroadcastReport):
+        if self.message_id is None:
+            return
+        try:
+            await self.bot.edit_message_text(chat_id=self.chat_id, message_id=self.message_id, text=report.progress())
+        except Exception as e:
+            # ошибка обновления прогресса не должна прерывать рассылку
+            error(f"Broadcast: progress message not updated: {e}")
+
+    async def finish(self, report: BroadcastReport):
+        if self.message_id is not None:
+            try:
+                await self.bot.edit_message_text(chat_id=self.chat_id, message_id=self.message_id, text=report.summary())
+                return
+            except Exception as e:
+                error(f"Broadcast: progress message not updated: {e}")
+        await self.bot.send_message(chat_id=self.chat_id, text=report.summary())
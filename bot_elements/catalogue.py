@@ -0,0 +1,131 @@
+import asyncio
+import time
+from logging import info, error
+
+import redis.asyncio as aioredis
+
+# канал Redis, в который бот и панель публикуют id модуля, места или данные которого изменились, или '*' (перечитать все)
+CATALOGUE_CHANNEL = "connect:catalogue"
+
+# преподаватели модуля собираются в одну строку, чтобы модуль с несколькими преподавателями был одной записью
+modules_query = """
+    SELECT m.id, m.name, m.location, m.seats_real, m.seats_max,
+           GROUP_CONCAT(t.name ORDER BY t.id SEPARATOR ', ') AS teacher_name
+    FROM crodconnect.modules m
+    LEFT JOIN crodconnect.teachers t ON t.module_id = m.id
+    {where}
+    GROUP BY m.id
+    ORDER BY m.id
+"""
+
+
+class ModuleCatalogue:
+    """
+    Снимок образовательных модулей с преподавателями, местом проведения и занятыми местами.
+    Загружается одним запросом при открытии записи, дальше клавиатуры строятся из памяти.
+    После записи через бота и изменений в панели id модуля публикуется в CATALOGUE_CHANNEL,
+    все экземпляры бота перечитывают этот модуль; раз в ttl секунд снимок перечитывается целиком
+    """
+
+    def __init__(self, db, redis=None, ttl: int = 300):
+        self.db = db
+        self.redis = redis
+        self.ttl = ttl
+        self.modules = {}
+        self.loaded_at = 0
+        self.lock = asyncio.Lock()
+
+    async def warm(self):
+        rows = await self.db.fetch_all(modules_query.format(where=""))
+        self.modules = {row['id']: row for row in rows}
+        self.loaded_at = time.monotonic()
+        info(f'Catalogue: {len(self.modules)} modules loaded')
+
+    async def refresh(self, module_id: int):
+        # перечитывается один модуль, если снимок уже загружен
+        if not self.loaded_at:
+            return
+        module = await self.db.fetch_one(modules_query.format(where="WHERE m.id = %s"), (module_id,))
+        if module is None:
+            self.modules.pop(module_id, None)
+        else:
+            self.modules[module_id] = module
+
+    async def ensure(self):
+        if time.monotonic() - self.loaded_at < self.ttl:
+            return
+        async with self.lock:
+            # пока ждали блокировку, снимок мог загрузить другой обработчик
+            if time.monotonic() - self.loaded_at >= self.ttl:
+                await self.warm()
+
+    def invalidate(self):
+        self.loaded_at = 0
+
+    async def get(self, module_id: int):
+        await self.ensure()
+        return self.modules.get(module_id)
+
+    async def available(self, exclude: set) -> list:
+        """
+        Модули со свободными местами
+        :param exclude: id модулей, на которые ребёнок уже записан
+        """
+
+        await self.ensure()
+        return [module for module in self.modules.values() if module['id'] not in exclude and module['seats_real'] < module['seats_max']]
+
+    async def seat_taken(self, module_id: int):
+        module = self.modules.get(module_id)
+        if module is not None:
+            module['seats_real'] += 1
+        await self.publish(module_id)
+
+    async def mark_full(self, module_id: int):
+        module = self.modules.get(module_id)
+        if module is not None:
+            module['seats_real'] = max(module['seats_real'], module['seats_max'])
+        await self.publish(module_id)
+
+    async def publish(self, module_id: int = None):
+        if self.redis is None:
+            return
+        try:
+            await self.redis.publish(CATALOGUE_CHANNEL, str(module_id) if module_id else '*')
+        except Exception as e:
+            # остальные экземпляры подхватят изменение не позже, чем через ttl
+            error(f'Catalogue: invalidation not published: {e}')
+
+    async def listen(self, host, port, password):
+        """
+        Фоновая задача: обновление снимка по сообщениям из CATALOGUE_CHANNEL, при обрыве соединения переподключается
+        """
+
+        while True:
+            try:
+                connection = aioredis.StrictRedis(host=host, port=port, password=password, decode_responses=True)
+                try:
+                    async with connection.pubsub() as pubsub:
+                        await pubsub.subscribe(CATALOGUE_CHANNEL)
+                        info(f'Catalogue: listening for invalidations on {CATALOGUE_CHANNEL}')
+                        # пока не было подписки, изменения могли быть пропущены
+                        self.invalidate()
+                        async for message in pubsub.listen():
+                            if message['type'] != 'message':
+                                continue
+                            if message['data'] == '*':
+                                self.invalidate()
+                            elif message['data'].isdigit():
+                                try:
+                                    await self.refresh(int(message['data']))
+                                except Exception as e:
+                                    error(f'Catalogue: module {message["data"]} not refreshed: {e}')
+                                    self.invalidate()
+                finally:
+                    await connection.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error(f'Catalogue: invalidation listener failed: {e}')
+                self.invalidate()
+                await asyncio.sleep(5)
@@ -0,0 +1,116 @@
+import asyncio
+import os
+from json import dump, load
+from logging import info, error
+from threading import Lock
+
+import redis.asyncio as aioredis
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: блокировка между процессами недоступна, остаётся блокировка внутри процесса
+    fcntl = None
+
+# канал Redis, в который панель публикует номер версии после изменения конфигурации
+CONFIG_CHANNEL = "connect:config"
+
+
+def merge_config(data: dict, changes: dict):
+    for key, value in changes.items():
+        if isinstance(value, dict) and isinstance(data.get(key), dict):
+            merge_config(data[key], value)
+        else:
+            data[key] = value
+
+
+class ConfigService:
+    """
+    Доступ к config.json.
+    Чтение кэшируется до изменения файла, запись - только через update(): под блокировкой,
+    атомарно через временный файл и с увеличением версии. После записи версия публикуется в Redis
+    """
+
+    def __init__(self, path: str, redis=None):
+        self.path = path
+        self.redis = redis
+        self.lock = Lock()
+        self.data = None
+        self.stamp = None
+
+    def _stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self) -> dict:
+        with self.lock:
+            stamp = self._stamp()
+            if self.data is None or stamp != self.stamp:
+                with open(file=self.path, mode="r", encoding="utf-8") as config_file:
+                    self.data = load(config_file)
+                self.stamp = stamp
+            return self.data
+
+    @property
+    def version(self) -> int:
+        return self.load().get('version', 0)
+
+    def update(self, changes: dict) -> dict:
+        """
+        Изменение конфигурации
+        :param changes: изменённые ключи, вложенные словари объединяются, например {'shift': {'current_shift': 1}}
+        :return: новая конфигурация
+        """
+
+        with self.lock, open(f"{self.path}.lock", "w") as lock_file:
+            # один писатель на файл, в том числе между процессами панели
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+            with open(file=self.path, mode="r", encoding="utf-8") as config_file:
+                data = load(config_file)
+            merge_config(data, changes)
+            data['version'] = data.get('version', 0) + 1
+
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(file=tmp_path, mode="w", encoding="utf-8") as config_file:
+                dump(data, config_file, indent=2, ensure_ascii=False)
+                config_file.flush()
+                os.fsync(config_file.fileno())
+            os.replace(tmp_path, self.path)
+
+            self.data = data
+            self.stamp = self._stamp()
+
+        info(f"Config: version {data['version']} saved")
+        if self.redis is not None:
+            self.redis.publish(CONFIG_CHANNEL, str(data['version']))
+        return data
+
+    async def listen(self, host, port, password, on_change):
+        """
+        Фоновая задача: перечитывает конфигурацию по сообщениям из CONFIG_CHANNEL и вызывает on_change(config)
+        """
+
+        while True:
+            try:
+                connection = aioredis.StrictRedis(host=host, port=port, password=password, decode_responses=True)
+                try:
+                    async with connection.pubsub() as pubsub:
+                        await pubsub.subscribe(CONFIG_CHANNEL)
+                        info(f'Config: listening for changes on {CONFIG_CHANNEL}')
+                        # пока не было подписки, изменения могли быть пропущены
+                        await on_change(self.load())
+                        async for message in pubsub.listen():
+                            if message['type'] != 'message':
+                                continue
+                            config = self.load()
+                            info(f"Config: version {config.get('version', 0)} loaded")
+                            await on_change(config)
+                finally:
+                    await connection.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error(f'Config: change listener failed: {e}')
+                await asyncio.sleep(5)
@@ -0,0 +1,95 @@
+import asyncio
+import time
+from collections import OrderedDict
+from logging import info, error
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from database import build_select
+
+# канал Redis, в который панель публикует telegram_id изменённого пользователя или '*' (сбросить всех)
+IDENTITY_CHANNEL = "connect:identity"
+
+roles = ('children', 'teachers', 'mentors', 'admins')
+
+
+class Identity:
+    def __init__(self, telegram_id: int, role: Optional[str] = None, profile: Optional[dict] = None):
+        self.telegram_id = telegram_id
+        self.role = role
+        self.profile = profile
+        self.status = profile['status'] if profile else 'alien'
+
+
+class IdentityResolver:
+    """
+    Роль, статус и профиль пользователя бота одним запросом к базе.
+    Результат кэшируется в памяти процесса на ttl секунд, сбрасывается через Redis pub/sub при изменениях в панели
+    """
+
+    def __init__(self, db, ttl: int = 30, max_size: int = 2048):
+        self.db = db
+        self.ttl = ttl
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        # по одному SELECT на таблицу за один round trip, каждый идёт по индексу telegram_id
+        self.query = "".join(f"{build_select(role, ('telegram_id',))} LIMIT 1;" for role in roles)
+
+    async def resolve(self, telegram_id: int) -> Identity:
+        entry = self.cache.get(telegram_id)
+        if entry is not None:
+            identity, expires_at = entry
+            if expires_at > time.monotonic():
+                self.cache.move_to_end(telegram_id)
+                return identity
+            del self.cache[telegram_id]
+
+        identity = Identity(telegram_id)
+        result_sets = await self.db.fetch_sets(self.query, (telegram_id,) * len(roles))
+        for role, rows in zip(roles, result_sets):
+            if rows:
+                identity = Identity(telegram_id, role, rows[0])
+                break
+
+        self.cache[telegram_id] = (identity, time.monotonic() + self.ttl)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+
+        return identity
+
+    def invalidate(self, telegram_id: int = None):
+        if telegram_id is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(telegram_id, None)
+
+    async def listen(self, host, port, password):
+        """
+        Фоновая задача: сброс кэша по сообщениям из IDENTITY_CHANNEL, при обрыве соединения переподключается
+        """
+
+        while True:
+            try:
+                connection = aioredis.StrictRedis(host=host, port=port, password=password, decode_responses=True)
+                try:
+                    async with connection.pubsub() as pubsub:
+                        await pubsub.subscribe(IDENTITY_CHANNEL)
+                        info(f'Identity: listening for invalidations on {IDENTITY_CHANNEL}')
+                        # пока не было подписки, изменения могли быть пропущены
+                        self.invalidate()
+                        async for message in pubsub.listen():
+                            if message['type'] != 'message':
+                                continue
+                            if message['data'] == '*':
+                                self.invalidate()
+                            elif message['data'].lstrip('-').isdigit():
+                                self.invalidate(int(message['data']))
+                finally:
+                    await connection.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error(f'Identity: invalidation listener failed: {e}')
+                self.invalidate()
+                await asyncio.sleep(5)
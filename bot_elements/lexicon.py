@@ -42,6 +42,8 @@ lexicon = {
         'no_module_record': "Запись на образователи модули пока закрыта, как только она начнётся, мы пришлём тебе сообщение.",
         'no_fback_child': "Сейчас мы не собираем обратную связь, но как только начнём, обязатаельно пришлём тебе сообщение.",
         'radio_request_already': "У тебя уже есть активная заявка на радио. Подожди, пока мы её обработаем, чтобы отправить новую.",
-        'no_radio': "Сейчас наше радио не работает, как только мы будем в эфире, тебе придёт уведомление."
+        'no_radio': "Сейчас наше радио не работает, как только мы будем в эфире, тебе придёт уведомление.",
+        'module_full': "На этот модуль места закончились, выбери другой.",
+        'feedback_expired': "Эта форма обратной связи устарела, отправляем актуальную."
     }
 }
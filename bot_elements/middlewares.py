@@ -0,0 +1,40 @@
+from logging import info, error
+from typing import Any, Awaitable, Callable, Dict
+
+import redis.asyncio as aioredis
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery
+
+
+class CallbackIdempotencyMiddleware(BaseMiddleware):
+    """
+    Повторные нажатия на inline-кнопки не обрабатываются.
+    Нажатие считается повтором, если callback query с таким id уже был,
+    или тот же пользователь нажал кнопку с теми же данными меньше чем window секунд назад
+    """
+
+    def __init__(self, redis: aioredis.Redis, window: int = 3, prefix: str = "connect:callback"):
+        self.redis = redis
+        self.window = window
+        self.prefix = prefix
+
+    async def _is_duplicate(self, callback: CallbackQuery) -> bool:
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                # Telegram может повторно доставить тот же update, id запроса живёт дольше окна нажатий
+                pipe.set(f"{self.prefix}:id:{callback.id}", 1, nx=True, ex=60)
+                pipe.set(f"{self.prefix}:user:{callback.from_user.id}:{callback.data}", 1, nx=True, ex=self.window)
+                first_query, first_tap = await pipe.execute()
+            return not (first_query and first_tap)
+        except Exception as e:
+            # без Redis кнопки обрабатываются как раньше
+            error(f'Callbacks: idempotency check failed: {e}')
+            return False
+
+    async def __call__(self, handler: Callable[[CallbackQuery, Dict[str, Any]], Awaitable[Any]], event: CallbackQuery, data: Dict[str, Any]) -> Any:
+        if await self._is_duplicate(event):
+            info(f'Callbacks: duplicate {event.data} from {event.from_user.id} skipped')
+            await event.answer()
+            return None
+
+        return await handler(event, data)
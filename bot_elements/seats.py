@@ -0,0 +1,37 @@
+from logging import info
+
+# результаты записи на модуль
+RESERVED = 'reserved'
+FULL = 'full'
+ALREADY_RECORDED = 'already_recorded'
+LIMIT_REACHED = 'limit_reached'
+
+
+async def reserve_seat(db, child_id: int, module_id: int, modules_limit: int) -> str:
+    """
+    Запись ребёнка на модуль с проверкой свободных мест в одной транзакции
+    :param db: AsyncMySQLPool
+    :param modules_limit: на сколько модулей всего может записаться ребёнок
+    :return: RESERVED, FULL, ALREADY_RECORDED или LIMIT_REACHED
+    """
+
+    async with db.transaction() as tx:
+        # блокировка строки ребёнка: параллельные нажатия одного ребёнка выполняются по очереди
+        await tx.fetch_one("SELECT id FROM crodconnect.children WHERE id = %s FOR UPDATE", (child_id,))
+
+        records = await tx.fetch_all("SELECT module_id FROM crodconnect.modules_records WHERE child_id = %s", (child_id,))
+        if any(record['module_id'] == module_id for record in records):
+            return ALREADY_RECORDED
+        if len(records) >= modules_limit:
+            return LIMIT_REACHED
+
+        # место занимается только если оно есть, строка модуля блокируется до конца транзакции
+        query = "UPDATE crodconnect.modules SET seats_real = seats_real + 1 WHERE id = %s AND seats_real < seats_max"
+        if not await tx.execute(query, (module_id,)):
+            info(f'Seats: module {module_id} is full, child {child_id} not recorded')
+            return FULL
+
+        query = "INSERT INTO crodconnect.modules_records (child_id, module_id) VALUES (%s, %s)"
+        await tx.execute(query, (child_id, module_id))
+
+    return RESERVED
@@ -0,0 +1,156 @@
+import json
+import time
+from abc import ABC, abstractmethod
+from logging import info, error
+
+from database import RedisTable
+
+# значения по умолчанию для флагов, которых ещё нет в хранилище
+default_statuses = {
+    'can_respond': False,
+    'feedback': True,
+    'modules_record': False,
+    'radio': False
+}
+
+radio_requests_ttl = 24 * 60 * 60
+draft_ttl = 2 * 60 * 60
+
+
+class StateStore(ABC):
+    """
+    Состояние бота: флаги статусов, множество заявок на радио и черновики обратной связи.
+    Хранится вне процесса, поэтому переживает перезапуск и общее для нескольких экземпляров бота
+    """
+
+    @abstractmethod
+    def get_status(self, name: str) -> bool:
+        pass
+
+    @abstractmethod
+    def set_status(self, name: str, value: bool):
+        pass
+
+    @abstractmethod
+    def add_radio_request(self, telegram_id: int):
+        pass
+
+    @abstractmethod
+    def remove_radio_request(self, telegram_id: int):
+        pass
+
+    @abstractmethod
+    def has_radio_request(self, telegram_id: int) -> bool:
+        pass
+
+    @abstractmethod
+    def clear_radio_requests(self):
+        pass
+
+    @abstractmethod
+    def get_draft(self, child_id: int) -> dict:
+        pass
+
+    @abstractmethod
+    def set_draft(self, child_id: int, draft: dict):
+        pass
+
+    @abstractmethod
+    def delete_draft(self, child_id: int):
+        pass
+
+    def update_draft(self, child_id: int, **fields) -> dict:
+        draft = self.get_draft(child_id)
+        draft.update(fields)
+        self.set_draft(child_id, draft)
+        return draft
+
+
+class RedisStateStore(StateStore):
+    def __init__(self, redis: RedisTable, prefix: str = "connect:state"):
+        self.connection = redis.connection
+        self.statuses_key = f"{prefix}:statuses"
+        self.radio_key = f"{prefix}:radio_requests"
+        self.draft_key = f"{prefix}:feedback_draft:{{}}"
+
+    def get_status(self, name: str) -> bool:
+        value = self.connection.hget(self.statuses_key, name)
+        if value is None:
+            return default_statuses[name]
+        return value == '1'
+
+    def set_status(self, name: str, value: bool):
+        info(f'State: {name} = {value}')
+        self.connection.hset(self.statuses_key, name, int(value))
+
+    def add_radio_request(self, telegram_id: int):
+        with self.connection.pipeline() as pipe:
+            pipe.sadd(self.radio_key, telegram_id)
+            pipe.expire(self.radio_key, radio_requests_ttl)
+            pipe.execute()
+
+    def remove_radio_request(self, telegram_id: int):
+        self.connection.srem(self.radio_key, telegram_id)
+
+    def has_radio_request(self, telegram_id: int) -> bool:
+        return bool(self.connection.sismember(self.radio_key, telegram_id))
+
+    def clear_radio_requests(self):
+        self.connection.delete(self.radio_key)
+
+    def get_draft(self, child_id: int) -> dict:
+        value = self.connection.get(self.draft_key.format(child_id))
+        return json.loads(value) if value else {}
+
+    def set_draft(self, child_id: int, draft: dict):
+        self.connection.set(self.draft_key.format(child_id), json.dumps(draft, ensure_ascii=False), ex=draft_ttl)
+
+    def delete_draft(self, child_id: int):
+        self.connection.delete(self.draft_key.format(child_id))
+
+
+class MemoryStateStore(StateStore):
+    # состояние в памяти процесса: для локального запуска без Redis и для тестов
+    def __init__(self):
+        self.statuses = dict(default_statuses)
+        self.radio_requests = set()
+        self.drafts = {}
+
+    def get_status(self, name: str) -> bool:
+        return self.statuses[name]
+
+    def set_status(self, name: str, value: bool):
+        info(f'State: {name} = {value}')
+        self.statuses[name] = value
+
+    def add_radio_request(self, telegram_id: int):
+        self.radio_requests.add(telegram_id)
+
+    def remove_radio_request(self, telegram_id: int):
+        self.radio_requests.discard(telegram_id)
+
+    def has_radio_request(self, telegram_id: int) -> bool:
+        return telegram_id in self.radio_requests
+
+    def clear_radio_requests(self):
+        self.radio_requests.clear()
+
+    def get_draft(self, child_id: int) -> dict:
+        draft, expires_at = self.drafts.get(child_id, ({}, 0))
+        if expires_at < time.monotonic():
+            self.drafts.pop(child_id, None)
+            return {}
+        return dict(draft)
+
+    def set_draft(self, child_id: int, draft: dict):
+        self.drafts[child_id] = (dict(draft), time.monotonic() + draft_ttl)
+
+    def delete_draft(self, child_id: int):
+        self.drafts.pop(child_id, None)
+
+
+def get_state_store(redis: RedisTable) -> StateStore:
+    if redis.result is not None and redis.result['status'] == "ok":
+        return RedisStateStore(redis)
+    error('State: Redis is not available, state is kept in memory')
+    return MemoryStateStore()
@@ -0,0 +1,123 @@
+import datetime
+from logging import info, error
+
+import redis.asyncio as aioredis
+from redis.exceptions import WatchError
+
+# размеры групп, панель удаляет ключ при изменении состава групп
+GROUPS_KEY = "stats:groups"
+# количество отзывов за день: поля group:<номер> и module:<id>
+FEEDBACK_KEY = "stats:feedback:{date}"
+
+feedback_ttl = 3 * 24 * 60 * 60
+groups_ttl = 10 * 60
+# сколько раз пересчёт повторяется, если счётчики менялись во время подсчёта
+reconcile_attempts = 3
+
+
+class StatsStore:
+    """
+    Счётчики для статистики в боте, хранятся в Redis и обновляются при вставке отзывов.
+    Чтение - одна команда Redis. Если ключа нет или Redis недоступен, значения пересчитываются из базы
+    """
+
+    def __init__(self, db, host, port, password):
+        self.db = db
+        self.redis = aioredis.StrictRedis(host=host, port=port, password=password, decode_responses=True)
+
+    async def feedback_added(self, group_num: int, module_id: int, date: datetime.date = None):
+        key = FEEDBACK_KEY.format(date=date or datetime.date.today())
+        try:
+            # счётчик увеличивается, только если за день уже есть пересчитанные данные, иначе их соберёт reconcile
+            if await self.redis.exists(key):
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    pipe.hincrby(key, f"group:{group_num}", 1)
+                    pipe.hincrby(key, f"module:{module_id}", 1)
+                    await pipe.execute()
+        except Exception as e:
+            error(f'Stats: counter not updated: {e}')
+
+    async def feedback_count(self, group_num: int = None, module_id: int = None, date: datetime.date = None) -> int:
+        date = date or datetime.date.today()
+        field = f"group:{group_num}" if group_num is not None else f"module:{module_id}"
+        key = FEEDBACK_KEY.format(date=date)
+        try:
+            if not await self.redis.exists(key):
+                await self.reconcile_feedback(date)
+            return int(await self.redis.hget(key, field) or 0)
+        except Exception as e:
+            error(f'Stats: reading from database: {e}')
+            if group_num is not None:
+                query = "SELECT COUNT(*) AS count FROM crodconnect.feedback f JOIN crodconnect.children c ON c.id = f.child_id WHERE c.group_num = %s AND f.date = %s"
+                return await self.db.fetch_scalar(query, (group_num, date), default=0)
+            query = "SELECT COUNT(*) AS count FROM crodconnect.feedback WHERE module_id = %s AND date = %s"
+            return await self.db.fetch_scalar(query, (module_id, date), default=0)
+
+    async def group_size(self, group_num: int) -> int:
+        try:
+            if not await self.redis.exists(GROUPS_KEY):
+                await self.reconcile_groups()
+            return int(await self.redis.hget(GROUPS_KEY, f"group:{group_num}") or 0)
+        except Exception as e:
+            error(f'Stats: reading from database: {e}')
+            query = "SELECT COUNT(*) AS count FROM crodconnect.children WHERE group_num = %s"
+            return await self.db.fetch_scalar(query, (group_num,), default=0)
+
+    async def reconcile_feedback(self, date: datetime.date = None):
+        # пересчёт дневных счётчиков из таблицы feedback
+        date = date or datetime.date.today()
+        query = """
+            SELECT CONCAT('group:', c.group_num) AS field, COUNT(*) AS count FROM crodconnect.feedback f
+            JOIN crodconnect.children c ON c.id = f.child_id WHERE f.date = %s GROUP BY c.group_num;
+            SELECT CONCAT('module:', module_id) AS field, COUNT(*) AS count FROM crodconnect.feedback WHERE date = %s GROUP BY module_id;
+        """
+
+        async def count():
+            result_sets = await self.db.fetch_sets(query, (date, date))
+            return {row['field']: row['count'] for rows in result_sets for row in rows}
+
+        await self._replace(FEEDBACK_KEY.format(date=date), count, feedback_ttl)
+
+    async def reconcile_groups(self):
+        query = "SELECT CONCAT('group:', group_num) AS field, COUNT(*) AS count FROM crodconnect.children GROUP BY group_num"
+
+        async def count():
+            return {row['field']: row['count'] for row in await self.db.fetch_all(query)}
+
+        await self._replace(GROUPS_KEY, count, groups_ttl)
+
+    async def reconcile(self):
+        info('Stats: reconciling counters')
+        try:
+            await self.reconcile_feedback()
+            await self.reconcile_groups()
+        except Exception as e:
+            error(f'Stats: reconciliation failed: {e}')
+
+    async def _replace(self, key: str, count, ttl: int):
+        """
+        Замена счётчиков результатом пересчёта
+        :param count: корутина, возвращающая {поле: значение} из базы
+        Ключ отслеживается (WATCH) с начала пересчёта: если счётчик увеличился, пока шёл подсчёт,
+        запись отменяется и пересчёт повторяется, чтобы не затереть это увеличение
+        """
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for attempt in range(1, reconcile_attempts + 1):
+                try:
+                    await pipe.watch(key)
+                    # пустой день тоже сохраняется (служебное поле), чтобы не пересчитывать его на каждом чтении
+                    counters = {'_': 0, **await count()}
+                    pipe.multi()
+                    pipe.delete(key)
+                    pipe.hset(key, mapping=counters)
+                    pipe.expire(key, ttl)
+                    await pipe.execute()
+                    return
+                except WatchError:
+                    info(f'Stats: {key} changed during reconciliation, attempt {attempt}')
+                    await pipe.reset()
+        error(f'Stats: {key} not reconciled, counters kept')
+
+    async def close(self):
+        await self.redis.aclose()
@@ -1,8 +1,16 @@
-from mysql.connector import connect
+import asyncio
+from contextlib import contextmanager, asynccontextmanager
+from functools import lru_cache
+from threading import Lock, BoundedSemaphore
+from typing import Optional
+
+from mysql.connector.pooling import MySQLConnectionPool
 from platform import system
 from dotenv import load_dotenv
 from logging import basicConfig, info, error
+import aiomysql
 import redis
+from pymysql.constants import CLIENT
 
 if system() == "Windows":
     env_path = r"D:\CROD_MEDIA\.env"
@@ -11,64 +19,522 @@ else:
 load_dotenv(dotenv_path=env_path)
 
 
-class MySQL:
-    def __init__(self, host, port, user, password, db_name):
+class DatabaseError(Exception):
+    """Базовая ошибка при работе с базой данных"""
+
+
+class DatabaseConnectionError(DatabaseError):
+    """Не удалось подключиться к базе данных"""
+
+
+class QueryError(DatabaseError):
+    """Ошибка выполнения запроса"""
+
+    def __init__(self, query: str, params, reason: Exception):
+        super().__init__(str(reason))
+        self.query = query
+        self.params = params
+        self.reason = reason
+
+
+class UnknownIdentifierError(DatabaseError):
+    """Имя таблицы или столбца не входит в разрешённый список"""
+
+
+# единственные таблицы и столбцы, которые можно подставлять в запрос по имени
+role_tables = {
+    'children': 'crodconnect.children',
+    'teachers': 'crodconnect.teachers',
+    'mentors': 'crodconnect.mentors',
+    'admins': 'crodconnect.admins',
+}
+role_columns = frozenset({'id', 'name', 'telegram_id', 'pass_phrase', 'password', 'status', 'group_num', 'module_id'})
+
+
+def role_table(role: str) -> str:
+    table = role_tables.get(role)
+    if table is None:
+        raise UnknownIdentifierError(f"Unknown role table: {role!r}")
+    return table
+
+
+def role_column(column: str) -> str:
+    if column != '*' and column not in role_columns:
+        raise UnknownIdentifierError(f"Unknown column: {column!r}")
+    return column
+
+
+def where_clause(where: tuple) -> str:
+    return " AND ".join(f"{role_column(column)} = %s" for column in where)
+
+
+# текст запроса строится один раз и переиспользуется: одинаковая строка - один подготовленный запрос на соединение
+@lru_cache(maxsize=256)
+def build_select(role: str, where: tuple, columns: tuple = ('*',)) -> str:
+    return f"SELECT {', '.join(role_column(column) for column in columns)} FROM {role_table(role)} WHERE {where_clause(where)}"
+
+
+@lru_cache(maxsize=256)
+def build_count(role: str, where: tuple) -> str:
+    return f"SELECT COUNT(*) AS count FROM {role_table(role)} WHERE {where_clause(where)}"
+
+
+@lru_cache(maxsize=256)
+def build_update(role: str, values: tuple, where: tuple) -> str:
+    return f"UPDATE {role_table(role)} SET {', '.join(f'{role_column(column)} = %s' for column in values)} WHERE {where_clause(where)}"
+
+
+def is_multi_statement(query: str) -> bool:
+    return query.strip().rstrip(';').count(';') > 0
+
+
+class MySQLCursorQueries:
+    """
+    Типизированные запросы поверх self._cursor(), наследники определяют _cursor.
+    Ошибки драйвера превращаются в QueryError, результат возвращается вызывающему.
+    """
+
+    def fetch_all(self, query: str, params: tuple = ()) -> list:
+        with self._cursor(query, params) as cur:
+            if is_multi_statement(query):
+                rows = []
+                for statement in cur.execute(query, params, multi=True):
+                    if statement.with_rows and not rows:
+                        rows = statement.fetchall()
+                return rows
+            cur.execute(query, params)
+            return cur.fetchall() if cur.with_rows else []
+
+    def fetch_one(self, query: str, params: tuple = ()) -> Optional[dict]:
+        rows = self.fetch_all(query, params)
+        return rows[0] if rows else None
+
+    def fetch_scalar(self, query: str, params: tuple = (), default=None):
+        row = self.fetch_one(query, params)
+        if not row:
+            return default
+        return next(iter(row.values()))
+
+    def execute(self, query: str, params: tuple = ()) -> int:
+        """
+        Запрос без выборки (INSERT, UPDATE, DELETE, ...)
+        :return: количество затронутых строк
+        """
+        with self._cursor(query, params) as cur:
+            if is_multi_statement(query):
+                rowcount = 0
+                for statement in cur.execute(query, params, multi=True):
+                    if statement.with_rows:
+                        statement.fetchall()
+                    rowcount += max(statement.rowcount, 0)
+                return rowcount
+            cur.execute(query, params)
+            return cur.rowcount
+
+    def execute_many(self, query: str, params_list: list) -> int:
+        if not params_list:
+            return 0
+        with self._cursor(query, f"{len(params_list)} rows") as cur:
+            cur.executemany(query, params_list)
+            return cur.rowcount
+
+    def stream(self, query: str, params: tuple = (), batch_size: int = 500):
+        """
+        Построчная выборка без загрузки всего результата в память.
+        Соединение занято, пока генератор не дочитан или не закрыт.
+        """
+        with self._cursor(query, params, buffered=False) as cur:
+            cur.execute(query, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+
+@contextmanager
+def connection_cursor(connection, query: str, params, **cursor_kwargs):
+    info(f'MySQL: Executing: {query} with params {params}')
+    cur = connection.cursor(dictionary=True, **cursor_kwargs)
+    try:
+        yield cur
+        info(f'MySQL: Executed successfully!')
+    except DatabaseError:
+        raise
+    except Exception as e:
+        error(f'MySQL: Not executed: {e}')
+        raise QueryError(query, params, e) from e
+    finally:
+        cur.close()
+
+
+class MySQLTransaction(MySQLCursorQueries):
+    """
+    Запросы на соединении, выданном MySQL.transaction()
+    DDL (TRUNCATE, ALTER, ...) неявно фиксирует транзакцию, внутри неё его использовать нельзя
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    @contextmanager
+    def _cursor(self, query: str, params, **cursor_kwargs):
+        with connection_cursor(self.connection, query, params, **cursor_kwargs) as cur:
+            yield cur
+
+
+class MySQL(MySQLCursorQueries):
+    def __init__(self, host, port, user, password, db_name, pool_size: int = 10, statements_per_connection: int = 64):
         info(f'MySQL: Initialization ({host}, {port}, {user}, {password}, {db_name})')
         self.host = host
         self.port = port
         self.user = user
         self.password = password
         self.db_name = db_name
-        self.connection = None
-        self.cur = None
-        self.data = None
-        self.result = None
+        self.pool_size = pool_size
+        self.pool = None
+        self._pool_lock = Lock()
+        self._slots = BoundedSemaphore(pool_size)
+        # подготовленные запросы хранятся на соединениях пула, не больше statements_per_connection на соединение
+        self.statements_per_connection = statements_per_connection
+        self._statements_lock = Lock()
         info(f'MySQL: Initialization completed!')
 
     def connect(self):
-        info(f'MySQL: Connecting to database')
+        # пул общий для всех сессий и потоков процесса, повторный вызов ничего не делает
+        with self._pool_lock:
+            if self.pool is not None:
+                return
+            info(f'MySQL: Creating connection pool')
+            try:
+                self.pool = MySQLConnectionPool(
+                    pool_name=f"{self.db_name}_pool",
+                    pool_size=self.pool_size,
+                    # сброс сессии удалил бы подготовленные запросы; состояние сессии не меняется (autocommit, транзакции закрываются)
+                    pool_reset_session=False,
+                    host=self.host,
+                    user=self.user,
+                    password=self.password,
+                    database=self.db_name,
+                    port=self.port,
+                    autocommit=True,
+                    consume_results=True
+                )
+                info(f'MySQL: Connection pool created!')
+            except Exception as e:
+                error(f'MySQL: Not connected to database: {e}')
+                raise DatabaseConnectionError(f"Error connecting to {self.db_name}@{self.host}: {e}") from e
+
+    @contextmanager
+    def connection(self):
+        """
+        Выдаёт соединение из пула на время блока with и возвращает его обратно.
+        Если все соединения заняты, поток ждёт освобождения.
+        """
+        if self.pool is None:
+            self.connect()
+        with self._slots:
+            try:
+                connection = self.pool.get_connection()
+            except Exception as e:
+                raise DatabaseConnectionError(f"Error connecting to {self.db_name}@{self.host}: {e}") from e
+            try:
+                yield connection
+            finally:
+                try:
+                    connection.close()
+                except Exception:
+                    # соединение не вернулось в пул, его подготовленные запросы больше не понадобятся
+                    self._drop_statements(connection)
+                    raise
+
+    @contextmanager
+    def _cursor(self, query: str, params, **cursor_kwargs):
+        with self.connection() as connection:
+            with connection_cursor(connection, query, params, **cursor_kwargs) as cur:
+                yield cur
+
+    @staticmethod
+    def _raw_connection(connection):
+        # get_connection() каждый раз выдаёт новую обёртку PooledMySQLConnection над тем же соединением
+        return getattr(connection, '_cnx', connection)
+
+    def _get_statements(self, connection) -> dict:
+        """
+        Подготовленные запросы соединения: {текст запроса: курсор}
+        После переподключения соединения пулом запросы старой сессии закрываются и готовятся заново
+        """
+        cnx = self._raw_connection(connection)
+        with self._statements_lock:
+            cache = getattr(cnx, 'prepared_statements', None)
+            if cache is not None and cache[0] == cnx.connection_id:
+                return cache[1]
+        self._drop_statements(connection)
+        statements = {}
+        with self._statements_lock:
+            cnx.prepared_statements = (cnx.connection_id, statements)
+        return statements
+
+    def _drop_statements(self, connection):
+        cnx = self._raw_connection(connection)
+        with self._statements_lock:
+            cache = getattr(cnx, 'prepared_statements', None)
+            cnx.prepared_statements = None
+        if cache is not None:
+            for cur in cache[1].values():
+                try:
+                    cur.close()
+                except Exception:
+                    pass
+
+    @contextmanager
+    def _prepared_cursor(self, query: str, params):
+        """
+        Курсор с серверным подготовленным запросом, закреплённый за соединением.
+        Запрос разбирается сервером один раз на соединение, дальше передаются только параметры
+        """
+        info(f'MySQL: Executing prepared: {query} with params {params}')
+        with self.connection() as connection:
+            statements = self._get_statements(connection)
+            with self._statements_lock:
+                cur = statements.get(query)
+                evicted = None
+                if cur is None:
+                    if len(statements) >= self.statements_per_connection:
+                        evicted = statements.pop(next(iter(statements)))
+                    cur = connection.cursor(prepared=True, dictionary=True)
+                    statements[query] = cur
+            if evicted is not None:
+                evicted.close()
+            try:
+                yield cur
+                info(f'MySQL: Executed successfully!')
+            except Exception as e:
+                # после ошибки курсор или всё соединение может быть в неопределённом состоянии, запросы подготовятся заново
+                self._drop_statements(connection)
+                try:
+                    cur.close()
+                except Exception:
+                    pass
+                if isinstance(e, DatabaseError):
+                    raise
+                error(f'MySQL: Not executed: {e}')
+                raise QueryError(query, params, e) from e
+
+    def fetch_prepared(self, query: str, params: tuple = ()) -> list:
+        with self._prepared_cursor(query, params) as cur:
+            cur.execute(query, params)
+            return cur.fetchall() if cur.with_rows else []
+
+    def fetch_one_prepared(self, query: str, params: tuple = ()) -> Optional[dict]:
+        rows = self.fetch_prepared(query, params)
+        return rows[0] if rows else None
+
+    def execute_prepared(self, query: str, params: tuple = ()) -> int:
+        with self._prepared_cursor(query, params) as cur:
+            cur.execute(query, params)
+            return cur.rowcount
+
+    @contextmanager
+    def transaction(self):
+        """
+        Все запросы внутри блока with выполняются на одном соединении одной транзакцией.
+        При любом исключении изменения откатываются.
+        """
+        with self.connection() as connection:
+            try:
+                connection.start_transaction()
+            except Exception as e:
+                raise DatabaseConnectionError(f"Error starting transaction on {self.db_name}@{self.host}: {e}") from e
+            info(f'MySQL: Transaction started')
+            try:
+                yield MySQLTransaction(connection)
+                connection.commit()
+                info(f'MySQL: Transaction committed')
+            except BaseException:
+                connection.rollback()
+                error(f'MySQL: Transaction rolled back')
+                raise
+
+
+class AsyncMySQLCursorQueries:
+    # общие запросы для пула и транзакции, наследники определяют _cursor
+
+    async def fetch_all(self, query: str, params: tuple = ()) -> list:
+        async with self._cursor(query, params) as cur:
+            await cur.execute(query, params or None)
+            rows = list(await cur.fetchall())
+            while await cur.nextset():
+                pass
+            return rows
+
+    async def fetch_sets(self, query: str, params: tuple = ()) -> list:
+        """
+        Несколько SELECT через ';' за один запрос к серверу
+        :return: список результатов, по одному на каждый SELECT
+        """
+        async with self._cursor(query, params) as cur:
+            await cur.execute(query, params or None)
+            result_sets = [list(await cur.fetchall())]
+            while await cur.nextset():
+                result_sets.append(list(await cur.fetchall()))
+            return result_sets
+
+    async def fetch_one(self, query: str, params: tuple = ()) -> Optional[dict]:
+        rows = await self.fetch_all(query, params)
+        return rows[0] if rows else None
+
+    async def fetch_scalar(self, query: str, params: tuple = (), default=None):
+        row = await self.fetch_one(query, params)
+        if not row:
+            return default
+        return next(iter(row.values()))
+
+    async def execute(self, query: str, params: tuple = ()) -> int:
+        """
+        Запрос без выборки (INSERT, UPDATE, DELETE, ...)
+        :return: количество затронутых строк
+        """
+        async with self._cursor(query, params) as cur:
+            rowcount = await cur.execute(query, params or None)
+            while await cur.nextset():
+                rowcount += max(cur.rowcount, 0)
+            return rowcount
+
+    async def execute_many(self, query: str, params_list: list) -> int:
+        if not params_list:
+            return 0
+        async with self._cursor(query, f"{len(params_list)} rows") as cur:
+            return await cur.executemany(query, params_list)
+
+    async def stream(self, query: str, params: tuple = (), batch_size: int = 500):
+        """
+        Построчная выборка через серверный курсор без загрузки всего результата в память
+        """
+        async with self._cursor(query, params, aiomysql.SSDictCursor) as cur:
+            await cur.execute(query, params or None)
+            while True:
+                rows = await cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+
+
+@asynccontextmanager
+async def async_connection_cursor(connection, query: str, params, cursor_class=None):
+    info(f'AsyncMySQL: Executing: {query} with params {params}')
+    cur = await connection.cursor(cursor_class) if cursor_class else await connection.cursor()
+    try:
+        yield cur
+        info(f'AsyncMySQL: Executed successfully!')
+    except DatabaseError:
+        raise
+    except Exception as e:
+        error(f'AsyncMySQL: Not executed: {e}')
+        raise QueryError(query, params, e) from e
+    finally:
+        await cur.close()
+
+
+class AsyncMySQLTransaction(AsyncMySQLCursorQueries):
+    """
+    Запросы на соединении, выданном AsyncMySQLPool.transaction()
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    @asynccontextmanager
+    async def _cursor(self, query: str, params, cursor_class=None):
+        async with async_connection_cursor(self.connection, query, params, cursor_class) as cur:
+            yield cur
+
+
+class AsyncMySQLPool(AsyncMySQLCursorQueries):
+    def __init__(self, host, port, user, password, db_name, minsize: int = 2, maxsize: int = 10, pool_recycle: int = 1800, ping_interval: int = 60):
+        info(f'AsyncMySQL: Initialization ({host}, {port}, {user}, {db_name}, pool {minsize}-{maxsize})')
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.db_name = db_name
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self.pool_recycle = pool_recycle
+        self.ping_interval = ping_interval
+        self.pool = None
+
+    async def connect(self):
+        # пул создаётся один раз на процесс, минимум minsize соединений держится открытыми
+        if self.pool is not None:
+            return
+        info(f'AsyncMySQL: Creating connection pool')
         try:
-            self.connection = connect(
+            self.pool = await aiomysql.create_pool(
                 host=self.host,
+                port=int(self.port),
                 user=self.user,
                 password=self.password,
-                database=self.db_name,
-                port=self.port
+                db=self.db_name,
+                minsize=self.minsize,
+                maxsize=self.maxsize,
+                pool_recycle=self.pool_recycle,
+                autocommit=True,
+                client_flag=CLIENT.MULTI_STATEMENTS,
+                cursorclass=aiomysql.DictCursor
             )
-            self.cur = self.connection.cursor(dictionary=True)
-            self.connection.autocommit = True
-            self.result = {"status": "ok", "message": f"Successfully connected to {self.db_name}@{self.host}"}
-            info(f'MySQL: Connected to database successfully!')
+            info(f'AsyncMySQL: Connection pool created!')
         except Exception as e:
-            self.result = {"status": "error", "message": f"Error connecting to {self.db_name}@{self.host}: {e}"}
-            error(f'MySQL: Not connected to database: {e}')
-
-    def execute(self, query: str, params: tuple = ()):
-        info(f'MySQL: Executing: {query} with params {params}')
-        try:
-            self.cur.execute(
-                operation=query,
-                params=params
-            )
+            error(f'AsyncMySQL: Pool not created: {e}')
+            raise DatabaseConnectionError(f"Error connecting to {self.db_name}@{self.host}: {e}") from e
 
-            self.data = self.cur.fetchall()
+    @asynccontextmanager
+    async def connection(self):
+        if self.pool is None:
+            await self.connect()
+        async with self.pool.acquire() as connection:
+            # проверка соединения, которое долго простаивало в пуле, упавшее соединение переподключается
+            if asyncio.get_running_loop().time() - connection.last_usage > self.ping_interval:
+                try:
+                    await connection.ping(reconnect=True)
+                except Exception as e:
+                    raise DatabaseConnectionError(f"Error connecting to {self.db_name}@{self.host}: {e}") from e
+            yield connection
 
-            if len(self.data) == 1:
-                self.data = self.data[-1]
+    @asynccontextmanager
+    async def _cursor(self, query: str, params, cursor_class=None):
+        async with self.connection() as connection:
+            async with async_connection_cursor(connection, query, params, cursor_class) as cur:
+                yield cur
 
-            self.result = {"status": "ok", "message": f"Successfully executed {query} ({params})"}
-            info(f'MySQL: Executed successfully!')
-        except Exception as e:
-            self.result = {"status": "error", "message": f"Error executing query: {e}"}
-            error(f'MySQL: Not executed: {e}')
-
-    def reconnect(self):
-        info(f'MySQL: Reconnecting to database')
-        self.connection.reconnect()
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Все запросы внутри блока async with выполняются на одном соединении одной транзакцией.
+        При любом исключении изменения откатываются.
+        """
+        async with self.connection() as connection:
+            try:
+                await connection.begin()
+            except Exception as e:
+                raise DatabaseConnectionError(f"Error starting transaction on {self.db_name}@{self.host}: {e}") from e
+            info(f'AsyncMySQL: Transaction started')
+            try:
+                yield AsyncMySQLTransaction(connection)
+                await connection.commit()
+                info(f'AsyncMySQL: Transaction committed')
+            except BaseException:
+                await connection.rollback()
+                error(f'AsyncMySQL: Transaction rolled back')
+                raise
 
-    def disconnect(self):
-        self.connection.disconnect()
-        info(f'MySQL: Connection closed')
+    async def disconnect(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+            info(f'AsyncMySQL: Connection pool closed')
 
 
 class RedisTable:
@@ -115,3 +581,10 @@ class RedisTable:
     def delete(self, index):
         info(f'Redis: Deleting {index}')
         self.connection.delete(index)
+
+    def publish(self, channel, message):
+        info(f'Redis: Publishing {message} to {channel}')
+        try:
+            self.connection.publish(channel, message)
+        except Exception as e:
+            error(f'Redis: Not published to {channel}: {e}')
@@ -4,8 +4,8 @@ import platform
 from dotenv import load_dotenv
 from flask import Flask, request, jsonify
 
-from database import MySQL
-from flet_elements.telegram import send_telegam_message
+from database import MySQL, DatabaseError
+from flet_elements.telegram import queue_telegam_message
 
 
 app = Flask(__name__)
@@ -21,8 +21,14 @@ db = MySQL(
     port=os.getenv('DB_PORT'),
     user=os.getenv('DB_USER'),
     password=os.getenv('DB_PASSWORD'),
-    db_name=os.getenv('DB_NAME')
+    db_name=os.getenv('DB_NAME'),
+    pool_size=4
 )
+try:
+    db.connect()
+except DatabaseError:
+    # пул будет создан при первом запросе
+    pass
 
 
 @app.route('/addticket', methods=['POST'])
@@ -34,7 +40,6 @@ def add_ticket():
     if len(ticket_data['ticket_id'].split('-')) == 2:
         user_tid = ticket_data['ticket_id'].split('-')[0]
 
-        db.connect()
         query = """
                 SELECT 'ребёнок' AS post_, name, status FROM crodconnect.children WHERE telegram_id = %s
                 UNION
@@ -45,29 +50,23 @@ def add_ticket():
                 SELECT 'администратор' AS post_, name, status FROM crodconnect.admins WHERE telegram_id = %s;
                     """
 
-        if db.result['status'] == 'ok':
-            db.execute(query, (user_tid, user_tid, user_tid, user_tid,))
-            db.disconnect()
-
-            if db.result['status'] == 'ok':
-                response = db.data
-                if not response:
-                    user = "Информация в системе отсутствует"
-                else:
-                    user = f"{response['name']}\nРоль: {response['post_']}\nСтатус: {response['status']}"
+        try:
+            response = db.fetch_one(query, (user_tid, user_tid, user_tid, user_tid,))
+            if not response:
+                user = "Информация в системе отсутствует"
             else:
-                user = "Не удалось получить информацию о пользователе"
-        else:
+                user = f"{response['name']}\nРоль: {response['post_']}\nСтатус: {response['status']}"
+        except DatabaseError:
             user = "Не удалось получить информацию о пользователе"
 
-        send_telegam_message(
+        # обращение отправляется сразу, не дожидаясь очереди оповещений
+        queue_telegam_message(
             tID=os.getenv('ID_GROUP_ERRORS'),
             message_text=f"📨 *Обращение от пользователя №{ticket_data['ticket_id']}*"
                          f"\n\n🙋‍♂️ *Пользователь:* \n{user}"
                          f"\n\n⚠️ *Проблема:* {ticket_data['topic']}"
                          f"\n📃 *Описание:* {ticket_data['caption']}"
                          f"\n📂 *Файл:* {ticket_data['file']}"
-    
                          f"\n\n[Открыть ответ]({ticket_data['answer_link']})"
         )
 
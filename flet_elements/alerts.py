@@ -0,0 +1,152 @@
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import closing
+from threading import Thread
+from logging import info, error
+
+from flet_elements.telegram import notifier
+
+default_db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'alerts.sqlite3')
+# после стольких неудачных попыток оповещение больше не отправляется (например, Telegram отклоняет разметку)
+max_attempts = 5
+# отправленные оповещения хранятся для поиска повторов и удаляются через неделю
+sent_retention = 7 * 24 * 60 * 60
+
+schema = """
+    CREATE TABLE IF NOT EXISTS alerts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        key TEXT NOT NULL,
+        chat_id TEXT NOT NULL,
+        text TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 1,
+        created_at REAL NOT NULL,
+        not_before REAL NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        sent_at REAL
+    );
+    CREATE INDEX IF NOT EXISTS alerts_key ON alerts (key, sent_at);
+    CREATE INDEX IF NOT EXISTS alerts_pending ON alerts (sent_at, not_before);
+"""
+
+
+def coalesce_window() -> int:
+    # настройки читаются при вызове: модуль импортируется раньше, чем загружается .env
+    return int(os.getenv('ALERTS_COALESCE_WINDOW', 300))
+
+
+def connect():
+    # отдельное соединение на каждый вызов: оповещения пишут несколько процессов и потоков
+    connection = sqlite3.connect(os.getenv('ALERTS_DB_PATH', default_db_path), timeout=10, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(schema)
+    return connection
+
+
+def post_alert(text: str, chat_id=None):
+    """
+    Оповещение в очередь на отправку, по умолчанию в группу ID_GROUP_ERRORS
+    Очередь хранится в SQLite и переживает перезапуск, отправляет её send_pending_alerts
+    """
+
+    chat_id = str(chat_id or os.getenv('ID_GROUP_ERRORS'))
+    key = hashlib.sha256(f"{chat_id}\n{text}".encode()).hexdigest()
+    now = time.time()
+    try:
+        with closing(connect()) as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                updated = connection.execute("UPDATE alerts SET count = count + 1 WHERE key = ? AND sent_at IS NULL", (key,)).rowcount
+                if not updated:
+                    # после отправки такого же оповещения новое ждёт конца окна ALERTS_COALESCE_WINDOW,
+                    # повторы за это время копятся в нём и уходят одним сообщением с количеством
+                    last_sent = connection.execute("SELECT MAX(sent_at) FROM alerts WHERE key = ?", (key,)).fetchone()[0]
+                    not_before = max(now, (last_sent or 0) + coalesce_window())
+                    connection.execute(
+                        "INSERT INTO alerts (key, chat_id, text, created_at, not_before) VALUES (?, ?, ?, ?, ?)",
+                        (key, chat_id, text, now, not_before)
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+    except sqlite3.Error as e:
+        # без очереди оповещение отправляется сразу, чтобы не потерять его
+        error(f"Alerts: outbox unavailable, sending directly: {e}")
+        notifier.enqueue_message(chat_id, text)
+
+
+def mark_sent(connection, alert_id: int, key: str, chat_id: str, text: str, count: int):
+    """
+    Отметка об отправке оповещения с count повторами.
+    Повторы, добавленные post_alert во время отправки, переносятся в новое оповещение, которое уйдёт после окна
+    """
+
+    sent_at = time.time()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        current = connection.execute("SELECT count FROM alerts WHERE id = ?", (alert_id,)).fetchone()[0]
+        connection.execute("UPDATE alerts SET sent_at = ?, count = ? WHERE id = ?", (sent_at, count, alert_id))
+        if current > count:
+            connection.execute(
+                "INSERT INTO alerts (key, chat_id, text, count, created_at, not_before) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, chat_id, text, current - count, sent_at, sent_at + coalesce_window())
+            )
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def send_pending_alerts(limit: int = 20):
+    """
+    Отправка накопившихся оповещений. Вызывается только из одного потока (start_alert_sender)
+    """
+
+    now = time.time()
+    try:
+        with closing(connect()) as connection:
+            rows = connection.execute(
+                "SELECT id, key, chat_id, text, count, created_at, attempts FROM alerts WHERE sent_at IS NULL AND not_before <= ? ORDER BY id LIMIT ?",
+                (now, limit)
+            ).fetchall()
+
+            for alert_id, key, chat_id, text, count, created_at, attempts in rows:
+                message_text = text
+                if count > 1:
+                    message_text += f"\n\n_Повторилось {count} раз за {max(1, round((now - created_at) / 60))} мин._"
+                if notifier.send_message(chat_id, message_text) is None:
+                    error(f"Alerts: alert {alert_id} not sent, attempt {attempts + 1}")
+                    if attempts + 1 >= max_attempts:
+                        connection.execute("UPDATE alerts SET attempts = attempts + 1, sent_at = ? WHERE id = ?", (time.time(), alert_id))
+                        continue
+                    connection.execute("UPDATE alerts SET attempts = attempts + 1 WHERE id = ?", (alert_id,))
+                    # Telegram, скорее всего, недоступен, оставшиеся оповещения отправятся в следующий раз
+                    break
+                mark_sent(connection, alert_id, key, chat_id, text, count)
+                info(f"Alerts: alert {alert_id} sent to {chat_id} ({count})")
+
+            connection.execute("DELETE FROM alerts WHERE sent_at IS NOT NULL AND sent_at < ?", (now - sent_retention,))
+    except sqlite3.Error as e:
+        error(f"Alerts: {e}")
+
+
+def start_alert_sender(interval: float = 5) -> Thread:
+    """
+    Фоновый поток, который отправляет очередь оповещений каждые interval секунд.
+    Отдельный поток, чтобы долгие задачи процесса (например, бекап) не задерживали оповещения
+    """
+
+    def run():
+        info('Alerts: sender started')
+        while True:
+            try:
+                send_pending_alerts()
+            except Exception as e:
+                error(f"Alerts: {e}")
+            time.sleep(interval)
+
+    thread = Thread(target=run, name="alerts-sender", daemon=True)
+    thread.start()
+    return thread
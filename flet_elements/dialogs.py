@@ -46,14 +46,16 @@ class LoadingDialog:
             modal=True
         )
         self.loading_text = "Загрузка"
+        self.text = None
         self.page = page
 
-    def open(self):
+    def open(self, on_cancel=None):
+        self.text = Text(self.loading_text, size=20, weight=FontWeight.W_400)
         self.dialog.content = Column(
             controls=[
                 Column(
                     [
-                        Text(self.loading_text, size=20, weight=FontWeight.W_400),
+                        self.text,
                         ProgressBar()
                     ],
                     alignment=MainAxisAlignment.CENTER),
@@ -63,11 +65,19 @@ class LoadingDialog:
             width=400,
             height=50
         )
+        self.dialog.actions = [TextButton(text="Отменить", on_click=on_cancel)] if on_cancel is not None else None
+        self.dialog.actions_alignment = MainAxisAlignment.END
 
         self.page.dialog = self.dialog
         self.dialog.open = True
         self.page.update()
 
+    def set_text(self, text: str):
+        # текст прогресса в открытом диалоге
+        if self.text is not None:
+            self.text.value = text
+            self.page.update()
+
     def close(self):
         self.dialog.open = False
         self.page.update()
@@ -4,7 +4,9 @@ from os import listdir, path, unlink, getenv
 from shutil import rmtree
 from datetime import datetime
 
-from flet_elements.systemd import check_systemd, services_list
+import xlrd
+
+from flet_elements.systemd import service_health, services_list
 
 
 def remove_folder_content(filepath):
@@ -33,20 +35,63 @@ def get_hello(name):
     return f"{text}, \n{name}!"
 
 
-def get_system_list():
-    not_working = []
-
-    for service in services_list:
-        if is_debug() or platform.system() == "Windows":
-            not_working.append(service)
-        else:
-            if not check_systemd(service):
-                not_working.append(service)
+def get_system_list(statuses: dict = None):
+    if is_debug() or platform.system() == "Windows":
+        return list(services_list)
 
-    return not_working
+    if statuses is None:
+        statuses = service_health.get_statuses()
+    return [service for service in services_list if not statuses.get(service['service'], False)]
 
 
 def is_debug():
     if getenv("DEBUG", 'False').lower() in ('true', '1', 't'):
         return True
-    return False
\ No newline at end of file
+    return False
+
+
+def read_children_table(table_filepath: str):
+    """
+    Читает и проверяет таблицу со списком детей целиком, до записи в базу
+    Столбцы: ФИО, дата рождения, особенности, ФИО родителя, телефон родителя
+    :param table_filepath: путь к xls-файлу
+    :return: (список детей, список ошибок с номерами строк)
+    """
+
+    ws = xlrd.open_workbook(table_filepath).sheet_by_index(0)
+    children, errors = [], []
+
+    for row in range(1, ws.nrows):
+        if ws.ncols < 5:
+            errors.append(f"Строка {row + 1}: ожидается 5 столбцов, найдено {ws.ncols}")
+            break
+
+        name, birth, comment, parent_name, parent_phone = (ws.cell(row, col) for col in range(5))
+        if not str(name.value).strip():
+            if all(not str(ws.cell_value(row, col)).strip() for col in range(5)):
+                continue
+            errors.append(f"Строка {row + 1}: не указано ФИО")
+            continue
+
+        if birth.ctype not in (xlrd.XL_CELL_DATE, xlrd.XL_CELL_NUMBER):
+            errors.append(f"Строка {row + 1}: некорректная дата рождения «{birth.value}»")
+            continue
+        try:
+            birth_date = xlrd.xldate.xldate_as_tuple(birth.value, ws.book.datemode)
+        except xlrd.xldate.XLDateError:
+            errors.append(f"Строка {row + 1}: некорректная дата рождения «{birth.value}»")
+            continue
+
+        phone = parent_phone.value
+        if parent_phone.ctype == xlrd.XL_CELL_NUMBER:
+            phone = str(int(phone))
+
+        children.append({
+            'name': str(name.value).strip(),
+            'birth': f"{birth_date[0]}-{birth_date[1]:02}-{birth_date[2]:02}",
+            'comment': comment.value,
+            'parrent_name': parent_name.value,
+            'parrent_phone': phone
+        })
+
+    return children, errors
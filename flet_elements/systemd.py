@@ -1,5 +1,9 @@
+import os
 import platform
+import time
+from logging import info, error
 from subprocess import Popen, PIPE, run
+from threading import Lock, Thread
 
 systemctl_path = "/usr/bin/systemctl"
 
@@ -52,20 +56,104 @@ services_list = [
 ]
 
 
-def check_systemd(service_name: str) -> bool():
-    if platform.system() == "Windows":
-        return False
+class ServiceHealth:
+    """
+    Состояние сервисов из services_list.
+    Все юниты опрашиваются одним вызовом systemctl show, результат кэшируется на ttl секунд.
+    Фоновый поток обновляет состояние раз в refresh_interval секунд и сообщает подписчикам об изменениях
+    """
 
-    command = [systemctl_path, 'status', f'{service_name}.service']
-    process = Popen(command, stdout=PIPE, stderr=PIPE)
-    output, error = process.communicate()
-    if process.returncode == 0:
-        text = output.decode()
-        if text[text.find('Active:') + 8:].split()[0] == 'active':
-            return True
-        return False
-    else:
-        return False
+    def __init__(self, services: list, ttl: float = 5, refresh_interval: float = 10):
+        self.services = [service['service'] for service in services]
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.statuses = {}
+        self.updated_at = 0
+        self.lock = Lock()
+        self.subscribers = []
+        self.thread = None
+
+    def _probe(self) -> dict:
+        statuses = {service: False for service in self.services}
+        if platform.system() == "Windows":
+            return statuses
+
+        command = [systemctl_path, 'show', '--property=Id,ActiveState', *[f'{service}.service' for service in self.services]]
+        process = Popen(command, stdout=PIPE, stderr=PIPE)
+        output, errors = process.communicate()
+        if process.returncode != 0:
+            error(f'Systemd: {errors.decode().strip()}')
+            return statuses
+
+        # по блоку свойств на юнит, блоки разделены пустой строкой
+        for block in output.decode().split('\n\n'):
+            properties = dict(line.split('=', 1) for line in block.splitlines() if '=' in line)
+            service = properties.get('Id', '').removesuffix('.service')
+            if service in statuses:
+                statuses[service] = properties.get('ActiveState') == 'active'
+        return statuses
+
+    def refresh(self) -> dict:
+        statuses = self._probe()
+        with self.lock:
+            changed = statuses != self.statuses
+            self.statuses = statuses
+            self.updated_at = time.monotonic()
+            subscribers = list(self.subscribers)
+        if changed:
+            for callback in subscribers:
+                try:
+                    callback(statuses)
+                except Exception as e:
+                    error(f'Systemd: subscriber failed: {e}')
+        return statuses
+
+    def get_statuses(self) -> dict:
+        with self.lock:
+            if time.monotonic() - self.updated_at < self.ttl:
+                return dict(self.statuses)
+        return dict(self.refresh())
+
+    def is_active(self, service_name: str) -> bool:
+        return self.get_statuses().get(service_name, False)
+
+    def subscribe(self, callback):
+        # callback(statuses) вызывается из фонового потока при изменении состояния любого сервиса
+        with self.lock:
+            self.subscribers.append(callback)
+        self.start()
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = Thread(target=self._run, name="systemd-health", daemon=True)
+        self.thread.start()
+        info('Systemd: health refresh started')
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                error(f'Systemd: refresh failed: {e}')
+            time.sleep(self.refresh_interval)
+
+
+service_health = ServiceHealth(
+    services_list,
+    ttl=float(os.getenv('SYSTEMD_CACHE_TTL', 5)),
+    refresh_interval=float(os.getenv('SYSTEMD_REFRESH_INTERVAL', 10))
+)
+
+
+def check_systemd(service_name: str) -> bool:
+    return service_health.is_active(service_name)
 
 
 def reboot_systemd(service_name: str):
@@ -0,0 +1,86 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging import info, error
+from threading import Event, Lock
+
+from flet_elements.dialogs import LoadingDialog
+
+# общий пул для долгих операций панели (генерация документов, импорт таблиц), один на все сессии
+panel_pool = ThreadPoolExecutor(max_workers=int(os.getenv('PANEL_WORKERS', 4)), thread_name_prefix="panel")
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class BackgroundTask:
+    """
+    Состояние фоновой задачи: прогресс в диалоге загрузки и флаг отмены.
+    Обновления страницы отправляются не чаще, чем раз в min_interval секунд
+    """
+
+    def __init__(self, dialog: LoadingDialog, min_interval: float = 0.25):
+        self.dialog = dialog
+        self.min_interval = min_interval
+        self.cancelled = Event()
+        self.updated_at = 0
+        self.lock = Lock()
+
+    def progress(self, text: str, force: bool = False):
+        self.check()
+        with self.lock:
+            now = time.monotonic()
+            if not force and now - self.updated_at < self.min_interval:
+                return
+            self.updated_at = now
+        self.dialog.set_text(text)
+
+    def check(self):
+        # вызывается в точках, где задачу можно безопасно прервать
+        if self.cancelled.is_set():
+            raise TaskCancelled()
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+class TaskExecutor:
+    """
+    Запуск долгих обработчиков панели в фоне: обработчик события сразу возвращается,
+    пока задача выполняется, открыт диалог загрузки.
+    Непредвиденная ошибка задачи передаётся в on_error(title, exception), чтобы показать её пользователю
+    """
+
+    def __init__(self, dialog: LoadingDialog, pool: ThreadPoolExecutor = panel_pool, on_error=None):
+        self.dialog = dialog
+        self.pool = pool
+        self.on_error = on_error
+
+    def run(self, func, *args, title: str = "Загрузка", cancellable: bool = False, on_cancel=None):
+        """
+        Выполнение func(task, *args) в общем пуле
+        :param title: текст диалога загрузки
+        :param cancellable: показать в диалоге кнопку отмены
+        :param on_cancel: вызывается после того, как задача остановилась по отмене
+        """
+
+        task = BackgroundTask(self.dialog)
+        self.dialog.loading_text = title
+        self.dialog.open(on_cancel=(lambda _: task.cancel()) if cancellable else None)
+
+        def worker():
+            try:
+                func(task, *args)
+            except TaskCancelled:
+                info(f'Tasks: {func.__name__} cancelled')
+                self.dialog.close()
+                if on_cancel is not None:
+                    on_cancel()
+            except Exception as e:
+                error(f'Tasks: {func.__name__} failed: {e}')
+                self.dialog.close()
+                if self.on_error is not None:
+                    self.on_error(title, e)
+
+        return self.pool.submit(worker)
@@ -1,48 +1,132 @@
-from requests import post, exceptions
-from os import getenv
+import atexit
+import time
+from os import getenv, path
+from queue import Queue, Full
+from threading import Thread, Lock
 from logging import basicConfig, info, error, INFO
 
+from requests import Session, exceptions
+from requests.adapters import HTTPAdapter
+
 basicConfig(
     level=INFO,
     format="%(asctime)s %(levelname)s %(message)s"
 )
 
 
+class TelegramNotifier:
+    """
+    Клиент Bot API для процессов без aiogram (панель, flask, бекапы).
+    Одна сессия с keep-alive соединениями, таймауты, повтор при 429 и 5xx.
+    Сообщения, результат которых не нужен, ставятся в очередь и отправляются фоновым потоком
+    """
+
+    def __init__(self, timeout: tuple = (5, 30), max_retries: int = 3, outbox_size: int = 1000):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=10))
+        self.outbox = Queue(maxsize=outbox_size)
+        self.worker = None
+        self.lock = Lock()
+
+    def _call(self, method: str, data: dict, files: dict = None):
+        """
+        Запрос к Bot API
+        :return: поле result ответа или None, если запрос не выполнен
+        """
+
+        # токен читается при каждом запросе: модуль импортируется раньше, чем загружается .env
+        url = f'https://api.telegram.org/bot{getenv("BOT_TOKEN")}/{method}'
+        for attempt in range(1, self.max_retries + 1):
+            delay = 2 ** attempt
+            try:
+                response = self.session.post(url=url, data=data, files=files, timeout=self.timeout)
+                body = response.json()
+                if response.status_code == 200 and body.get('ok'):
+                    return body['result']
+                if response.status_code == 429:
+                    delay = body.get('parameters', {}).get('retry_after', delay)
+                elif response.status_code < 500:
+                    # ошибка в запросе (чат не найден, бот заблокирован, ...), повтор не поможет
+                    error(f"Telegram: {method} to {data.get('chat_id')} failed: {body.get('description')}")
+                    return None
+                error(f"Telegram: {method} attempt {attempt} failed: {response.status_code} {body.get('description')}")
+            except (exceptions.RequestException, ValueError) as e:
+                error(f"Telegram: {method} attempt {attempt} failed: {e}")
+            if attempt < self.max_retries:
+                time.sleep(delay)
+        return None
+
+    def send_message(self, chat_id, text: str, parse_mode: str = "Markdown"):
+        info(f"Sending telegram message to {chat_id}")
+        return self._call('sendMessage', {'chat_id': chat_id, 'text': text, 'parse_mode': parse_mode})
+
+    def send_document(self, chat_id, content: bytes, filename: str, caption: str = "", parse_mode: str = "Markdown"):
+        info(f"Sending telegram document to {chat_id}")
+        return self._call('sendDocument', {'chat_id': chat_id, 'caption': caption, 'parse_mode': parse_mode}, files={'document': (filename, content)})
+
+    def delete_message(self, chat_id, message_id):
+        return self._call('deleteMessage', {'chat_id': chat_id, 'message_id': message_id})
+
+    def enqueue_message(self, chat_id, text: str, parse_mode: str = "Markdown"):
+        # отправка без ожидания ответа, вызывающий поток сразу продолжает работу
+        try:
+            self.outbox.put_nowait((chat_id, text, parse_mode))
+        except Full:
+            error(f"Telegram: outbox is full, message to {chat_id} dropped")
+            return
+        self._start_worker()
+
+    def _start_worker(self):
+        with self.lock:
+            if self.worker is None:
+                self.worker = Thread(target=self._run, name="telegram-outbox", daemon=True)
+                self.worker.start()
+
+    def _run(self):
+        while True:
+            chat_id, text, parse_mode = self.outbox.get()
+            try:
+                self.send_message(chat_id, text, parse_mode)
+            except Exception as e:
+                error(f"Telegram: {e}")
+            finally:
+                self.outbox.task_done()
+
+    def flush(self, timeout: float = 10):
+        # при завершении процесса даётся время отправить сообщения из очереди
+        deadline = time.monotonic() + timeout
+        while self.outbox.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.1)
+
+
+notifier = TelegramNotifier()
+atexit.register(notifier.flush)
+
+
 def send_telegam_message(tID, message_text):
-    # отправка текстовых сообщений в телеграмм
-
-    info(f"Sending telegram message to {tID}")
-    url = f'https://api.telegram.org/bot{getenv("BOT_TOKEN")}/sendMessage'
-    data = {'chat_id': tID, 'text': message_text, "parse_mode": "Markdown"}
-    response = post(url=url, data=data)
-    info(response.json())
-    if response.status_code == 200:
-        return {'chat_id': response.json()['result']['chat']['id'], 'message_id': response.json()['result']['message_id']}
-    else:
+    # отправка текстовых сообщений в телеграмм с ожиданием ответа, когда нужен id сообщения
+    result = notifier.send_message(tID, message_text)
+    if result is None:
         return False
+    return {'chat_id': result['chat']['id'], 'message_id': result['message_id']}
 
 
-def send_telegram_document(tID, filepath: str, description: str):
-    url = f'https://api.telegram.org/bot{getenv("BOT_TOKEN")}/sendDocument'
+def queue_telegam_message(tID, message_text):
+    # отправка текстовых сообщений в телеграмм в фоне
+    notifier.enqueue_message(tID, message_text)
 
-    with open(filepath, 'rb') as file:
-        info(f"Sending telegram document to {tID}")
-        files = {'document': file}
-        data = {'chat_id': tID, 'caption': description, 'parse_mode': "Markdown"}
-        try:
-            response = post(url=url, data=data, files=files)
-            info(info(response.json()))
-            return True
-        except exceptions.ConnectTimeout:
-            return False
+
+def send_telegram_document(tID, filepath: str = None, description: str = "", content: bytes = None, filename: str = None):
+    # документ отправляется либо из файла (filepath), либо из памяти (content + filename)
+    if content is None:
+        with open(filepath, 'rb') as file:
+            content = file.read()
+        filename = filename or path.basename(filepath)
+
+    return notifier.send_document(tID, content, filename, description) is not None
 
 
 def delete_telegram_message(data):
-    url = f'https://api.telegram.org/bot{getenv("BOT_TOKEN")}/deleteMessage'
-    data = {'chat_id': data['chat_id'], 'message_id': data['message_id']}
-    try:
-        response = post(url=url, data=data)
-    except Exception as e:
-        error(f"deleting message: {e}")
-        return False
-    return True
+    return notifier.delete_message(data['chat_id'], data['message_id']) is not None
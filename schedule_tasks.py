@@ -5,8 +5,8 @@ import time
 import logging
 
 from dotenv import load_dotenv
-from flet_elements.telegram import send_telegam_message
-from backup import mysql_backup
+from flet_elements.alerts import post_alert, start_alert_sender
+from backup import scheduled_backup
 
 if platform.system() == "Windows":
     env_path = r"D:\CROD_MEDIA\.env"
@@ -19,12 +19,13 @@ backup_time = os.getenv('DB_BACKUP_TIME')
 logging.info(f'Backup: time to backup is {backup_time}')
 
 
-schedule.every().day.at(backup_time).do(mysql_backup)
+schedule.every().day.at(backup_time).do(scheduled_backup)
+# единственный отправитель очереди оповещений, в неё пишут панель и бекапы
+start_alert_sender()
 
-send_telegam_message(
-    tID=os.getenv('ID_GROUP_ERRORS'),
-    message_text=f"*Бекап базы данных*"
-                 f"\n\nАвтоматический бекап ежедневно в {backup_time}\n\n#бекап"
+post_alert(
+    f"*Бекап базы данных*"
+    f"\n\nАвтоматический бекап ежедневно в {backup_time}: полный раз в {os.getenv('BACKUP_FULL_INTERVAL_DAYS', 7)} дн., в остальные дни - изменённые таблицы\n\n#бекап"
 )
 
 logging.info('Scheduler: started')
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+import sys
+from collections import Counter
+
+# запуск из корня репозитория: python scripts/seats_burst.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import AsyncMySQLPool
+from bot_elements.seats import reserve_seat, RESERVED, FULL, ALREADY_RECORDED, LIMIT_REACHED
+
+# Нагрузочная проверка reserve_seat: всплеск одновременных записей на модули.
+# Запускается только на отдельном сервере MySQL, база crodconnect создаётся на время проверки и удаляется:
+#   SEATS_TEST_DB_HOST=... SEATS_TEST_DB_USER=... SEATS_TEST_DB_PASSWORD=... python scripts/seats_burst.py
+# Если база crodconnect на сервере уже есть, проверка не запускается
+
+log = logging.getLogger("seats_burst")
+
+schema = """
+    CREATE DATABASE crodconnect;
+    CREATE TABLE crodconnect.children (
+        id INT PRIMARY KEY
+    ) ENGINE=InnoDB;
+    CREATE TABLE crodconnect.modules (
+        id INT PRIMARY KEY,
+        seats_real INT NOT NULL DEFAULT 0,
+        seats_max INT NOT NULL
+    ) ENGINE=InnoDB;
+    CREATE TABLE crodconnect.modules_records (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        child_id INT NOT NULL,
+        module_id INT NOT NULL
+    ) ENGINE=InnoDB;
+"""
+
+
+async def check_module(db: AsyncMySQLPool, module_id: int, expected: int):
+    # места не проданы сверх лимита, счётчик совпадает с записями, ни один ребёнок не записан дважды
+    module = await db.fetch_one("SELECT seats_real, seats_max FROM crodconnect.modules WHERE id = %s", (module_id,))
+    records = await db.fetch_scalar("SELECT COUNT(*) FROM crodconnect.modules_records WHERE module_id = %s", (module_id,))
+    children = await db.fetch_scalar("SELECT COUNT(DISTINCT child_id) FROM crodconnect.modules_records WHERE module_id = %s", (module_id,))
+
+    assert module['seats_real'] <= module['seats_max'], f"module {module_id} oversold: {module}"
+    assert module['seats_real'] == records == expected, f"module {module_id}: seats_real {module['seats_real']}, records {records}, expected {expected}"
+    assert children == records, f"module {module_id}: {records} records for {children} children"
+
+
+async def burst(db: AsyncMySQLPool, children: int, seats: int):
+    # много детей одновременно записываются на один модуль с seats свободными местами
+    results = Counter(await asyncio.gather(*(reserve_seat(db, child_id, 1, modules_limit=3) for child_id in range(1, children + 1))))
+
+    assert results[RESERVED] == seats, f"burst: {results}"
+    assert results[FULL] == children - seats, f"burst: {results}"
+    await check_module(db, 1, seats)
+    log.info(f"Seats burst: {children} children, {seats} seats -> {dict(results)}")
+
+
+async def same_child_taps(db: AsyncMySQLPool, child_id: int, taps: int):
+    # один ребёнок много раз подряд нажимает на один и тот же модуль
+    results = Counter(await asyncio.gather(*(reserve_seat(db, child_id, 2, modules_limit=3) for _ in range(taps))))
+
+    assert results[RESERVED] == 1, f"same child taps: {results}"
+    assert results[ALREADY_RECORDED] == taps - 1, f"same child taps: {results}"
+    await check_module(db, 2, 1)
+    log.info(f"Seats burst: same child, {taps} taps -> {dict(results)}")
+
+
+async def same_child_modules(db: AsyncMySQLPool, child_id: int):
+    # один ребёнок одновременно записывается на разные модули, всего можно на один
+    results = Counter(await asyncio.gather(*(reserve_seat(db, child_id, module_id, modules_limit=1) for module_id in (3, 4, 5))))
+
+    assert results[RESERVED] == 1, f"same child modules: {results}"
+    assert results[LIMIT_REACHED] == 2, f"same child modules: {results}"
+    records = await db.fetch_scalar("SELECT COUNT(*) FROM crodconnect.modules_records WHERE child_id = %s", (child_id,))
+    seats = await db.fetch_scalar("SELECT SUM(seats_real) FROM crodconnect.modules WHERE id IN (3, 4, 5)")
+    assert records == seats == 1, f"same child modules: records {records}, seats_real {seats}"
+    log.info(f"Seats burst: same child, 3 modules, limit 1 -> {dict(results)}")
+
+
+async def main():
+    children = int(os.getenv('SEATS_TEST_CHILDREN', 300))
+    seats = int(os.getenv('SEATS_TEST_SEATS', 25))
+
+    db = AsyncMySQLPool(
+        host=os.getenv('SEATS_TEST_DB_HOST'),
+        port=os.getenv('SEATS_TEST_DB_PORT', 3306),
+        user=os.getenv('SEATS_TEST_DB_USER'),
+        password=os.getenv('SEATS_TEST_DB_PASSWORD'),
+        db_name=None,
+        maxsize=int(os.getenv('SEATS_TEST_CONNECTIONS', 20))
+    )
+    try:
+        if await db.fetch_scalar("SELECT COUNT(*) FROM information_schema.schemata WHERE schema_name = 'crodconnect'"):
+            log.error("Seats burst: crodconnect already exists on this server, use a separate test server")
+            return 1
+
+        await db.execute(schema)
+        try:
+            await db.execute_many("INSERT INTO crodconnect.children (id) VALUES (%s)", [(child_id,) for child_id in range(1, children + 3)])
+            await db.execute_many(
+                "INSERT INTO crodconnect.modules (id, seats_max) VALUES (%s, %s)",
+                [(1, seats), (2, seats), (3, seats), (4, seats), (5, seats)]
+            )
+
+            await burst(db, children, seats)
+            # отдельные дети, которые не участвовали во всплеске
+            await same_child_taps(db, children + 1, 20)
+            await same_child_modules(db, children + 2)
+        finally:
+            await db.execute("DROP DATABASE crodconnect")
+    finally:
+        await db.disconnect()
+
+    log.info("Seats burst: all checks passed")
+    return 0
+
+
+if __name__ == '__main__':
+    # журнал транзакций пула на каждую запись слишком подробный для проверки, выводятся только результаты
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s")
+    logging.getLogger().setLevel(logging.WARNING)
+    log.setLevel(logging.INFO)
+    try:
+        sys.exit(asyncio.run(main()))
+    except AssertionError as e:
+        log.error(f"Seats burst: check failed: {e}")
+        sys.exit(1)
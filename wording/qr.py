@@ -0,0 +1,150 @@
+import hashlib
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from logging import info, error
+from threading import Lock, get_ident
+
+import qrcode
+
+current_directory = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_qr_link(payload: str) -> str:
+    """
+    Ссылка для регистрации в боте
+    :param payload: параметр start, например children_<pass_phrase>
+    """
+
+    return f"https://t.me/{os.getenv('BOT_NAME')}?start={payload}"
+
+
+def render_qr(link: str) -> bytes:
+    # выполняется в отдельном процессе, поэтому функция верхнего уровня
+    stream = BytesIO()
+    qrcode.make(link).save(stream)
+    return stream.getvalue()
+
+
+class QrCache:
+    """
+    Кэш PNG с QR-кодами, ключ - ссылка с payload.
+    Недавно использованные коды хранятся в памяти, все остальные - в папке на диске и переживают перезапуск.
+    Пачки кодов рендерятся в пуле процессов
+    """
+
+    def __init__(self, directory: str, memory_size: int = 512, disk_size: int = 5000, workers: int = None, batch_threshold: int = 8):
+        self.directory = directory
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.workers = workers
+        self.batch_threshold = batch_threshold
+        self.memory = OrderedDict()
+        self.lock = Lock()
+        self.pool = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, link: str) -> str:
+        return os.path.join(self.directory, f"{hashlib.sha256(link.encode()).hexdigest()[:32]}.png")
+
+    def _remember(self, link: str, image: bytes):
+        with self.lock:
+            self.memory[link] = image
+            self.memory.move_to_end(link)
+            while len(self.memory) > self.memory_size:
+                self.memory.popitem(last=False)
+
+    def _lookup(self, link: str):
+        with self.lock:
+            image = self.memory.get(link)
+            if image is not None:
+                self.memory.move_to_end(link)
+                return image
+
+        path = self._path(link)
+        if os.path.exists(path):
+            with open(path, 'rb') as file:
+                image = file.read()
+            os.utime(path)
+            self._remember(link, image)
+            return image
+
+        return None
+
+    def _store(self, link: str, image: bytes):
+        self._remember(link, image)
+        path = self._path(link)
+        try:
+            # запись через временный файл, чтобы параллельный читатель не увидел половину картинки
+            tmp_path = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+            with open(tmp_path, 'wb') as file:
+                file.write(image)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            error(f"QR cache: not saved to disk: {e}")
+
+    def get(self, payload: str) -> bytes:
+        link = get_qr_link(payload)
+        image = self._lookup(link)
+        if image is None:
+            image = render_qr(link)
+            self._store(link, image)
+
+        return image
+
+    def get_many(self, payloads: list) -> dict:
+        """
+        QR-коды для списка payload, отсутствующие в кэше рендерятся пачкой
+        :return: словарь payload -> PNG
+        """
+
+        images, missing = {}, {}
+        for payload in payloads:
+            link = get_qr_link(payload)
+            image = self._lookup(link)
+            if image is None:
+                missing[payload] = link
+            else:
+                images[payload] = image
+
+        if missing:
+            info(f"QR cache: rendering {len(missing)} of {len(payloads)} codes")
+            links = list(missing.values())
+            if len(links) >= self.batch_threshold:
+                rendered = self._get_pool().map(render_qr, links, chunksize=16)
+            else:
+                rendered = map(render_qr, links)
+
+            for (payload, link), image in zip(missing.items(), rendered):
+                self._store(link, image)
+                images[payload] = image
+
+            self.prune()
+
+        return images
+
+    def _get_pool(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self.pool
+
+    def prune(self):
+        # на диске остаются disk_size кодов, которые последними создавались или читались с диска
+        try:
+            files = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.png')]
+            if len(files) <= self.disk_size:
+                return
+            files.sort(key=os.path.getmtime)
+            for path in files[:len(files) - self.disk_size]:
+                os.remove(path)
+        except OSError as e:
+            error(f"QR cache: pruning failed: {e}")
+
+
+qr_cache = QrCache(
+    directory=f"{current_directory}/qr",
+    memory_size=int(os.getenv('QR_CACHE_SIZE', 512)),
+    disk_size=int(os.getenv('QR_CACHE_DISK_SIZE', 5000))
+)
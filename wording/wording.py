@@ -1,22 +1,39 @@
+import hashlib
+import json
 import math
 import os
 import random
+import time
+import shutil
+import subprocess
+import tempfile
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from functools import lru_cache, wraps
+from io import BytesIO
+from pathlib import Path
+from threading import Lock
 
 import docx
 import convertapi
-import qrcode
 from docx.enum.table import WD_ALIGN_VERTICAL
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.shared import Pt, Inches, Mm
 from docxtpl import DocxTemplate, InlineImage
 from datetime import datetime
 from dotenv import load_dotenv
-from logging import basicConfig, INFO, info, error
-from re import sub
-from transliterate import translit
+from logging import basicConfig, INFO, info, warning, error
 from PIL import Image, ImageDraw, ImageFont
+from pypdf import PdfMerger
 
 from app import convert_date
+from wording.qr import qr_cache
+
+try:
+    from unoserver.client import UnoClient
+except ImportError:
+    UnoClient = None
 
 basicConfig(
     level=INFO,
@@ -35,67 +52,337 @@ groups_dict = {
 }
 
 
-def insert_metrics(filepath, group_num):
-    doc = DocxTemplate(f"{current_directory}/generated/{filepath}.docx")
-    context = {"group_num": group_num,
-               "create_time": datetime.now().strftime("%d.%m.%Y в %H:%M"),
-               }
-    doc.render(context)
-    doc.save(f"{current_directory}/generated/{filepath}.docx")
+# общий пул для генерации документов, задания одной пачки выполняются параллельно
+documents_pool = ThreadPoolExecutor(max_workers=int(os.getenv('WORDING_WORKERS', 4)), thread_name_prefix="wording")
+
+
+class PdfDocument:
+    def __init__(self, name: str, content: bytes, date_format: str = None):
+        """
+        :param name: имя файла без расширения
+        :param date_format: дата, которая добавляется к имени при каждом обращении к filename,
+        чтобы документ из documents_cache отправлялся с текущей датой
+        """
+        self.name = name
+        self.date_format = date_format
+        self.content = content
+        # file_id документа, уже загруженного в Telegram, и имя, с которым он загружен
+        self.file_id = None
+        self.file_id_filename = None
+
+    @property
+    def filename(self):
+        if self.date_format is None:
+            return f"{self.name}.pdf"
+        return f"{self.name}_{datetime.now().strftime(self.date_format)}.pdf"
+
+    def get_file_id(self):
+        # после смены даты в имени документ загружается заново
+        return self.file_id if self.file_id_filename == self.filename else None
+
+    def set_file_id(self, file_id: str):
+        self.file_id = file_id
+        self.file_id_filename = self.filename
+
+    def as_stream(self):
+        return BytesIO(self.content)
+
+
+@lru_cache(maxsize=None)
+def read_template(name: str) -> bytes:
+    with open(f"{current_directory}/templates/{name}", 'rb') as file:
+        return file.read()
+
+
+def open_template(name: str):
+    """
+    Открывает шаблон из памяти, файл с диска читается один раз за время работы процесса
+    :param name: имя файла в /templates
+    """
+
+    return docx.Document(BytesIO(read_template(name)))
+
+
+def render_template(name: str, group_num):
+    """
+    Подставляет метрики (группа) в шаблон за один проход.
+    Строки таблиц добавляются уже в отрендеренный документ (возвращаемый .docx)
+    """
+
+    tpl = DocxTemplate(BytesIO(read_template(name)))
+    tpl.render({"group_num": group_num})
+    return tpl
+
+
+class DocumentCache:
+    """
+    Кэш готовых PDF в памяти процесса.
+    Ключ - хэш входных данных и содержимого шаблона, поэтому любое изменение данных или шаблона даёт новый документ.
+    Записи вытесняются по времени жизни и по суммарному размеру (сначала самые давно использованные)
+    """
+
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    @staticmethod
+    def make_key(template: str, *inputs) -> str:
+        payload = json.dumps(inputs, default=str, sort_keys=True, ensure_ascii=False)
+        template_version = hashlib.sha256(read_template(template)).hexdigest()
+        return hashlib.sha256(f"{template}:{template_version}:{payload}".encode()).hexdigest()
+
+    def get(self, key: str):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            document, expires_at = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return document
+
+    def put(self, key: str, document: PdfDocument):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            if len(document.content) > self.max_bytes:
+                return
+            self.entries[key] = (document, time.monotonic() + self.ttl)
+            self.size += len(document.content)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, key: str):
+        document, _ = self.entries.pop(key)
+        self.size -= len(document.content)
+
+
+documents_cache = DocumentCache(
+    max_bytes=int(os.getenv('DOCUMENTS_CACHE_MB', 64)) * 1024 * 1024,
+    ttl=int(os.getenv('DOCUMENTS_CACHE_TTL', 6 * 60 * 60))
+)
 
 
-def images_to_pdf(filepath_list: list, output_filename: str):
-    images_list = []
+def cached_document(template: str):
+    """
+    Возвращает документ из documents_cache, если он уже собирался из тех же данных и того же шаблона.
+    Ключ считается до вызова, так как функции генерации изменяют входные списки.
+    В кэшируемых документах нет времени создания, дата добавляется к имени файла при отправке (PdfDocument.date_format)
+    """
 
-    main_img = Image.open(filepath_list[0])
-    for filepath in filepath_list[1:]:
-        img = Image.open(filepath)
-        img.convert('RGB')
-        images_list.append(img)
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args):
+            key = documents_cache.make_key(template, func.__name__, *args)
+            document = documents_cache.get(key)
+            if document is not None:
+                info(f"{document.filename}: taken from cache")
+                return document
 
-    main_img.save(output_filename, save_all=True, append_images=images_list)
+            document = func(*args)
+            documents_cache.put(key, document)
+            return document
 
+        return wrapper
 
-def convert_to_pdf(filepath: str):
-    info(f"{filepath}: started converting to pdf")
+    return decorator
 
-    convertapi.api_secret = os.getenv('CONVERT_SECRET')
 
-    docx_file = f"{current_directory}/generated/{filepath}.docx"
+def save_docx(doc) -> bytes:
+    stream = BytesIO()
+    doc.save(stream)
+    return stream.getvalue()
 
-    converted = convertapi.convert(
-        'pdf',
-        {
-            'File': docx_file
-        },
-        from_format='doc'
-    )
-    info(f"{filepath}: converted successfully!")
 
-    converted.save_files(f"{current_directory}/generated")
-    info(f"{filepath}: file save in /generated")
+def render_many(jobs: list, on_progress=None) -> list:
+    """
+    Параллельно выполняет задания генерации документов
+    :param jobs: список кортежей (функция, аргументы...)
+    :param on_progress: вызывается в потоке вызывающего с (готово, всего) после каждого документа, исключение в нём прерывает генерацию
+    :return: результаты в порядке заданий
+    """
 
-    if os.path.exists(docx_file):
-        os.remove(docx_file)
+    futures = {documents_pool.submit(job[0], *job[1:]): index for index, job in enumerate(jobs)}
+    results = [None] * len(jobs)
+    try:
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if on_progress is not None:
+                on_progress(done, len(jobs))
+    except BaseException:
+        # ошибка или отмена из on_progress: ещё не начатые задания не выполняются
+        for future in futures:
+            future.cancel()
+        raise
 
+    return results
 
-def fill_badge(badge_type: str, name: str, caption: str):
-    translitted_name = sub(r'[^a-zA-Zа-яА-ЯёЁ]', '', translit(''.join(name.split()[:2]), language_code='ru', reversed=True))  # + str(random.randint(11111, 99999))
 
-    filename = f"badge_{badge_type}_{translitted_name}"
-    info(f'Badging: generating {badge_type} for {name} ({caption})')
+def merge_pdf(documents: list) -> bytes:
+    merger = PdfMerger()
+    for document in documents:
+        merger.append(document.as_stream())
+    stream = BytesIO()
+    merger.write(stream)
+    merger.close()
 
-    initials = name.split()
-    multiline = True if len(initials) == 3 else False
+    return stream.getvalue()
+
+
+class PdfConverter(ABC):
+    """
+    Конвертер DOCX -> PDF, работает с байтами в памяти.
+    Реализация выбирается переменной окружения PDF_CONVERTER (см. get_converter)
+    """
+
+    name = None
+
+    @abstractmethod
+    def convert(self, filename: str, docx_content: bytes) -> bytes:
+        pass
+
+
+class ConvertApiConverter(PdfConverter):
+    """Удалённая конвертация через ConvertAPI (нужен CONVERT_SECRET)"""
+
+    name = "convertapi"
+
+    def convert(self, filename: str, docx_content: bytes) -> bytes:
+        convertapi.api_secret = os.getenv('CONVERT_SECRET')
+        converted = convertapi.convert(
+            'pdf',
+            {
+                'File': convertapi.UploadIO(BytesIO(docx_content), f"{filename}.docx")
+            },
+            from_format='docx'
+        )
+        return converted.file.io.getvalue()
+
+
+class LibreOfficeConverter(PdfConverter):
+    """
+    Локальная конвертация без внешних сервисов.
+    Документ отправляется в постоянно запущенный headless LibreOffice (unoserver, по умолчанию 127.0.0.1:2003,
+    адрес в UNOSERVER_HOST и UNOSERVER_PORT), запуск на сервере: unoserver --interface 127.0.0.1 --port 2003.
+    Если unoserver недоступен, на каждый документ запускается soffice --headless, это в разы медленнее
+    """
+
+    name = "libreoffice"
+
+    def __init__(self):
+        self.binary = os.getenv('SOFFICE_PATH') or shutil.which('soffice') or shutil.which('libreoffice')
+        self.uno_host = os.getenv('UNOSERVER_HOST', '127.0.0.1')
+        self.uno_port = os.getenv('UNOSERVER_PORT', '2003')
+        self.timeout = int(os.getenv('SOFFICE_TIMEOUT', 120))
+
+    def is_available(self):
+        return UnoClient is not None or self.binary is not None
+
+    def convert(self, filename: str, docx_content: bytes) -> bytes:
+        if UnoClient is None:
+            warning(f"{filename}: unoserver is not installed, starting soffice for a single document")
+        else:
+            try:
+                client = UnoClient(server=self.uno_host, port=self.uno_port)
+                return client.convert(indata=docx_content, convert_to='pdf')
+            except Exception as e:
+                if self.binary is None:
+                    raise
+                warning(f"{filename}: unoserver at {self.uno_host}:{self.uno_port} failed ({e}), starting soffice for a single document")
+
+        return self.convert_with_soffice(docx_content)
+
+    def convert_with_soffice(self, docx_content: bytes) -> bytes:
+        if self.binary is None:
+            raise RuntimeError("LibreOffice (soffice) not found, set SOFFICE_PATH or PDF_CONVERTER=convertapi")
+
+        # отдельный профиль на каждый запуск, иначе параллельные soffice мешают друг другу
+        with tempfile.TemporaryDirectory(prefix="wording_") as tmp_dir:
+            source = os.path.join(tmp_dir, "document.docx")
+            with open(source, 'wb') as file:
+                file.write(docx_content)
+
+            profile = Path(tmp_dir, "profile").as_uri()
+            subprocess.run(
+                [self.binary, f"-env:UserInstallation={profile}", "--headless", "--norestore",
+                 "--convert-to", "pdf", "--outdir", tmp_dir, source],
+                check=True, capture_output=True, timeout=self.timeout
+            )
+
+            with open(os.path.join(tmp_dir, "document.pdf"), 'rb') as file:
+                return file.read()
+
+
+converters = {
+    ConvertApiConverter.name: ConvertApiConverter,
+    LibreOfficeConverter.name: LibreOfficeConverter,
+}
+converter = None
+
+
+def get_converter() -> PdfConverter:
+    """
+    PDF_CONVERTER: libreoffice, convertapi или auto (по умолчанию):
+    локальный LibreOffice, если он найден, иначе ConvertAPI
+    """
+
+    global converter
+    if converter is None:
+        name = os.getenv('PDF_CONVERTER', 'auto').lower()
+        if name == 'auto':
+            local = LibreOfficeConverter()
+            converter = local if local.is_available() else ConvertApiConverter()
+        else:
+            converter = converters[name]()
+        info(f"Wording: using {converter.name} pdf converter")
+
+    return converter
+
+
+def convert_to_pdf(filename: str, docx_content: bytes, date_format: str = None) -> PdfDocument:
+    pdf_converter = get_converter()
+    info(f"{filename}: started converting to pdf ({pdf_converter.name})")
+
+    content = pdf_converter.convert(filename, docx_content)
+    info(f"{filename}: converted successfully!")
+
+    return PdfDocument(filename, content, date_format)
+
+
+@lru_cache(maxsize=None)
+def load_badge_assets(badge_type: str):
+    """
+    Шаблон бейджа и шрифты, загружаются один раз в каждом процессе
+    :return: (шаблон, шрифт имени, шрифт подписи)
+    """
 
     fontpath = f'{current_directory}/fonts/Bebas.ttf'
+    template = Image.open(f'{current_directory}/templates/badges/{badge_type}.png')
+    template.load()
+
+    return template, ImageFont.truetype(font=fontpath, size=85), ImageFont.truetype(font=fontpath, size=60)
+
 
-    name_font = ImageFont.truetype(font=fontpath, size=85)
-    caption_font = ImageFont.truetype(font=fontpath, size=60)
+def fill_badge(badge_type: str, name: str, caption: str) -> bytes:
+    """
+    Рисует бейдж в памяти
+    :return: PNG (быстрое сжатие, картинка сразу уходит на лист)
+    """
 
-    badge = Image.open(f'{current_directory}/templates/badges/{badge_type}.png')
+    info(f'Badging: generating {badge_type} for {name} ({caption})')
+
+    template, name_font, caption_font = load_badge_assets(badge_type)
+    badge = template.copy()
     drawer = ImageDraw.Draw(badge)
 
+    initials = name.split()
+    multiline = True if len(initials) == 3 else False
+
     caption_position = (badge.size[0] // 2, 530)
 
     drawer.text(caption_position, caption.upper(), font=caption_font, fill='black', anchor='mm', align='center')
@@ -106,63 +393,108 @@ def fill_badge(badge_type: str, name: str, caption: str):
     else:
         drawer.text((badge.size[0] // 2, badge.size[1] // 2 + 20), name.upper(), font=name_font, fill='black', anchor='mm', align='center')
 
-    badge.save(f"{current_directory}/generated/{filename}.png")
-    # badge.show()
-    info(f'Badging: saved {filename}.png')
+    stream = BytesIO()
+    badge.save(stream, format='PNG', compress_level=1)
+    return stream.getvalue()
+
+
+def render_badge(user: dict) -> bytes:
+    # выполняется в пуле процессов
+    return fill_badge(user['post_'], user['name'], user['caption'])
 
 
-def create_badge_sheet(final_file_name, insert_paths, spacing_mm=2, border_width_mm=0.3):
-    A4_width_mm = 210
-    A4_height_mm = 297
+class BadgeSheetLayout:
+    """Раскладка бейджей 90x55 мм на листе A4 при 300 dpi"""
 
-    insert_width_mm = 90
-    insert_height_mm = 55
+    def __init__(self, spacing_mm=2, border_width_mm=0.3):
+        A4_width_mm = 210
+        A4_height_mm = 297
 
-    margin_mm = 12.7
+        insert_width_mm = 90
+        insert_height_mm = 55
 
-    dpi = 300
-    mm_to_inches = 1 / 25.4
-    A4_width_px = int(A4_width_mm * dpi * mm_to_inches)
-    A4_height_px = int(A4_height_mm * dpi * mm_to_inches)
-    insert_width_px = int(insert_width_mm * dpi * mm_to_inches)
-    insert_height_px = int(insert_height_mm * dpi * mm_to_inches)
-    margin_px = int(margin_mm * dpi * mm_to_inches)
-    spacing_px = int(spacing_mm * dpi * mm_to_inches)
-    border_width_px = int(border_width_mm * dpi * mm_to_inches)
+        margin_mm = 12.7
 
-    a4_image = Image.new('RGB', (A4_width_px, A4_height_px), 'white')
+        dpi = 300
+        mm_to_inches = 1 / 25.4
+        self.dpi = dpi
+        self.A4_width_px = int(A4_width_mm * dpi * mm_to_inches)
+        self.A4_height_px = int(A4_height_mm * dpi * mm_to_inches)
+        self.insert_width_px = int(insert_width_mm * dpi * mm_to_inches)
+        self.insert_height_px = int(insert_height_mm * dpi * mm_to_inches)
+        self.margin_px = int(margin_mm * dpi * mm_to_inches)
+        spacing_px = int(spacing_mm * dpi * mm_to_inches)
+        self.border_width_px = int(border_width_mm * dpi * mm_to_inches)
+
+        self.total_insert_width_px = self.insert_width_px + 2 * self.border_width_px + spacing_px
+        self.total_insert_height_px = self.insert_height_px + 2 * self.border_width_px + spacing_px
+
+        self.columns = (self.A4_width_px - 2 * self.margin_px + spacing_px) // self.total_insert_width_px
+        self.rows = (self.A4_height_px - 2 * self.margin_px + spacing_px) // self.total_insert_height_px
+        self.per_sheet = self.columns * self.rows
+
+
+def create_badge_sheet(badges: list, layout: BadgeSheetLayout):
+    """
+    Собирает лист A4 из бейджей в памяти
+    :param badges: PNG бейджей, не больше layout.per_sheet
+    """
+
+    a4_image = Image.new('RGB', (layout.A4_width_px, layout.A4_height_px), 'white')
     draw = ImageDraw.Draw(a4_image)
+    border_width_px = layout.border_width_px
 
-    total_insert_width_px = insert_width_px + 2 * border_width_px + spacing_px
-    total_insert_height_px = insert_height_px + 2 * border_width_px + spacing_px
+    for index, badge in enumerate(badges[:layout.per_sheet]):
+        row, col = divmod(index, layout.columns)
+        insert_image = Image.open(BytesIO(badge))
+        insert_image_resized = insert_image.resize((layout.insert_width_px, layout.insert_height_px))
 
-    columns = (A4_width_px - 2 * margin_px + spacing_px) // total_insert_width_px
-    rows = (A4_height_px - 2 * margin_px + spacing_px) // total_insert_height_px
+        x = layout.margin_px + col * layout.total_insert_width_px
+        y = layout.margin_px + row * layout.total_insert_height_px
 
-    current_insert_index = 0
+        draw.rectangle([x, y, x + layout.insert_width_px + 2 * border_width_px, y + layout.insert_height_px + 2 * border_width_px], outline="black", width=border_width_px)
 
-    for row in range(rows):
-        for col in range(columns):
-            if current_insert_index < len(insert_paths):
-                insert_image = Image.open(f"{current_directory}/generated/{insert_paths[current_insert_index]}")
-                insert_image_resized = insert_image.resize((insert_width_px, insert_height_px))
+        a4_image.paste(insert_image_resized, (x + border_width_px, y + border_width_px))
+
+    return a4_image
 
-                x = margin_px + col * total_insert_width_px
-                y = margin_px + row * total_insert_height_px
 
-                draw.rectangle([x, y, x + insert_width_px + 2 * border_width_px, y + insert_height_px + 2 * border_width_px], outline="black", width=border_width_px)
+badges_pool = None
 
-                a4_image.paste(insert_image_resized, (x + border_width_px, y + border_width_px))
 
-                current_insert_index += 1
-            else:
-                break
+def get_badges(users: list) -> PdfDocument:
+    """
+    Набор бейджей одним PDF: бейджи рисуются в пуле процессов, листы собираются в памяти
+    и по одному дописываются в PDF, без промежуточных файлов
+    :param users: словари с ключами post_ (шаблон), name, caption
+    """
 
-    a4_image.save(final_file_name)
+    global badges_pool
+    if badges_pool is None:
+        badges_pool = ProcessPoolExecutor(max_workers=int(os.getenv('BADGES_WORKERS', os.cpu_count() or 2)))
 
+    filename = f"badges_all_{datetime.now().strftime('%Y_%m_%d')}"
+    layout = BadgeSheetLayout()
+    badges = list(badges_pool.map(render_badge, users, chunksize=8))
 
+    merger = PdfMerger()
+    for start in range(0, len(badges), layout.per_sheet):
+        sheet = create_badge_sheet(badges[start:start + layout.per_sheet], layout)
+        page = BytesIO()
+        sheet.save(page, format='PDF', resolution=layout.dpi)
+        merger.append(page)
+
+    stream = BytesIO()
+    merger.write(stream)
+    merger.close()
+    info(f'Badging: {len(badges)} badges on {math.ceil(len(badges) / layout.per_sheet)} sheets')
+
+    return PdfDocument(filename, stream.getvalue())
+
+
+@cached_document('grouplist.docx')
 def get_grouplist(group_list: list, group_num: int):
-    filename = f"grouplist_{group_num}_{datetime.now().date().strftime('%d_%m_%Y')}"
+    filename = f"grouplist_{group_num}"
     info(f"{filename}: creating file")
 
     data = []
@@ -178,8 +510,8 @@ def get_grouplist(group_list: list, group_num: int):
             ]
         )
 
-    doc = docx.Document(f'{current_directory}/templates/grouplist.docx')
-    table = doc.tables[0]
+    tpl = render_template('grouplist.docx', group_num)
+    table = tpl.docx.tables[0]
 
     for i in range(len(data)):
         row = table.add_row()
@@ -194,31 +526,21 @@ def get_grouplist(group_list: list, group_num: int):
                 cell.paragraphs[0].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
                 cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
 
-    doc.save(f"{current_directory}/generated/{filename}.docx")
-    info(f"{filename}: saved in /generated")
-
-    insert_metrics(filename, group_num)
-    info(f"{filename}: metrics inserted")
-
-    convert_to_pdf(filename)
-
-    return filename
+    return convert_to_pdf(filename, save_docx(tpl), '%d_%m_%Y')
 
 
+@cached_document('qr_table.docx')
 def get_qr_list(group: str, group_list: list, value: str = ""):
     if value:
         extra = f"_{value}"
     else:
         extra = ""
-    filename = f"qrlist_{group}{extra}_{datetime.now().date().strftime('%d_%m_%Y')}"
-    doc = docx.Document(f'{current_directory}/templates/qr_table.docx')
+    filename = f"qrlist_{group}{extra}"
+    tpl = render_template('qr_table.docx', f"№{value}" if value else groups_dict[group])
+    doc = tpl.docx
 
     group_list.sort(key=lambda user: user['name'])
-    for user in group_list:
-        # print(f"creating qr {user['pass_phrase']}")
-        qr_img = qrcode.make(f"https://t.me/{os.getenv('BOT_NAME')}?start={group}_{user['pass_phrase']}")
-        qr_img.save(f"{current_directory}/qr/{user['pass_phrase']}.png")
-        # print('OK')
+    qr_images = qr_cache.get_many([f"{group}_{user['pass_phrase']}" for user in group_list])
     users_count = len(group_list)
     rows, cols = math.ceil(users_count / 4), 4
     qr_table = doc.add_table(rows, cols)
@@ -243,24 +565,17 @@ def get_qr_list(group: str, group_list: list, value: str = ""):
                 paragraph.runs[-1].font.size = Pt(11)
                 paragraph.runs[-1].font.name = "Montserrat Medium"
 
-                image_path = f"{current_directory}/qr/{group_list[index]['pass_phrase']}.png"
-                paragraph.add_run().add_picture(image_path, width=Inches(1.7))
+                qr_image = BytesIO(qr_images[f"{group}_{group_list[index]['pass_phrase']}"])
+                paragraph.add_run().add_picture(qr_image, width=Inches(1.7))
                 index += 1
 
-    doc.save(f"{current_directory}/generated/{filename}.docx")
-    if value:
-        insert_metrics(filename, f"№{value}")
-    else:
-        insert_metrics(filename, groups_dict[group])
-    convert_to_pdf(filename)
-
-    return filename
+    return convert_to_pdf(filename, save_docx(tpl), '%d_%m_%Y')
 
 
 def get_feedback(module_name: str, feedback_list: []):
     creation_date = datetime.now().date().strftime('%d_%m_%Y')
     filename = f"feedback_{module_name}_{creation_date}"
-    doc = docx.Document(f'{current_directory}/templates/feedback.docx')
+    doc = open_template('feedback.docx')
 
     title = f"Обратная связь по модулю «{module_name}» за {creation_date.replace('_', '.')}"
     main_text = ""
@@ -281,15 +596,13 @@ def get_feedback(module_name: str, feedback_list: []):
     font.size = Pt(13)
     font.name = "Montserrat SemiBold"
 
-    doc.save(f"{current_directory}/generated/{filename}.docx")
-    convert_to_pdf(filename)
-
-    return filename
+    return convert_to_pdf(filename, save_docx(doc))
 
 
+@cached_document('navigation.docx')
 def get_modules_navigation(modules_list: list, title: str):
-    filename = f"navigation_{datetime.now().date().strftime('%d_%m_%Y')}"
-    doc = docx.Document(f'{current_directory}/templates/navigation.docx')
+    filename = "navigation"
+    doc = open_template('navigation.docx')
 
     title_table = doc.tables[0]
     navigation_table = doc.tables[1]
@@ -318,15 +631,13 @@ def get_modules_navigation(modules_list: list, title: str):
         if index != len(modules_list) - 1:
             navigation_table.add_row()
 
-    doc.save(f"{current_directory}/generated/{filename}.docx")
-    convert_to_pdf(filename)
-
-    return filename
+    return convert_to_pdf(filename, save_docx(doc), '%d_%m_%Y')
 
 
+@cached_document('module_parts.docx')
 def get_module_parts(children_list: list, module_info: list, teacher_info: list):
-    filename = f"module_{module_info['id']}_{datetime.now().date().strftime('%d%m%Y')}"
-    doc = docx.Document(f'{current_directory}/templates/module_parts.docx')
+    filename = f"module_{module_info['id']}"
+    doc = open_template('module_parts.docx')
 
     text_title = f"{module_info['name']}" \
                  f"\n{teacher_info['name']}" \
@@ -351,7 +662,4 @@ def get_module_parts(children_list: list, module_info: list, teacher_info: list)
     font.name = "Montserrat Medium"
     font.bold = False
 
-    doc.save(f"{current_directory}/generated/{filename}.docx")
-    convert_to_pdf(filename)
-
-    return filename
+    return convert_to_pdf(filename, save_docx(doc), '%d%m%Y')
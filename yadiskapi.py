@@ -31,12 +31,13 @@ class YandexAPI:
         response = put(url=url, headers=headers)
         return response.json()
 
-    def get_upload_link(self, filepath: str) -> {}:
+    def get_upload_link(self, filepath: str, overwrite: bool = False) -> {}:
         """
         :param filepath: путь на Яндекс.диске, к файлу, который будет загружен (example: video/rkf45.mp4)
+        :param overwrite: перезаписать файл, если он уже есть
         :return:
         """
-        url = f"{self.base_url}/resources/upload?path={filepath}"
+        url = f"{self.base_url}/resources/upload?path={filepath}&overwrite={str(overwrite).lower()}"
         headers = {
             'Accept': 'application/json',
             'Authorization': f"OAuth {self.token}"
@@ -44,14 +45,46 @@ class YandexAPI:
         response = get(url=url, headers=headers)
         return response.json()
 
-    def upload_file(self, url: str, filepath: str) -> {}:
+    def upload_file(self, url: str, filepath: str, timeout: int = 600) -> int:
         """
         :param url: поле href из get_upload_link
         :param filepath: путь к файлу на локальной машине
+        :return: код ответа
+        """
+        # файл передаётся телом запроса и читается по частям, а не целиком в multipart-форму
+        with open(filepath, mode='rb') as file:
+            response = put(url=url, data=file, timeout=timeout)
+        response.raise_for_status()
+        return response.status_code
+
+    def upload_stream(self, url: str, chunks, timeout: int = 600) -> int:
+        """
+        :param url: поле href из get_upload_link
+        :param chunks: итератор по частям файла (bytes), передаётся с Transfer-Encoding: chunked
+        :return: код ответа
+        """
+        response = put(url=url, data=chunks, timeout=timeout)
+        response.raise_for_status()
+        return response.status_code
+
+    def get_resource(self, filepath: str, fields: str = None, limit: int = None) -> {}:
+        """
+        :param filepath: путь к файлу или папке
+        :param fields: список полей через запятую, например md5,sha256,size
+        :param limit: сколько элементов папки вернуть в _embedded.items
         :return:
         """
-        file = open(filepath, mode='rb')
-        put(url=url, files={'file': file})
+        url = f"{self.base_url}/resources?path={filepath}"
+        if fields:
+            url += f"&fields={fields}"
+        if limit:
+            url += f"&limit={limit}"
+        headers = {
+            'Accept': 'application/json',
+            'Authorization': f"OAuth {self.token}"
+        }
+        response = get(url=url, headers=headers)
+        return response.json()
 
     def delete(self, filepath: str, permanently: bool = False) -> {}:
         """